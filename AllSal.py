@@ -1,53 +1,53 @@
 import streamlit as st
 import pandas as pd
-import io
 import os
-import csv
-import re
 from datetime import datetime
-from openpyxl.workbook import Workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, PatternFill
 import shutil
-# ملاحظة: تم إزالة استيراد threading و tkinter و customtkinter
-# لأن Streamlit يدير دورة حياة التطبيق بشكل مختلف.
+import threading
+import uuid
+from payroll_core import (
+    INPUT_REQUIRED_COLS,
+    MissingColumnsError,
+    REJECT_REASON_COL,
+    SOURCE_FILE_COL,
+    build_rejects_workbook,
+    build_summary,
+    convert_files_to_txt,
+    split_payroll,
+    write_zip_archive,
+)
+from result_cache import cache_from_environment, make_cache_key, processing_parameters, stage_key
+from blob_store import BlobSession, BlobStore
+from run_metrics import RunRecorder
+from run_manifest import CHUNK_ADDED, CHUNK_CHANGED, CHUNK_UNCHANGED, build_manifest, compare_manifests, count_changes
+from job_runner import JOB_CANCELLED, JOB_FAILED, JOB_QUEUED, runner_from_environment
+from run_workspace import (
+    DOWNLOADS_DIR,
+    EXCEL_DIR,
+    INPUTS_DIR,
+    TXT_DIR,
+    create_run_dir,
+    open_download,
+    outputs_exist,
+    spool_upload,
+    write_output,
+)
+from run_history import (
+    DIFF_MIN_CHANGE_AMOUNT,
+    DIFF_MIN_CHANGE_PERCENT,
+    build_diff_workbook,
+    history_from_environment,
+    history_rows_from_files,
+)
+
+CHUNK_STATUS_LABELS = {CHUNK_UNCHANGED: 'بدون تغيير', CHUNK_CHANGED: 'تغير', CHUNK_ADDED: 'جديد'}
+
+# الفاصل الزمني لتحديث عرض تقدم مهام الخلفية (بالثواني)
+JOB_POLL_SECONDS = 1
+
+# ملاحظة: لا يُستخدم tkinter و customtkinter لأن Streamlit يدير دورة حياة التطبيق؛
+# العمليات الطويلة تعمل في مهام خلفية (job_runner) و threading للأقفال فقط.
 
-# ----------------------------------------------------------------------
-# --- الثوابت والبيانات الثابتة ---
-# ----------------------------------------------------------------------
-PAYER_NAME = "مديرية تربية البصرة"
-PAYER_ACCOUNT = "IQ26RAFB002100366585001"
-CURRENCY = "IQD"
-DETAILS_OF_CHARGES = "SLEV"
-REMITTANCE_INFO_TEMPLATE = "SALARY {} {}"
-MAX_ROWS_PER_FILE = 4000
-MAX_AMOUNT_PER_FILE = 4_500_000_000
-BANK_BICS = {
-    'RAFB': 'RAFBIQB1098', 'RDBA': 'RDBAIQB1046', 'AIBI': 'AIBIIQBA991',
-    'IDBQ': 'IDBQIQBA004', 'AINI': 'AINIIQBA015', 'NBIQ': 'NBIQIQBA830'
-}
-ARABIC_BANK_NAME_MAP = {
-    'RAFB': 'الرافدين', 'RDBA': 'الرشيد', 'AIBI': 'آشور',
-    'IDBQ': 'التنمية', 'AINI': 'الطيف', 'NBIQ': 'الأهلي'
-}
-ALL_BRANCHES_BIC = {
-    'RAFBIQB1098', 'RDBAIQB1046', 'AIBIIQBA991', 'IDBQIQBA004',
-    'AINIIQBA015', 'AINIIQBA009',
-    'NBIQIQBA830', 'NBIQIQBA856', 'NBIQIQBA859', 'NBIQIQBA005',
-    'NBIQIQBA860', 'NBIQIQBA862', 'NBIQIQBA849', 'NBIQIQBA865',
-    'NBIQIQBA844', 'NBIQIQBA848', 'NBIQIQBA850'
-}
-BANKS_WITH_DYNAMIC_BRANCHES = ['AINI', 'NBIQ']
-BANK_KEYS_FOR_FILTERING = list(BANK_BICS.keys())
-ARABIC_MONTHS = {
-    1: "كانون الثاني", 2: "شباط", 3: "آذار", 4: "نيسان", 5: "أيار", 6: "حزيران",
-    7: "تموز", 8: "آب", 9: "أيلول", 10: "تشرين الأول", 11: "تشرين الثاني", 12: "كانون الأول"
-}
-FINAL_EXCEL_COLS = [
-    'Reference', 'Value Date', 'Payer Name', 'Payer Acount', 'Amount',
-    'Currency', 'Receiver BIC', 'Beneficiary Name', 'Beneficiary Acount',
-    'Remittance Information', 'Details of Charges'
-]
 # --- تهيئة حالة الجلسة ---
 if 'processed_files' not in st.session_state:
     st.session_state.processed_files = []
@@ -57,334 +57,425 @@ if 'encrypted_files' not in st.session_state:
     st.session_state.encrypted_files = []
 if 'txt_files_deleted' not in st.session_state:
     st.session_state.txt_files_deleted = False
+if 'result_key' not in st.session_state:
+    st.session_state.result_key = None
+if 'zip_archives' not in st.session_state:
+    st.session_state.zip_archives = {}
+if 'rejects' not in st.session_state:
+    st.session_state.rejects = None
+if 'history_run_id' not in st.session_state:
+    st.session_state.history_run_id = None
+if 'payroll_diff' not in st.session_state:
+    st.session_state.payroll_diff = None
+if 'run_recorder' not in st.session_state:
+    st.session_state.run_recorder = None
+if 'source_stats' not in st.session_state:
+    st.session_state.source_stats = None
+if 'applied_jobs' not in st.session_state:
+    st.session_state.applied_jobs = {}
+if 'manifest_changes' not in st.session_state:
+    st.session_state.manifest_changes = None
+if 'reconciliation' not in st.session_state:
+    st.session_state.reconciliation = None
+if 'work_dir' not in st.session_state:
+    st.session_state.work_dir = None
+
+
+@st.cache_resource
+def get_result_cache():
+    """ذاكرة النتائج المشتركة بين كل الجلسات (تُنشأ مرة واحدة لكل عملية خادم)."""
+    return cache_from_environment()
+
+
+@st.cache_resource
+def get_run_history():
+    """سجل التشغيلات الدائم (SQLite) المشترك بين الجلسات."""
+    return history_from_environment()
+
+
+@st.cache_resource
+def get_blob_store():
+    """مخزن بايتات الملفات الناتجة المشترك بين الجلسات (بدون تكرار، مع النقل إلى القرص)."""
+    return BlobStore()
+
+
+@st.cache_resource
+def get_job_runner():
+    """مجموعة مهام الخلفية المشتركة بين الجلسات (الحد الأقصى للمهام المتزامنة من PAYROLL_MAX_JOBS)."""
+    return runner_from_environment()
+
+
+# الجلسة تحتفظ بمراجع فقط؛ تُحرَّر تلقائياً عند انتهاء الجلسة
+if 'blob_session' not in st.session_state:
+    st.session_state.blob_session = BlobSession(get_blob_store())
+
+
+def store_files(files_list):
+    """استبدال بايتات كل ملف (أو مساره على القرص) بمرجع في مخزن الجلسة (blob) مع حفظ الحجم وبقية البيانات."""
+    blobs = st.session_state.blob_session
+    stored = []
+    for file_data in files_list:
+        entry = {k: v for k, v in file_data.items() if k not in ('content', 'path')}
+        if file_data.get('path'):
+            # الملف المكتوب في مجلد التشغيل يُسجَّل برابط صلب دون قراءته في الذاكرة
+            entry['blob'] = blobs.put_file(file_data['path'])
+            entry['size'] = file_data['size']
+        else:
+            entry['blob'] = blobs.put(file_data['content'])
+            entry['size'] = len(file_data['content'])
+        stored.append(entry)
+    return stored
+
+
+def release_files(files_list):
+    """تحرير مراجع قائمة ملفات (أو ملف واحد) من مخزن الجلسة."""
+    if isinstance(files_list, dict):
+        files_list = [files_list]
+    for file_data in files_list or []:
+        st.session_state.blob_session.release(file_data['blob'])
+
+
+def blob_lookup(files_list, blobs):
+    """دالة reuse(chunk_hash) تُرجع ملفاً سابقاً في الجلسة لنفس بصمة الشريحة (أو None).
+
+    الملف على القرص يُرجع مساره (يُربط في مجلد التشغيل الجديد دون نسخه)، وإلا بايتاته.
+    """
+    refs = {f['chunk_hash']: f['blob'] for f in files_list or [] if f.get('chunk_hash')}
+
+    def lookup(hash_value):
+        ref = refs.get(hash_value)
+        if ref is None:
+            return None
+        try:
+            return blobs.path(ref) or blobs.get(ref)
+        except (KeyError, OSError):  # حُرر المرجع في هذه الأثناء
+            return None
+    return lookup
 
 
-# ----------------------------------------------------------------------
-# --- الدوال المساعدة (بدون تغيير كبير في المنطق الداخلي) ---
-# ----------------------------------------------------------------------
+def stored_file(file_data, blobs):
+    """الملف بمساره في المخزن إن كان على القرص، وإلا ببايتاته (لقراءته عند الحاجة فقط)."""
+    path = blobs.path(file_data['blob'])
+    if path is not None:
+        return {**file_data, 'path': path}
+    return {**file_data, 'content': blobs.get(file_data['blob'])}
 
-# (تم إزالة دالة adjust_column_width و set_arabic_number_format لتبسيط التوافق مع بيئة Streamlit)
-# لأن التعامل مع تنسيقات openpyxl يكون معقداً داخل Streamlit ويُفضل ترك التنسيق اليدوي
-# أو استخدام أدوات تخطيط البيانات في Streamlit.
 
-def get_receiver_bic_dynamic(row):
-    """تحديد BIC للمصرف بناءً على مفتاح المصرف ورقم IBAN."""
-    key = row['Bank Key']
-    iban = str(row['Iban'])
-    if key in BANKS_WITH_DYNAMIC_BRANCHES:
-        try:
-            branch_code = iban[8:11]
-            bic_prefix = key + 'IQBA'
-            suggested_bic = bic_prefix + branch_code
-            if suggested_bic in ALL_BRANCHES_BIC:
-                return suggested_bic
-            else:
-                return BANK_BICS[key]
-        except Exception:
-            return BANK_BICS[key]
-    else:
-        return BANK_BICS[key]
+def blob_download_data(blobs, ref):
+    """دالة مؤجلة لزر التحميل: مقبض الملف إن كان على القرص، وإلا البايتات من الذاكرة."""
+    def load():
+        path = blobs.path(ref)
+        return open_download(path) if path is not None else blobs.get(ref)
+    return load
+
+
+def session_work_dir():
+    """مجلد التشغيل الحالي للجلسة (يُنشأ من جديد إن لم يوجد أو حُذف لانتهاء مدته)."""
+    work_dir = st.session_state.work_dir
+    if work_dir is None or not os.path.isdir(work_dir):
+        work_dir = st.session_state.work_dir = create_run_dir()
+    return work_dir
+
 
 # ----------------------------------------------------------------------
 # --- دوال المعالجة الرئيسية (تستخدم Streamlit Caching/Status) ---
 # ----------------------------------------------------------------------
 
-# @st.cache_data(show_spinner=False) # يمكن استخدام التخزين المؤقت إذا لم يتغير ملف الإدخال
-def process_excel_data_st(uploaded_file, status_container):
-    """معالجة ملف الإدخال وتقسيمه إلى ملفات Excel حسب المصرف/الفرع."""
-    st.session_state.processed_files = []
-    
-    with status_container.status("بدء المعالجة...", expanded=True) as status:
-        try:
-            # قراءة البيانات
-            status.update(label="جاري قراءة ملف الإدخال...", state="running")
-            df = pd.read_excel(uploaded_file)
-            
-            required_cols = ['الاسم', 'Iban', 'الراتب الصافي']
-            if not all(col in df.columns for col in required_cols):
-                st.error(f"الملف يجب أن يحتوي على الأعمدة: {', '.join(required_cols)}")
-                status.update(label="فشل المعالجة: أعمدة مفقودة.", state="error")
-                return []
-            
-            df['الراتب الصافي'] = pd.to_numeric(df['الراتب الصافي'], errors='coerce')
-            df = df.dropna(subset=['الراتب الصافي', 'Iban', 'الاسم'])
-
-            # فلترة وحذف الصفوف ذات الراتب الصفر
-            initial_rows = len(df)
-            df = df[df['الراتب الصافي'] != 0]
-            rows_dropped = initial_rows - len(df)
-            if rows_dropped > 0:
-                st.warning(f"تم حذف **{rows_dropped}** صفاً من عمود 'الراتب الصافي' بقيمة صفر.")
-            
-            df['الاسم'] = df['الاسم'].astype(str).str[:35]
-
-            today = datetime.now()
-            date_str = today.strftime('%Y%m%d')
-            date_ref = today.strftime('%Y%m%d')
-            current_year = today.strftime('%Y')
-            month_number = today.month
-            current_month_arabic = ARABIC_MONTHS.get(month_number, "شهر غير محدد")
-
-            # تجهيز الأعمدة الثابتة والمشتقة
-            # ... (نفس منطق تجهيز الأعمدة) ...
-            df['Value Date'] = date_str
-            df['Payer Name'] = PAYER_NAME
-            df['Payer Acount'] = PAYER_ACCOUNT
-            df['Amount'] = df['الراتب الصافي']
-            df['Currency'] = CURRENCY
-            df['Details of Charges'] = DETAILS_OF_CHARGES
-            df['Beneficiary Name'] = df['الاسم']
-            df['Beneficiary Acount'] = df['Iban']
-            remittance_info = REMITTANCE_INFO_TEMPLATE.format(current_year, current_month_arabic)
-            df['Remittance Information'] = remittance_info
-            df['Bank Key'] = df['Iban'].str[4:8]
-
-            df_filtered = df[df['Bank Key'].isin(BANK_KEYS_FOR_FILTERING)].copy()
-            df_filtered['Receiver BIC'] = df_filtered.apply(get_receiver_bic_dynamic, axis=1)
-            df_filtered['Reference'] = date_ref + ' ' + df_filtered['Iban'].astype(str)
-
-            df_final = df_filtered[FINAL_EXCEL_COLS]
-            grouped_by_bank_bic = df_final.groupby('Receiver BIC')
-            file_count = 0
-            processed_files_list = []
-
-            # --- تصدير ملفات كل بنك وفرع (في الذاكرة) ---
-            for bic, bank_df in grouped_by_bank_bic:
-                bank_key = bic[:4]
-                arabic_bank_name = ARABIC_BANK_NAME_MAP.get(bank_key, 'مصرف_غير_معروف')
-                num_rows = len(bank_df)
-                start_row = 0
-                file_index = 1
-                
-                status.update(label=f"جاري تقسيم بيانات بنك **{arabic_bank_name}** - فرع **{bic[-3:]}**...", state="running")
-                
-                while start_row < num_rows:
-                    end_row = min(start_row + MAX_ROWS_PER_FILE, num_rows)
-                    current_slice = bank_df.iloc[start_row:end_row]
-                    total_amount = current_slice['Amount'].sum()
-
-                    # منطق تقسيم الملفات حسب المبلغ الأقصى (لتبسيط الأمر، يمكن تركيز منطق التقسيم على حجم الصفوف لبيئة Streamlit)
-                    # مع الحفاظ على المنطق الأصلي قدر الإمكان
-                    while total_amount > MAX_AMOUNT_PER_FILE and len(current_slice) > 1:
-                        end_row -= 1
-                        current_slice = bank_df.iloc[start_row:end_row]
-                        total_amount = current_slice['Amount'].sum()
-
-                    if total_amount > MAX_AMOUNT_PER_FILE:
-                        current_slice = bank_df.iloc[start_row:start_row+1]
-                        end_row = start_row + 1
-
-                    output_filename = f"{arabic_bank_name}_الملف_{file_index}_{bic[-3:]}_{date_str}.xlsx"
-                    
-                    # حفظ في الذاكرة (باستخدام io.BytesIO)
-                    output = io.BytesIO()
-                    with pd.ExcelWriter(output, engine='xlsxwriter') as writer: # استخدام xlsxwriter لتجنب التبعيات المعقدة لـ openpyxl في هذه الخطوة
-                        current_slice.to_excel(writer, index=False, sheet_name='Sheet1')
-                    output.seek(0)
-                    
-                    processed_files_list.append({
-                        'filename': output_filename,
-                        'content': output.getvalue(),
-                        'bank_name': arabic_bank_name,
-                        'branch_code': bic[-3:],
-                        'rows': len(current_slice),
-                        'amount': round(total_amount, 2)
-                    })
-
-                    file_count += 1
-                    status.update(label=f"تم إنشاء ملف: {output_filename}. عدد الصفوف: {len(current_slice)}.", state="running")
-                    start_row = end_row
-                    file_index += 1
-
-            st.success(f"اكتملت المعالجة بنجاح. تم إنشاء **{file_count}** ملف إخراج.")
-            status.update(label=f"اكتملت المعالجة بنجاح. تم إنشاء {file_count} ملف إخراج. 🎉", state="complete")
-            st.session_state.processed_files = processed_files_list
-            return processed_files_list
+def processing_job(inputs, split_mode, export_workers, profile, cache, history, previous_files, blobs, run_dir,
+                   progress):
+    """مهمة المعالجة في الخلفية: التقسيم (أو استرجاعه من ذاكرة النتائج) ثم الحفظ في سجل المقارنة.
+
+    inputs قائمة (اسم الملف، مساره في مجلد التشغيل run_dir). ملفات xlsx والملخص تُكتب مباشرة
+    في run_dir، وملفات الإدخال تُحذف بعد قراءتها. previous_files ملفات المعالجة السابقة في
+    الجلسة: ما لم تتغير صفوفه منها يُعاد استخدامه بدلاً من كتابته، ويُقارن بيانها ببيان النتيجة.
+    تُنفذ في خيط من JobRunner فلا تستخدم أي أوامر Streamlit ولا st.session_state؛ النتيجة تُطبق
+    على الجلسة لاحقاً في apply_processing_job.
+    """
+    recorder = RunRecorder(profile=profile)
+    today = datetime.now()
+    names = [name for name, _ in inputs]
+    paths = [path for _, path in inputs]
+    if len(inputs) == 1:
+        result_key = make_cache_key(paths[0], processing_parameters(today, split_mode))
+    else:
+        result_key = make_cache_key(paths, processing_parameters(today, split_mode, source_names=names))
+
+    try:
+        result = cache.get(result_key)
+        # نتيجة مخزنة حُذف مجلد تشغيلها (انتهت مدته) تُعاد معالجتها
+        cached = result is not None and outputs_exist(result['files'])
+        if cached:
+            recorder.record_cached('split_payroll', sum(f['rows'] for f in result['files']))
+        else:
+            result = cache.put(result_key, split_payroll(
+                paths if len(paths) > 1 else paths[0],
+                split_mode=split_mode,
+                export_workers=export_workers,
+                today=today,
+                progress=progress,
+                recorder=recorder,
+                read_workers=export_workers,
+                reuse=blob_lookup(previous_files, blobs),
+                output_dir=os.path.join(run_dir, EXCEL_DIR)
+            ))
+    finally:
+        shutil.rmtree(os.path.join(run_dir, INPUTS_DIR), ignore_errors=True)
+    # الملخص يُبنى من المجاميع المحسوبة أثناء التقسيم فلا يحتاج خطوة منفصلة
+    progress("جاري إنشاء ملف الملخص الإحصائي...")
+    summary_file = cached_result(cache, result_key, 'summary', recorder, lambda recorder: write_output(run_dir, build_summary(
+        result['files'], recorder=recorder, sources=result['sources'] if len(result['sources']) > 1 else None,
+        summary=result['summary']
+    )), valid=lambda summary_file: outputs_exist([summary_file]))
+    changes = None
+    if previous_files:
+        changes = compare_manifests(build_manifest(previous_files), build_manifest(result['files']))
+
+    # حفظ صفوف هذا التشغيل في السجل للمقارنة الشهرية (نفس الملف يُحفظ مرة واحدة)
+    progress("جاري حفظ التشغيل في سجل المقارنة الشهرية...")
+    history_run_id = history_error = None
+    try:
+        history_run_id = history.save_run(
+            history_rows_from_files(result['files']), today, label='، '.join(names), input_key=result_key
+        )
+    except Exception as e:
+        history_error = e
+    return {'result': result, 'result_key': result_key, 'cached': cached, 'recorder': recorder, 'changes': changes,
+            'summary_file': summary_file, 'history_run_id': history_run_id, 'history_error': history_error,
+            'work_dir': run_dir}
+
+
+def start_processing_st(uploaded_files, split_mode='greedy', export_workers=1):
+    """بدء معالجة ملفات الإدخال كمهمة في الخلفية وحفظ معرفها في رابط الصفحة.
+
+    الملفات المرفوعة تُنسخ على أجزاء إلى مجلد تشغيل جديد وتُقرأ المهمة منه (بدون getvalue).
+    """
+    run_dir = create_run_dir()
+    inputs = [(f.name, spool_upload(f, run_dir, position)) for position, f in enumerate(uploaded_files, start=1)]
+    job_id = get_job_runner().submit(
+        'process', processing_job, inputs, split_mode, export_workers,
+        st.session_state.get('deep_profile', False), get_result_cache(), get_run_history(),
+        list(st.session_state.processed_files), st.session_state.blob_session, run_dir,
+        label='، '.join(name for name, _ in inputs)
+    )
+    st.query_params['process_job'] = job_id
+    # مهمة تحويل سابقة تخص نتائج قديمة
+    st.query_params.pop('txt_job', None)
+    return job_id
 
-        except Exception as e:
-            st.error(f"حدث خطأ أثناء المعالجة: {e}")
-            status.update(label=f"حدث خطأ أثناء المعالجة: {e}", state="error")
+
+def apply_processing_job(job, status_container):
+    """تطبيق نتيجة مهمة معالجة منتهية على الجلسة الحالية (بعد انتهائها أو بعد إعادة تحميل الصفحة)."""
+    with status_container.container():
+        if job.state == JOB_CANCELLED:
+            st.info("تم إلغاء المعالجة.")
+            return []
+        if job.state == JOB_FAILED:
+            if isinstance(job.error, MissingColumnsError):
+                st.error(f"الملف يجب أن يحتوي على الأعمدة: {', '.join(INPUT_REQUIRED_COLS)}")
+            else:
+                st.error(f"حدث خطأ أثناء المعالجة: {job.error}")
             return []
 
+        release_files(st.session_state.processed_files)
+        release_files(st.session_state.summary_file)
+        outcome = job.result
+        result = outcome['result']
+        # كل معالجة جديدة تبدأ تقرير تشغيل جديداً تُضاف إليه مراحل الملخص والتحويل لاحقاً
+        st.session_state.run_recorder = outcome['recorder']
+        st.session_state.payroll_diff = None
+        if outcome['cached']:
+            st.info("تم استرجاع نتائج هذا الملف من الذاكرة المؤقتة.")
+
+        rows_dropped = result['zero_rows_dropped']
+        if rows_dropped > 0:
+            st.warning(f"تم حذف **{rows_dropped}** صفاً من عمود 'الراتب الصافي' بقيمة صفر.")
+        rejects = result['rejects']
+        duplicate_rows = sum(stats['duplicates'] for stats in result['sources'])
+        invalid_rows = len(rejects) - rows_dropped - duplicate_rows
+        if invalid_rows > 0:
+            st.warning(f"تم رفض **{invalid_rows}** صفاً لبيانات غير صالحة (IBAN، الاسم، الراتب أو مصرف غير مدعوم). "
+                       "راجع ملف الصفوف المرفوضة.")
+        st.session_state.rejects = rejects if len(rejects) else None
+        if duplicate_rows > 0:
+            st.warning(f"تم رفض **{duplicate_rows}** صفاً لأن IBAN موجود في ملف إدخال آخر سبقه.")
+        st.session_state.source_stats = result['sources'] if len(result['sources']) > 1 else None
+
+        processed_files_list = store_files(result['files'])
+        st.session_state.processed_files = processed_files_list
+        st.session_state.manifest_changes = outcome['changes']
+        st.session_state.summary_file = store_files([outcome['summary_file']])[0]
+        st.session_state.reconciliation = result['summary']['reconciliation']
+        if outcome['changes'] is not None:
+            counts = count_changes(outcome['changes'])
+            st.info(f"مقارنة بالمعالجة السابقة: تغير **{counts[CHUNK_CHANGED]}** ملف، و**{counts[CHUNK_ADDED]}** جديد، "
+                    f"و**{counts['removed']}** محذوف، و**{counts[CHUNK_UNCHANGED]}** بدون تغيير "
+                    f"(أعيد استخدام {sum(1 for f in result['files'] if f.get('reused'))} ملف دون إعادة كتابته).")
+        st.session_state.result_key = outcome['result_key']
+        st.session_state.work_dir = outcome['work_dir']
+        st.session_state.history_run_id = outcome['history_run_id']
+        if outcome['history_error'] is not None:
+            st.warning(f"تعذر حفظ التشغيل في سجل المقارنة الشهرية: {outcome['history_error']}")
+
+        st.success(f"اكتملت المعالجة بنجاح خلال {job.elapsed():.1f} ثانية. "
+                   f"تم إنشاء **{len(processed_files_list)}** ملف إخراج. 🎉")
+        return processed_files_list
+
 # ----------------------------------------------------------------------
 
-def create_summary_file_st(processed_files_list, status_container):
-    """إنشاء ملف الملخص الإحصائي من قائمة الملفات المعالجة."""
-    st.session_state.summary_file = None
-    
-    with status_container.status("بدء إنشاء ملف الملخص الإحصائي الهيكلي...", expanded=True) as status:
-        if not processed_files_list:
-            st.warning("لم يتم العثور على أي ملفات إخراج (Excel) لإنشاء الملخص. يرجى تشغيل المعالجة أولاً.")
-            status.update(label="لم يتم العثور على ملفات معالجة.", state="error")
-            return None
+def cached_result(cache, result_key, stage, recorder, compute, valid=None):
+    """تنفيذ مرحلة لاحقة للتقسيم عبر ذاكرة النتائج (مفتاحها مشتق من مفتاح نتيجة التقسيم).
+
+    compute تستقبل سجل التشغيل (أو None)؛ عند استرجاع النتيجة من الذاكرة تُسجل المرحلة في
+    التقرير كمرحلة مسترجعة. valid(value) اختيارية: قيمة مخزنة غير صالحة (مثل ملفات حُذف مجلد
+    تشغيلها) تُحسب من جديد. لا تستخدم st.session_state حتى يمكن تنفيذها في مهمة خلفية.
+    """
+    if result_key is None:
+        return compute(recorder)
+    computed = []
+
+    def compute_once():
+        computed.append(True)
+        return compute(recorder)
+
+    key = stage_key(result_key, stage)
+    value = cache.get_or_compute(key, compute_once)
+    if not computed and valid is not None and not valid(value):
+        value = cache.put(key, compute_once())
+    if not computed and recorder is not None:
+        recorder.record_cached(stage)
+    return value
 
-        summary_by_bank = {}
-        key_map_reverse = {v: k for k, v in ARABIC_BANK_NAME_MAP.items()}
+# ----------------------------------------------------------------------
 
-        try:
-            for file_data in processed_files_list:
-                arabic_bank_name = file_data['bank_name']
-                filename = file_data['filename']
-                branch_code = file_data['branch_code']
-                num_employees = file_data['rows']
-                total_amount = file_data['amount']
-
-                bank_key = key_map_reverse.get(arabic_bank_name, 'Unknown')
-                
-                if bank_key not in summary_by_bank:
-                    summary_by_bank[bank_key] = {
-                        'name_ar': arabic_bank_name,
-                        'files': [],
-                        'total_employees': 0,
-                        'total_amount': 0.0
-                    }
-
-                summary_by_bank[bank_key]['files'].append({
-                    'اسم الملف': filename,
-                    'رمز الفرع': branch_code,
-                    'عدد المنتسبين (الصفوف)': num_employees,
-                    'المبلغ الإجمالي (د.ع)': total_amount
-                })
-
-                summary_by_bank[bank_key]['total_employees'] += num_employees
-                summary_by_bank[bank_key]['total_amount'] += total_amount
-
-            # ... (نفس منطق تجميع البيانات للملخص الكامل) ...
-            full_summary_data = []
-            grand_total_employees = 0
-            grand_total_amount = 0.0
-            
-            FIELD_FILE = 'اسم الملف / المصرف'
-            FIELD_BRANCH = 'رمز الفرع / المفتاح'
-            FIELD_COUNT = 'عدد المنتسبين (الصفوف)'
-            FIELD_AMOUNT = 'المبلغ الإجمالي (د.ع)'
-            
-            sorted_bank_keys = sorted(summary_by_bank.keys())
-
-            for bank_key in sorted_bank_keys:
-                bank_data = summary_by_bank[bank_key]
-                
-                for file_data in bank_data['files']:
-                    full_summary_data.append({
-                        FIELD_FILE: file_data['اسم الملف'],
-                        FIELD_BRANCH: file_data['رمز الفرع'],
-                        FIELD_COUNT: file_data['عدد المنتسبين (الصفوف)'],
-                        FIELD_AMOUNT: file_data['المبلغ الإجمالي (د.ع)']
-                    })
-                    
-                full_summary_data.append({
-                    FIELD_FILE: f"**المجموع الكلي لـ {bank_data['name_ar']}**",
-                    FIELD_BRANCH: bank_key,
-                    FIELD_COUNT: bank_data['total_employees'],
-                    FIELD_AMOUNT: round(bank_data['total_amount'], 2)
-                })
-                
-                full_summary_data.append({FIELD_FILE: '', FIELD_BRANCH: '', FIELD_COUNT: '', FIELD_AMOUNT: ''})
-                
-                grand_total_employees += bank_data['total_employees']
-                grand_total_amount += bank_data['total_amount']
-
-            full_summary_data.append({
-                FIELD_FILE: "**المجموع الكلي النهائي لكافة المصارف**",
-                FIELD_BRANCH: "GRAND TOTAL",
-                FIELD_COUNT: grand_total_employees,
-                FIELD_AMOUNT: round(grand_total_amount, 2)
-            })
-
-            df_full_summary = pd.DataFrame(full_summary_data)
-            
-            # حفظ الملخص في الذاكرة
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df_full_summary.to_excel(writer, index=False, sheet_name='ملخص_هيكلي_كامل')
-            output.seek(0)
-            
-            date_str = datetime.now().strftime('%Y%m%d_%H%M%S')
-            summary_output_filename = f"Summary_Report_{date_str}.xlsx"
-            st.session_state.summary_file = {'filename': summary_output_filename, 'content': output.getvalue()}
+def job_running(kind):
+    """هل توجد مهمة من هذا النوع (من رابط الصفحة) لم تنته بعد."""
+    job_id = st.query_params.get(f'{kind}_job')
+    job = get_job_runner().get(job_id) if job_id else None
+    return job is not None and not job.finished
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_status_panel(kind, job_id, title):
+    """عرض تقدم مهمة الخلفية وتحديثه دورياً دون إعادة تشغيل الصفحة كاملة، مع زر الإلغاء."""
+    runner = get_job_runner()
+    job = runner.get(job_id)
+    if job is None or job.finished:
+        # إعادة تشغيل الصفحة كاملة لتطبيق النتيجة
+        st.rerun()
+        return
+    if job.state == JOB_QUEUED:
+        position = runner.queue_position(job_id)
+        st.info(f"{title}: في الانتظار ({position} مهمة قبلها، الحد الأقصى {runner.max_concurrent} مهام متزامنة)...")
+    elif job.cancel_requested:
+        st.info(f"{title}: جاري الإلغاء...")
+    else:
+        st.info(f"{title}: {job.message or 'جاري التنفيذ...'} ({job.elapsed():.0f} ثانية)")
+    if st.button("إلغاء ⛔", key=f"cancel_{kind}_job", disabled=job.cancel_requested):
+        runner.cancel(job_id)
+        st.rerun(scope='fragment')
+
+
+def follow_job(kind, title, status_container, apply):
+    """متابعة مهمة الخلفية المحفوظة في رابط الصفحة: عرض تقدمها أو تطبيق نتيجتها مرة واحدة لكل جلسة.
+
+    معرف المهمة في رابط الصفحة (query params) فتبقى المتابعة بعد إعادة تحميل الصفحة.
+    """
+    job_id = st.query_params.get(f'{kind}_job')
+    if not job_id:
+        return
+    job = get_job_runner().get(job_id)
+    if job is None:
+        # انتهت مدة الاحتفاظ بالمهمة أو أُعيد تشغيل الخادم
+        st.query_params.pop(f'{kind}_job', None)
+        return
+    if not job.finished:
+        job_status_panel(kind, job_id, title)
+    elif st.session_state.applied_jobs.get(kind) != job_id:
+        st.session_state.applied_jobs[kind] = job_id
+        apply(job, status_container)
 
-            st.success(f"اكتمل إنشاء الملخص الهيكلي بنجاح. 🎉")
-            status.update(label=f"اكتمل إنشاء الملخص الهيكلي بنجاح. 🎉", state="complete")
-            return output.getvalue()
+# ----------------------------------------------------------------------
 
-        except Exception as e:
-            st.error(f"حدث خطأ أثناء إنشاء الملخص: {e}")
-            status.update(label=f"حدث خطأ أثناء إنشاء الملخص: {e}", state="error")
-            return None
+def zip_download_data(kind, files_list, compresslevel=None):
+    """دالة مؤجلة لزر التحميل تبني الأرشيف مرة واحدة فقط لكل إصدار من النتائج.
+
+    الإصدار = مفتاح النتيجة + نوع الأرشيف + مستوى الضغط + أسماء الملفات، فإعادة تشغيل
+    السكربت لا تعيد الضغط، ولا يُبنى الأرشيف أصلاً إلا عند أول نقرة على زر التحميل.
+    الأرشيف يُكتب في مجلد التشغيل من ملفات المخزن على القرص، وتُرجع الدالة مقبض الملف
+    فلا تُقرأ بايتاته إلا عند النقر (يقرؤها Streamlit حينها إلى مخزن الوسائط).
+    """
+    version = (st.session_state.result_key, kind, compresslevel, tuple(f['filename'] for f in files_list))
+    entry = st.session_state.zip_archives.get(kind)
+    if entry is None or entry['version'] != version:
+        if entry is not None and entry['path'] is not None and os.path.exists(entry['path']):
+            os.remove(entry['path'])  # أرشيف الإصدار السابق
+        entry = {'version': version, 'path': None, 'lock': threading.Lock()}
+        st.session_state.zip_archives[kind] = entry
+
+    blobs = st.session_state.blob_session
+    directory = os.path.join(session_work_dir(), DOWNLOADS_DIR)
+
+    def load():
+        # تُستدعى في خيط منفصل عند النقر، لذا لا تستخدم أي أوامر Streamlit
+        with entry['lock']:
+            if entry['path'] is None or not os.path.exists(entry['path']):
+                os.makedirs(directory, exist_ok=True)
+                entry['path'] = write_zip_archive(
+                    os.path.join(directory, f"{kind}_{uuid.uuid4().hex}.zip"),
+                    (stored_file(f, blobs) for f in files_list), compresslevel
+                )
+            return open_download(entry['path'])
+    return load
 
 # ----------------------------------------------------------------------
 
+def txt_job(files_list, blobs, cache, result_key, recorder, previous_files, work_dir, progress):
+    """مهمة التحويل إلى TXT/CSV في الخلفية (بدون أوامر Streamlit).
+
+    ملفات TXT/CSV تُكتب مباشرة في مجلد التشغيل work_dir. ملفات TXT السابقة في الجلسة
+    (previous_files) تُستخدم للشرائح التي لم تتغير صفوفها.
+    """
+    # ملفات xlsx لا تُقرأ من المخزن إلا للملفات التي لا تملك شريحة بيانات (frame)
+    return cached_result(cache, result_key, 'txt', recorder, lambda recorder: convert_files_to_txt(
+        (f if f.get('frame') is not None else stored_file(f, blobs) for f in files_list),
+        progress=progress,
+        recorder=recorder,
+        reuse=blob_lookup(previous_files, blobs),
+        output_dir=os.path.join(work_dir, TXT_DIR)
+    ), valid=outputs_exist)
+
+
 def batch_convert_excel_to_csv_txt_st(processed_files_list, status_container):
-    """تحويل الملفات المعالجة (في الذاكرة) إلى TXT/CSV (في الذاكرة)"""
-    st.session_state.encrypted_files = []
-    
-    with status_container.status("بدء عملية التشفير/التحويل إلى TXT/CSV (على دفعات)...", expanded=True) as status:
-        if not processed_files_list:
-            st.warning("لم يتم العثور على أي ملفات Excel مُعالجة لتشفيرها/تحويلها.")
-            status.update(label="لم يتم العثور على ملفات معالجة.", state="error")
-            return []
-            
-        success_count = 0
-        encrypted_files_list = []
-        
-        try:
-            for file_data in processed_files_list:
-                filename = file_data['filename']
-                base_name = os.path.splitext(filename)[0]
-                
-                status.update(label=f"معالجة الملف: **{filename}**...", state="running")
-                
-                # 1. قراءة الملف المقسم من الذاكرة
-                df = pd.read_excel(io.BytesIO(file_data['content']), dtype=str)
-
-                # تنسيق عمود المبلغ
-                if 'Amount' in df.columns:
-                    df['Amount'] = df['Amount'].astype(str).str.replace(',', '')
-                    df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce').map(
-                        lambda x: f'"{int(x):,}"' if pd.notnull(x) else ""
-                    )
-
-                # 2. تحضير لملف TXT (إزالة عمود Reference)
-                cols_to_keep = [col for col in df.columns if col != 'Reference']
-                
-                # حفظ مؤقت إلى مصفوفة بايت بترميز utf-16 مفصول بـ TAB
-                buffer_utf16 = io.StringIO()
-                df[cols_to_keep].to_csv(buffer_utf16, sep='\t', index=False, encoding='utf-16', quoting=csv.QUOTE_NONE, escapechar='\\')
-                
-                # 3. قراءة المحتوى واستبدال المسافات/الـ TAB بـ | والترميز إلى UTF-8
-                lines = buffer_utf16.getvalue().splitlines()
-                new_lines = []
-                for line in lines:
-                    new_line = re.sub(r'[ \t]+', '|', line.rstrip('\n\r'))
-                    new_lines.append(new_line)
-                    
-                # إزالة السطر الأول (رؤوس الأعمدة)
-                if new_lines:
-                    new_lines.pop(0)
-
-                # 4. حفظ الملف النهائي بترميز UTF-8 في الذاكرة
-                final_content = '\n'.join(new_lines).encode('utf-8')
-                
-                # 5. حفظ الملفات الناتجة (TXT و CSV) في قائمة الذاكرة
-                unicode_txt_filename = base_name + ".txt"
-                csv_filename = base_name + ".csv"
-                
-                encrypted_files_list.append({'filename': unicode_txt_filename, 'content': final_content})
-                # ملف CSV هو نسخة طبق الأصل من ملف TXT في هذه الحالة
-                encrypted_files_list.append({'filename': csv_filename, 'content': final_content})
-
-                success_count += 1
-
-            st.success(f"اكتمل التشفير/التحويل بنجاح. تم تحويل **{success_count}** ملف (إلى TXT و CSV). 🎉")
-            status.update(label=f"اكتمل التشفير/التحويل بنجاح. تم تحويل {success_count} ملف. 🎉", state="complete")
-            st.session_state.encrypted_files = encrypted_files_list
-            st.session_state.txt_files_deleted = False # تأكيد وجود الملفات قبل الحذف
-            return encrypted_files_list
+    """بدء تحويل الملفات المعالجة (في الذاكرة) إلى TXT/CSV كمهمة في الخلفية."""
+    if not processed_files_list:
+        status_container.warning("لم يتم العثور على أي ملفات Excel مُعالجة لتشفيرها/تحويلها.")
+        return None
+    job_id = get_job_runner().submit(
+        'txt', txt_job, list(processed_files_list), st.session_state.blob_session, get_result_cache(),
+        st.session_state.result_key, st.session_state.run_recorder, list(st.session_state.encrypted_files),
+        session_work_dir(), label='TXT/CSV'
+    )
+    st.query_params['txt_job'] = job_id
+    return job_id
 
-        except Exception as e:
-            st.error(f"حدث خطأ أثناء التشفير/التحويل: {e}")
-            status.update(label=f"حدث خطأ أثناء التشفير/التحويل: {e}", state="error")
+
+def apply_txt_job(job, status_container):
+    """تطبيق نتيجة مهمة التحويل المنتهية على الجلسة الحالية."""
+    with status_container.container():
+        if job.state == JOB_CANCELLED:
+            st.info("تم إلغاء التشفير/التحويل.")
             return []
+        if job.state == JOB_FAILED:
+            st.error(f"حدث خطأ أثناء التشفير/التحويل: {job.error}")
+            return []
+
+        release_files(st.session_state.encrypted_files)
+        encrypted_files_list = store_files(job.result)
+        success_count = len(encrypted_files_list) // 2
+        st.success(f"اكتمل التشفير/التحويل بنجاح. تم تحويل **{success_count}** ملف (إلى TXT و CSV). 🎉")
+        st.session_state.encrypted_files = encrypted_files_list
+        st.session_state.txt_files_deleted = False # تأكيد وجود الملفات قبل الحذف
+        return encrypted_files_list
 
 # ----------------------------------------------------------------------
 
@@ -408,6 +499,7 @@ def delete_generated_txt_files_st(status_container):
         # تنفيذ عملية الحذف من قائمة الملفات المشفرة في الذاكرة
         try:
             new_encrypted_files = [f for f in st.session_state.encrypted_files if not f['filename'].endswith('.txt')]
+            release_files([f for f in st.session_state.encrypted_files if f['filename'].endswith('.txt')])
             
             deleted_count = initial_count - len([f for f in new_encrypted_files if f['filename'].endswith('.txt')])
             st.session_state.encrypted_files = new_encrypted_files
@@ -436,10 +528,12 @@ st.markdown("---")
 
 # 1. رفع ملف الإدخال
 st.header("1. تحميل ملف الإدخال")
-uploaded_file = st.file_uploader(
-    "اختر ملف الإكسل (يجب أن يحتوي على الأعمدة: الاسم، Iban، الراتب الصافي)", 
-    type=['xlsx', 'xls'],
-    key="file_uploader"
+uploaded_files = st.file_uploader(
+    "اختر ملف الإكسل أو CSV/Parquet (يجب أن يحتوي على الأعمدة: الاسم، Iban، الراتب الصافي)", 
+    type=['xlsx', 'xls', 'csv', 'parquet'],
+    accept_multiple_files=True,
+    key="file_uploader",
+    help="يمكن رفع عدة ملفات (مثلاً ملف لكل قسم)؛ تُدمج كلها قبل التقسيم حسب المصرف/الفرع."
 )
 
 # حاويات عرض الحالة/النتائج
@@ -451,27 +545,44 @@ st.markdown("---")
 st.header("2. بدء المعالجة (إنشاء ملفات Excel مقسمة) 🚀")
 process_status_container = st.empty()
 
-if st.button("بدء المعالجة 🚀", key="process_button", disabled=uploaded_file is None):
-    with st.spinner("جاري تهيئة المعالجة..."):
-        # تشغيل دالة المعالجة وتحديث حالة الجلسة
-        process_excel_data_st(uploaded_file, process_status_container)
+min_files_mode = st.checkbox(
+    "تقليل عدد الملفات (قد يُعاد ترتيب الصفوف داخل الفرع)",
+    key="min_files_mode",
+    help="توزيع الصفوف على أقل عدد ممكن من الملفات مع احترام حدي عدد الصفوف والمبلغ الأقصى."
+)
+
+export_workers = st.number_input(
+    "عدد العمليات المتوازية لقراءة ملفات الإدخال وكتابة ملفات Excel",
+    min_value=1,
+    max_value=os.cpu_count() or 1,
+    value=1,
+    key="export_workers",
+    help="1 = تسلسلي. القيم الأكبر توزع قراءة ملفات الإدخال المتعددة وكتابة الملفات على عدة أنوية (مفيد للملفات الكبيرة)."
+)
+
+st.checkbox(
+    "وضع التحليل العميق (cProfile / tracemalloc)",
+    key="deep_profile",
+    help="يسجل أعلى الدوال زمناً وذروة تخصيصات الذاكرة لكل مرحلة في تقرير الأداء. يبطئ المعالجة بشكل ملحوظ."
+)
+
+if st.button("بدء المعالجة 🚀", key="process_button", disabled=not uploaded_files or job_running('process')):
+    # تُنفذ المعالجة في الخلفية؛ متابعتها (وتطبيق نتيجتها) في follow_job أدناه
+    start_processing_st(
+        uploaded_files,
+        split_mode='min_files' if min_files_mode else 'greedy',
+        export_workers=int(export_workers)
+    )
+
+follow_job('process', "المعالجة", process_status_container, apply_processing_job)
 
 if st.session_state.processed_files:
     results_container.header("نتائج المعالجة (ملفات Excel)")
     
     # عرض رابط لتحميل جميع الملفات المعالجة في ملف مضغوط (لتجنب عرض الكثير من الأزرار)
-    def create_zip_file(files_list):
-        from zipfile import ZipFile
-        temp_zip_buffer = io.BytesIO()
-        with ZipFile(temp_zip_buffer, 'w') as zip_file:
-            for file_data in files_list:
-                zip_file.writestr(file_data['filename'], file_data['content'])
-        return temp_zip_buffer.getvalue()
-
-    zip_content = create_zip_file(st.session_state.processed_files)
     st.download_button(
         label=f"تحميل جميع ملفات الإكسل ({len(st.session_state.processed_files)} ملف) 📥",
-        data=zip_content,
+        data=zip_download_data('excel', st.session_state.processed_files),
         file_name=f"Processed_Excel_Files_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
         mime="application/zip",
         help="تحميل كافة ملفات الإكسل الناتجة والمقسمة."
@@ -482,21 +593,57 @@ if st.session_state.processed_files:
             {'اسم الملف': f['filename'], 'المصرف': f['bank_name'], 'الفرع': f['branch_code'], 'عدد الصفوف': f['rows'], 'المبلغ الإجمالي (د.ع)': f['amount']}
             for f in st.session_state.processed_files
         ])
+        changes = st.session_state.manifest_changes
+        if changes is not None:
+            # حالة كل ملف مقارنة بالمعالجة السابقة في هذه الجلسة
+            files_df['الحالة'] = files_df['اسم الملف'].map(lambda name: CHUNK_STATUS_LABELS.get(changes['files'].get(name), ''))
         st.dataframe(files_df, use_container_width=True)
+        if changes is not None and changes['removed']:
+            st.caption("ملفات لم تعد ضمن النتائج: " + "، ".join(changes['removed']))
+
+    if st.session_state.source_stats:
+        with st.expander(f"ملفات الإدخال المدمجة ({len(st.session_state.source_stats)} ملف)"):
+            st.dataframe(pd.DataFrame([
+                {SOURCE_FILE_COL: s['source'], 'الصفوف المقبولة': s['rows'], 'المبلغ الإجمالي (د.ع)': s['amount'],
+                 'الصفوف المرفوضة': s['rejected'], 'منها IBAN مكرر': s['duplicates']}
+                for s in st.session_state.source_stats
+            ]), use_container_width=True)
+
+if st.session_state.rejects is not None:
+    rejects = st.session_state.rejects
+    st.download_button(
+        label=f"تحميل ملف الصفوف المرفوضة ({len(rejects)} صف) 📥",
+        data=lambda rejects=rejects: build_rejects_workbook(rejects)['content'],
+        file_name=f"Rejected_Rows_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        help="كل صف محذوف من ملف الإدخال مع رقمه وسبب الرفض."
+    )
+    with st.expander("أسباب رفض الصفوف"):
+        reason_cols = [SOURCE_FILE_COL, REJECT_REASON_COL] if SOURCE_FILE_COL in rejects.columns else [REJECT_REASON_COL]
+        st.dataframe(
+            rejects.value_counts(reason_cols).reset_index(name='عدد الصفوف'),
+            use_container_width=True
+        )
 
 st.markdown("---")
 
-# 3. إنشاء ملخص الإحصائيات
-st.header("3. إنشاء ملخص الإحصائيات 📊")
-summary_status_container = st.empty()
-
-if st.button("إنشاء ملخص الإحصائيات 📊", key="summary_button", disabled=not st.session_state.processed_files):
-    create_summary_file_st(st.session_state.processed_files, summary_status_container)
-
-if st.session_state.summary_file:
+# 3. ملخص الإحصائيات (يُنشأ تلقائياً مع المعالجة)
+st.header("3. ملخص الإحصائيات 📊")
+
+if not st.session_state.summary_file:
+    st.caption("يُنشأ ملف الملخص (نظرة عامة، ورقة لكل مصرف، والمطابقة مع الإدخال) تلقائياً بعد المعالجة.")
+else:
+    check = st.session_state.reconciliation
+    if check is not None and check['ok'] is not None:
+        if check['ok']:
+            st.success(f"المطابقة: مجموع ملفات المصارف ({check['file_rows']} صف، {check['file_amount']:,.0f} د.ع) "
+                       "يساوي مجموع الإدخال المقبول. ✔")
+        else:
+            st.error(f"المطابقة: مجموع ملفات المصارف ({check['file_rows']} صف، {check['file_amount']:,.0f} د.ع) "
+                     f"لا يساوي مجموع الإدخال المقبول ({check['input_rows']} صف، {check['input_amount']:,.0f} د.ع).")
     st.download_button(
         label="تحميل ملف الملخص الإحصائي 📥",
-        data=st.session_state.summary_file['content'],
+        data=blob_download_data(st.session_state.blob_session, st.session_state.summary_file['blob']),
         file_name=st.session_state.summary_file['filename'],
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         help="تحميل ملف الإكسل الذي يحتوي على الملخص الإحصائي الهيكلي."
@@ -508,23 +655,32 @@ st.markdown("---")
 st.header("4. تشفير الملفات (تحويل المقسمة إلى TXT/CSV) 🔑")
 encryption_status_container = st.empty()
 
-if st.button("تشفير الملفات 🔑", key="encryption_button", disabled=not st.session_state.processed_files):
+if st.button("تشفير الملفات 🔑", key="encryption_button",
+             disabled=not st.session_state.processed_files or job_running('txt')):
     batch_convert_excel_to_csv_txt_st(st.session_state.processed_files, encryption_status_container)
 
+follow_job('txt', "التشفير/التحويل", encryption_status_container, apply_txt_job)
+
 if st.session_state.encrypted_files:
     # عرض رابط لتحميل ملفات التشفير (TXT/CSV)
     
-    encrypted_zip_content = create_zip_file(st.session_state.encrypted_files)
+    txt_zip_level = st.selectbox(
+        "مستوى ضغط الأرشيف",
+        options=[None, 1, 6, 9],
+        format_func=lambda level: "بدون ضغط (الأسرع)" if level is None else f"DEFLATE مستوى {level}",
+        key="txt_zip_level",
+        help="ملفات TXT/CSV نصية وتتقلص كثيراً بالضغط؛ ملفات xlsx تُخزن دائماً دون إعادة ضغط."
+    )
     st.download_button(
         label=f"تحميل ملفات TXT و CSV المشفرة/المحولة ({len(st.session_state.encrypted_files)} ملف) 📥",
-        data=encrypted_zip_content,
+        data=zip_download_data('txt', st.session_state.encrypted_files, txt_zip_level),
         file_name=f"Encrypted_Files_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
         mime="application/zip",
         help="تحميل كافة الملفات الناتجة بتنسيق TXT و CSV."
     )
     
     with st.expander("معاينة أسماء الملفات المشفرة/المحولة"):
-        enc_files_df = pd.DataFrame([{'اسم الملف': f['filename'], 'الحجم': f'{len(f["content"])/1024:.2f} KB'} for f in st.session_state.encrypted_files])
+        enc_files_df = pd.DataFrame([{'اسم الملف': f['filename'], 'الحجم': f'{f["size"]/1024:.2f} KB'} for f in st.session_state.encrypted_files])
         st.dataframe(enc_files_df, use_container_width=True)
 
 st.markdown("---")
@@ -543,6 +699,121 @@ if st.button(f"حذف ملفات TXT المقسمة ({txt_file_count} ملف) 
         delete_generated_txt_files_st(deletion_status_container)
         st.rerun() # إعادة تشغيل التطبيق لعكس حالة الحذف
 
+# 6. المقارنة مع تشغيل سابق
+if st.session_state.history_run_id is not None:
+    st.markdown("---")
+    st.header("6. المقارنة مع شهر سابق 📈")
+    run_history = get_run_history()
+    previous_runs = [run for run in run_history.list_runs() if run['run_id'] != st.session_state.history_run_id]
+    if not previous_runs:
+        st.info("لا توجد تشغيلات سابقة محفوظة للمقارنة بعد.")
+    else:
+        default_previous = run_history.previous_run_id(st.session_state.history_run_id)
+        previous_ids = [run['run_id'] for run in previous_runs]
+        runs_by_id = {run['run_id']: run for run in previous_runs}
+        previous_run_id = st.selectbox(
+            "التشغيل السابق",
+            options=previous_ids,
+            index=previous_ids.index(default_previous) if default_previous in previous_ids else 0,
+            format_func=lambda run_id: (
+                f"{runs_by_id[run_id]['run_date']} — {runs_by_id[run_id]['label'] or ''} "
+                f"({runs_by_id[run_id]['row_count']} صف)"
+            ),
+            key="diff_previous_run"
+        )
+        threshold_amount_column, threshold_percent_column = st.columns(2)
+        min_change_amount = threshold_amount_column.number_input(
+            "أقل فرق في الراتب (د.ع)", min_value=0, value=DIFF_MIN_CHANGE_AMOUNT, step=10_000, key="diff_min_amount"
+        )
+        min_change_percent = threshold_percent_column.number_input(
+            "أقل نسبة تغير في الراتب (٪)", min_value=0.0, value=DIFF_MIN_CHANGE_PERCENT, step=1.0, key="diff_min_percent"
+        )
+        if st.button("مقارنة 📈", key="diff_button"):
+            with st.spinner("جاري المقارنة..."):
+                st.session_state.payroll_diff = run_history.diff(
+                    previous_run_id, st.session_state.history_run_id,
+                    min_change_amount=min_change_amount, min_change_percent=min_change_percent
+                )
+
+    payroll_diff = st.session_state.payroll_diff
+    if payroll_diff is not None:
+        st.dataframe(payroll_diff['by_bank'], use_container_width=True)
+        st.download_button(
+            label="تحميل تقرير المقارنة 📥",
+            data=lambda payroll_diff=payroll_diff: build_diff_workbook(payroll_diff)['content'],
+            file_name=f"Payroll_Diff_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key="diff_download"
+        )
+        for title, key in [("مستفيدون جدد", 'added'), ("مستفيدون محذوفون", 'removed'), ("تغير الراتب", 'changed')]:
+            with st.expander(f"{title} ({len(payroll_diff[key])})"):
+                st.dataframe(payroll_diff[key], use_container_width=True)
+
+# تقرير أداء آخر تشغيل (زمن وذاكرة كل مرحلة ومجموعة BIC)
+if st.session_state.run_recorder is not None and st.session_state.run_recorder.stages:
+    run_report = st.session_state.run_recorder.report()
+    st.markdown("---")
+    with st.expander(f"⏱️ تقرير أداء التشغيل ({run_report['total_s']:.2f} ثانية)"):
+        st.dataframe(pd.DataFrame(run_report['stages']), use_container_width=True)
+        st.caption(
+            "peak_rss_mb: أعلى ذاكرة مقيمة للخادم أثناء المرحلة (تشمل الجلسات الأخرى المتزامنة)،"
+            " و rss_growth_mb: زيادتها عن بداية المرحلة."
+        )
+        if run_report['groups']:
+            st.caption("حسب مجموعة BIC (المصرف_الفرع):")
+            st.dataframe(pd.DataFrame(run_report['groups']), use_container_width=True)
+        report_stamp = st.session_state.run_recorder.started_at.strftime('%Y%m%d_%H%M%S')
+        json_column, csv_column = st.columns(2)
+        json_column.download_button(
+            "تحميل التقرير (JSON) 📥",
+            data=st.session_state.run_recorder.to_json(),
+            file_name=f"Run_Report_{report_stamp}.json",
+            mime="application/json",
+            key="run_report_json"
+        )
+        csv_column.download_button(
+            "تحميل التقرير (CSV) 📥",
+            data=st.session_state.run_recorder.to_csv(),
+            file_name=f"Run_Report_{report_stamp}.csv",
+            mime="text/csv",
+            key="run_report_csv"
+        )
+        if run_report.get('profile'):
+            st.code(run_report['profile'], language=None)
+
+# إحصائيات ذاكرة النتائج المؤقتة (بعد تنفيذ أزرار هذه الدورة)
+cache_stats = get_result_cache().summary()
+with st.sidebar:
+    st.subheader("الذاكرة المؤقتة للنتائج 🗄️")
+    st.metric("إصابات (ذاكرة/قرص)", f"{cache_stats['hits']} / {cache_stats['disk_hits']}")
+    st.metric("إخفاقات", cache_stats['misses'])
+    st.caption(
+        f"المدخلات: {cache_stats['entries']} — الحجم: {cache_stats['memory_bytes'] / (1024 * 1024):.1f} MB"
+        f" — عمليات الإخلاء: {cache_stats['evictions']}"
+    )
+
+    # استهلاك الذاكرة لملفات هذه الجلسة: قبل إزالة التكرار (المنطقي) وبعدها (الفعلي)
+    session_files = st.session_state.processed_files + st.session_state.encrypted_files
+    if st.session_state.summary_file:
+        session_files = session_files + [st.session_state.summary_file]
+    blob_stats = get_blob_store().stats()
+    st.subheader("ذاكرة ملفات الجلسة 💾")
+    st.caption(
+        f"هذه الجلسة: {sum(f['size'] for f in session_files) / (1024 * 1024):.1f} MB منطقياً"
+        f" ← {st.session_state.blob_session.held_bytes() / (1024 * 1024):.1f} MB فعلياً (بعد إزالة التكرار)"
+    )
+    st.caption(
+        f"كل الجلسات: {blob_stats['memory_bytes'] / (1024 * 1024):.1f} MB في الذاكرة"
+        f" + {blob_stats['disk_bytes'] / (1024 * 1024):.1f} MB على القرص ({blob_stats['blobs']} ملف فريد)"
+    )
+
+    job_stats = get_job_runner().stats()
+    st.subheader("مهام الخلفية ⚙️")
+    st.caption(
+        f"قيد التنفيذ: {job_stats['running']} من {job_stats['max_concurrent']}"
+        f" — في الانتظار: {job_stats['queued']} — منتهية: {job_stats['finished']}"
+    )
+
 # ملاحظة حول Streamlit:
 # لا تحتاج إلى دالة رئيسية (if __name__ == "__main__": app.mainloop())
 # Streamlit يتولى تشغيل الكود وتنفيذ الواجهة. لحفظ هذا الملف، احفظه بصيغة `app.py`
@@ -0,0 +1,95 @@
+"""مقارنة تحديد Receiver BIC المُتجه مع مسار df.apply الحالي.
+
+قبل القياس تُفحص حالات ثابتة صغيرة (فرع معروف، الرجوع إلى الإدارة العامة لفرع غير معروف
+أو رمز فرع غير رقمي، مصرف بلا فروع، IBAN مفقود، مفتاح مصرف غير معروف)؛ --check يشغّلها وحدها.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_bic_resolution.py --rows 100000 1000000
+    python benchmarks/bench_bic_resolution.py --check
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import payroll_core  # noqa: E402
+
+
+def make_ibans(n_rows, seed=0):
+    """توليد أرقام IBAN عشوائية تغطي كل المصارف وفروعها مع رموز فروع غير معروفة."""
+    rng = np.random.default_rng(seed)
+    keys = np.array(payroll_core.BANK_KEYS_FOR_FILTERING)
+    branch_codes = np.array(sorted({bic[8:] for bic in payroll_core.ALL_BRANCHES_BIC} | {'000', '123', '777'}))
+    bank = keys[rng.integers(0, len(keys), n_rows)]
+    branch = branch_codes[rng.integers(0, len(branch_codes), n_rows)]
+    account = rng.integers(0, 10**12, n_rows).astype(str)
+    ibans = pd.Series(bank).radd('IQ12') + pd.Series(branch) + pd.Series(account).str.zfill(12)
+    return ibans
+
+
+def check_cases():
+    """حالات ثابتة بنتيجتها المتوقعة، مع مطابقة df.apply حيث يُعرِّف نتيجة."""
+    head_office = payroll_core.BANK_BICS
+    cases = [
+        # (IBAN، BIC المتوقع، هل يُقارن مع df.apply)
+        ('IQ12NBIQ856000000000123', 'NBIQIQBA856', True),   # فرع معروف
+        ('IQ12AINI009000000000123', 'AINIIQBA009', True),
+        ('IQ12NBIQ999000000000123', head_office['NBIQ'], True),   # فرع غير معروف ← الإدارة العامة
+        ('IQ12NBIQABC000000000123', head_office['NBIQ'], True),   # رمز فرع غير رقمي
+        ('IQ12AINI1X2000000000123', head_office['AINI'], True),
+        ('IQ12NBIQ85', head_office['NBIQ'], True),                # IBAN قصير (رمز فرع ناقص)
+        ('IQ12RAFB856000000000123', head_office['RAFB'], True),   # مصرف بلا فروع ديناميكية
+        ('IQ12XXXX856000000000123', None, False),                 # مفتاح مصرف غير معروف
+        (np.nan, None, False),                                    # IBAN مفقود
+        (None, None, False),
+    ]
+    ibans = pd.Series([iban for iban, _, _ in cases], dtype=object)
+    resolved = payroll_core.resolve_receiver_bics(ibans)
+    for (iban, expected, compare_apply), bic in zip(cases, resolved):
+        if (None if pd.isna(bic) else bic) != expected:
+            raise AssertionError(f"BIC غير متوقع لـ {iban!r}: {bic!r} (المتوقع {expected!r})")
+        if compare_apply:
+            reference = payroll_core.get_receiver_bic_dynamic({'Iban': iban, 'Bank Key': iban[4:8]})
+            if reference != bic:
+                raise AssertionError(f"df.apply يعطي {reference!r} لـ {iban!r} والمسار المُتجه {bic!r}")
+    print({'check': 'bic_resolution', 'cases': len(cases), 'ok': True})
+
+
+def run(n_rows, include_apply=True):
+    ibans = make_ibans(n_rows)
+    df = pd.DataFrame({'Iban': ibans, 'Bank Key': ibans.str[4:8]})
+
+    start = time.perf_counter()
+    vectorized = payroll_core.resolve_receiver_bics(df['Iban'])
+    vectorized_time = time.perf_counter() - start
+
+    result = {'rows': n_rows, 'vectorized_s': round(vectorized_time, 4)}
+    if include_apply:
+        start = time.perf_counter()
+        expected = df.apply(payroll_core.get_receiver_bic_dynamic, axis=1)
+        apply_time = time.perf_counter() - start
+        if not vectorized.astype(object).equals(expected.astype(object)):
+            raise AssertionError(f"نتائج غير متطابقة عند {n_rows} صف")
+        result['apply_s'] = round(apply_time, 4)
+        result['speedup'] = round(apply_time / vectorized_time, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--skip-apply', action='store_true', help="قياس المسار المُتجه فقط")
+    parser.add_argument('--check', action='store_true', help="الحالات الثابتة فقط دون قياس الزمن")
+    args = parser.parse_args()
+    check_cases()
+    if args.check:
+        return
+    for n_rows in args.rows:
+        print(run(n_rows, include_apply=not args.skip_apply))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""قياس زمن البدء البارد: استيراد payroll_core/payroll_cli مقابل تحميل تطبيق Streamlit.
+
+كل قياس يُشغَّل في عملية Python جديدة ويُؤخذ الوسيط من عدة تكرارات.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_cold_start.py --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+TARGETS = {
+    'payroll_core': "import payroll_core",
+    'payroll_cli': "import payroll_cli",
+    'streamlit_app': "import streamlit, AllSal",
+}
+
+
+def measure(code, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, capture_output=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    results = {name: round(measure(code, args.repeat), 3) for name, code in TARGETS.items()}
+    results['cli_vs_app_ratio'] = round(results['payroll_cli'] / results['streamlit_app'], 2)
+    print(results)
+
+
+if __name__ == '__main__':
+    main()
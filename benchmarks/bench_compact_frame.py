@@ -0,0 +1,66 @@
+"""قياس ذاكرة الإطار المطبع: الإطار المضغوط (build_final_frame) مقابل الأعمدة الكاملة المكررة.
+
+الإطار الكامل هو ما كان يُبنى سابقاً (نص مكرر لكل عمود ثابت و Reference لكل صف)
+ويُعاد بناؤه هنا بـ expand_final_frame على الإطار كله. يُتحقق من أن توسيع كل شريحة
+من خطة التقسيم يطابق الشريحة نفسها من الإطار الكامل، ثم يُطبع الحجم العميق وزمن
+البناء والتقسيم لكل طريقة.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_compact_frame.py --rows 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+from payroll_generator import generate_payroll_frame  # noqa: E402
+import payroll_core  # noqa: E402
+
+RUN_DATE = datetime(2026, 1, 15)
+
+
+def deep_mb(frame):
+    return round(float(frame.memory_usage(deep=True).sum()) / 1024 / 1024, 1)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        cleaned, _, _ = payroll_core.clean_input_chunk(generate_payroll_frame(n_rows, seed=0))
+        bics = payroll_core.resolve_receiver_bics(cleaned['Iban'])
+
+        compact, compact_build = timed(payroll_core.build_final_frame, cleaned, RUN_DATE, bics)
+        full, expand_seconds = timed(payroll_core.expand_final_frame, compact)
+        compact_plan, compact_split = timed(payroll_core.build_split_plan, compact, 'greedy')
+        full_plan, full_split = timed(payroll_core.build_split_plan, full, 'greedy')
+
+        if len(compact_plan) != len(full_plan):
+            raise AssertionError("عدد الملفات في خطة التقسيم يختلف بين الطريقتين")
+        for compact_entry, full_entry in zip(compact_plan, full_plan):
+            pd.testing.assert_frame_equal(payroll_core.expand_final_frame(compact_entry['frame']),
+                                          full_entry['frame'], check_dtype=False)
+
+        print({
+            'rows': len(compact), 'files': len(compact_plan),
+            'full_mb': deep_mb(full), 'compact_mb': deep_mb(compact),
+            'ratio': round(deep_mb(full) / deep_mb(compact), 1),
+            'compact_build_s': round(compact_build, 3), 'full_expand_s': round(expand_seconds, 3),
+            'compact_split_s': round(compact_split, 3), 'full_split_s': round(full_split, 3),
+        })
+
+
+if __name__ == '__main__':
+    main()
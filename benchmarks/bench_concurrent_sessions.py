@@ -0,0 +1,459 @@
+"""اختبار حمل محلي: عدة مستخدمين متزامنين على خادم Streamlit واحد يشغّل AllSal.py.
+
+يُشغَّل `streamlit run` دون واجهة (headless) في عملية واحدة، ويتصل به كل مستخدم محاكى عبر
+websocket بنفس بروتوكول المتصفح (رسائل BackMsg/ForwardMsg): فتح الصفحة، رفع ملف رواتب
+تركيبي عبر /_stcore/upload_file، ثم النقر على بدء المعالجة (الملخص يُنشأ ضمنها) ← تشفير
+الملفات ← تحميل أرشيفي zip (دالتا التحميل المؤجلتان zip_download_data تُنفذان على الخادم
+ويُجلب الملف من رابطه كما يفعل المتصفح). كل المستخدمين يتشاركون إذاً موارد st.cache_resource
+في الخادم: ذاكرة النتائج ومخزن الملفات ومجموعة مهام الخلفية (PAYROLL_MAX_JOBS عبر --max-jobs)،
+فيظهر أثر تزاحم المهام في زمن كل خطوة. انتظار المهام كما في المتصفح: تُعاد أجزاء الصفحة
+(fragments) التي يطلب الخادم تحديثها دورياً، ولكل خطوة مهلة --timeout.
+
+يُطبع لكل عدد مستخدمين: النسب المئوية لزمن كل خطوة ولزمن المستخدم الكامل، وذروة الذاكرة
+المقيمة لعملية الخادم (مع عملياتها الفرعية) أثناء الجولة وبعدها من /proc. يُشغَّل خادم جديد
+لكل جولة. يتطلب حزمة websockets. التشغيل من جذر المستودع:
+    python benchmarks/bench_concurrent_sessions.py --users 1 4 8 --rows 20000
+"""
+import argparse
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+import zipfile
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackendOperationRequest, BackMsg, DeferredFileRequestPayload
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+try:
+    from websockets.sync.client import connect
+except ImportError:  # حزمة websockets غير مثبتة
+    connect = None
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, os.path.dirname(__file__))
+from payroll_generator import write_payroll_workbook  # noqa: E402
+
+APP_PATH = os.path.abspath(os.path.join(ROOT, 'AllSal.py'))
+STEPS = ['open', 'upload', 'process', 'encrypt', 'download', 'total']
+PERCENTILES = (50, 90, 95, 99)
+RSS_SAMPLE_SECONDS = 0.2
+SERVER_START_SECONDS = 60
+# بداية عنوان زري تحميل الأرشيفين في AllSal.py (لا يحملان مفتاحاً ثابتاً)
+EXCEL_DOWNLOAD_LABEL = "تحميل جميع ملفات الإكسل"
+TXT_DOWNLOAD_LABEL = "تحميل ملفات TXT"
+
+
+def tree_rss_mb(pid):
+    """الذاكرة المقيمة الحالية لعملية وعملياتها الفرعية (MB) من /proc، أو None على الأنظمة الأخرى."""
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total, pending, seen = 0, [pid], False
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/statm') as handle:
+                total += int(handle.read().split()[1]) * page_size
+            seen = True
+            with open(f'/proc/{current}/task/{current}/children') as handle:
+                pending.extend(int(child) for child in handle.read().split())
+        except (OSError, ValueError):  # انتهت العملية أو /proc غير متاح
+            continue
+    return round(total / (1024 * 1024), 1) if seen else None
+
+
+class RssSampler(threading.Thread):
+    """عينات دورية لذاكرة عملية الخادم أثناء الجولة."""
+
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.peak = tree_rss_mb(pid)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(RSS_SAMPLE_SECONDS):
+            rss = tree_rss_mb(self.pid)
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def start_server(env):
+    """تشغيل خادم streamlit دون واجهة وانتظار جاهزيته؛ يُرجع (العملية، العنوان)."""
+    port = free_port()
+    command = [sys.executable, '-m', 'streamlit', 'run', APP_PATH, '--server.headless', 'true',
+               '--server.port', str(port), '--server.address', '127.0.0.1',
+               # المستخدمون المحاكون لا يحملون ملف تعريف XSRF الذي يضعه المتصفح
+               '--server.enableXsrfProtection', 'false', '--server.fileWatcherType', 'none',
+               '--browser.gatherUsageStats', 'false']
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.perf_counter() + SERVER_START_SECONDS
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"توقف خادم streamlit عند البدء (رمز الخروج {process.returncode})")
+        try:
+            with urllib.request.urlopen(f'{base_url}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise TimeoutError("لم يصبح خادم streamlit جاهزاً")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+class AppClient:
+    """جلسة متصفح محاكاة: اتصال websocket واحد بالخادم وحالة عناصر الصفحة فيه.
+
+    خيط القراءة يحدّث العناصر التفاعلية (الأزرار ورافع الملفات) من رسائل آخر تشغيل كامل،
+    ويسجل أجزاء الصفحة التي يطلب الخادم إعادتها دورياً وردود طلبات الرفع والتحميل.
+    """
+
+    def __init__(self, base_url, timeout, poll):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.poll = poll
+        self.session_id = None
+        self.query_string = ''
+        self.page_script_hash = ''
+        self.widget_states = {}  # حالات محفوظة تُرسل مع كل إعادة تشغيل (رافع الملفات)
+        self.elements = {}
+        self.auto_reruns = {}  # fragment_id -> [الفاصل، موعد الإعادة التالية]
+        self.responses = {}
+        self.errors = []
+        self.full_runs = 0
+        self.running = False
+        self.closed = False
+        self._condition = threading.Condition()
+        ws_url = base_url.replace('http://', 'ws://') + '/_stcore/stream'
+        self._socket = connect(ws_url, subprotocols=['streamlit'], max_size=None, open_timeout=timeout)
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def close(self):
+        self._socket.close()
+        self._reader.join(timeout=5)
+
+    def _read(self):
+        try:
+            for data in self._socket:
+                message = ForwardMsg()
+                message.ParseFromString(data)
+                with self._condition:
+                    self._handle(message)
+                    self._condition.notify_all()
+        except Exception as error:  # انقطع الاتصال
+            self.errors.append(f"websocket: {type(error).__name__}: {error}")
+        finally:
+            with self._condition:
+                self.closed = True
+                self._condition.notify_all()
+
+    def _handle(self, message):
+        kind = message.WhichOneof('type')
+        if kind == 'new_session':
+            if message.new_session.HasField('initialize'):
+                self.session_id = message.new_session.initialize.session_id
+            self.page_script_hash = message.new_session.page_script_hash
+            self.running = True
+            if not message.new_session.fragment_ids_this_run:  # تشغيل كامل يعيد بناء الصفحة
+                self.elements = {}
+                self.auto_reruns = {}
+        elif kind == 'delta' and message.delta.WhichOneof('type') == 'new_element':
+            element = message.delta.new_element
+            element_type = element.WhichOneof('type')
+            if element_type in ('button', 'download_button', 'file_uploader'):
+                widget = getattr(element, element_type)
+                self.elements[widget.id] = (element_type, widget)
+            elif element_type == 'exception':
+                self.errors.append(f"{element.exception.type}: {element.exception.message}")
+        elif kind == 'auto_rerun':
+            interval = message.auto_rerun.interval
+            self.auto_reruns[message.auto_rerun.fragment_id] = [interval, time.perf_counter() + interval]
+        elif kind == 'page_info_changed':
+            self.query_string = message.page_info_changed.query_string
+        elif kind == 'script_finished':
+            status = message.script_finished
+            if status != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                self.running = False
+            if status == ForwardMsg.FINISHED_SUCCESSFULLY:
+                self.full_runs += 1
+            elif status == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                self.errors.append("خطأ في ترجمة السكربت")
+        elif kind == 'file_urls_response':
+            self.responses[message.file_urls_response.response_id] = message.file_urls_response
+        elif kind == 'backend_operation_response':
+            self.responses[message.backend_operation_response.request_id] = message.backend_operation_response
+
+    def _send(self, back_msg):
+        self._socket.send(back_msg.SerializeToString())
+
+    def _rerun(self, triggers=(), fragment_id=''):
+        back_msg = BackMsg()
+        state = back_msg.rerun_script
+        state.query_string = self.query_string
+        state.page_script_hash = self.page_script_hash
+        state.widget_states.widgets.extend(self.widget_states.values())
+        for widget_id in triggers:
+            state.widget_states.widgets.add(id=widget_id, trigger_value=True)
+        if fragment_id:
+            state.fragment_id = fragment_id
+            state.is_auto_rerun = True
+        self.running = True
+        self._send(back_msg)
+
+    def _wait(self, condition, what):
+        """انتظار تحقق الشرط مع إعادة أجزاء الصفحة الدورية، بحد أقصى self.timeout ثانية."""
+        deadline = time.perf_counter() + self.timeout
+        with self._condition:
+            while not condition():
+                if self.errors:
+                    raise RuntimeError(self.errors[0])
+                if self.closed:
+                    raise RuntimeError("أُغلق الاتصال بالخادم")
+                now = time.perf_counter()
+                if now > deadline:
+                    raise TimeoutError(f"انتهت مهلة انتظار {what}")
+                if not self.running:
+                    for fragment_id, schedule in list(self.auto_reruns.items()):
+                        if now >= schedule[1]:
+                            schedule[1] = now + schedule[0]
+                            self._rerun(fragment_id=fragment_id)
+                            break
+                self._condition.wait(min(self.poll, max(0.0, deadline - now)))
+
+    def run(self, triggers=()):
+        """إعادة تشغيل كاملة (مع نقرات أزرار اختيارية) وانتظار انتهائها."""
+        with self._condition:
+            runs = self.full_runs
+            self._rerun(triggers)
+        self._wait(lambda: self.full_runs > runs and not self.running, "تشغيل السكربت")
+
+    def find(self, element_type, key=None, label=None):
+        for widget_id, (kind, widget) in list(self.elements.items()):
+            if kind != element_type:
+                continue
+            if key is not None and widget_id.endswith(f'-{key}'):
+                return widget
+            if label is not None and widget.label.startswith(label):
+                return widget
+        return None
+
+    def wait_for_element(self, element_type, what, key=None, label=None):
+        """إعادة أجزاء الصفحة حتى يظهر العنصر في تشغيل كامل منتهٍ (انتهاء مهمة الخلفية)."""
+        self._wait(lambda: not self.running and self.find(element_type, key, label) is not None, what)
+        return self.find(element_type, key, label)
+
+    def _request(self, back_msg, request_id, what):
+        with self._condition:
+            self._send(back_msg)
+        self._wait(lambda: request_id in self.responses, what)
+        return self.responses.pop(request_id)
+
+    def upload(self, path):
+        """رفع ملف كما يفعل المتصفح: طلب رابط الرفع، ثم PUT للملف، ثم إعادة تشغيل بحالة رافع الملفات."""
+        name = os.path.basename(path)
+        request_id = uuid.uuid4().hex
+        back_msg = BackMsg()
+        back_msg.file_urls_request.request_id = request_id
+        back_msg.file_urls_request.file_names.append(name)
+        back_msg.file_urls_request.session_id = self.session_id
+        response = self._request(back_msg, request_id, "رابط الرفع")
+        if response.error_msg:
+            raise RuntimeError(response.error_msg)
+        urls = response.file_urls[0]
+
+        with open(path, 'rb') as handle:
+            content = handle.read()
+        boundary = uuid.uuid4().hex
+        body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n').encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+        request = urllib.request.Request(urllib.parse.urljoin(self.base_url, urls.upload_url), data=body, method='PUT',
+                                         headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+        uploader = self.find('file_uploader', key='file_uploader')
+        state = WidgetState(id=uploader.id)
+        info = state.file_uploader_state_value.uploaded_file_info.add(name=name, size=len(content),
+                                                                      file_id=urls.file_id)
+        info.file_urls.CopyFrom(urls)
+        self.widget_states[uploader.id] = state
+        self.run()
+
+    def click(self, key):
+        self.run(triggers=[self.find('button', key=key).id])
+
+    def download(self, button):
+        """تنفيذ دالة التحميل المؤجلة على الخادم وجلب الملف من رابطه؛ يُرجع عدد ملفات الأرشيف."""
+        url = button.url
+        if not url:
+            request_id = uuid.uuid4().hex
+            back_msg = BackMsg(backend_operation_request=BackendOperationRequest(
+                request_id=request_id, session_id=self.session_id,
+                deferred_file=DeferredFileRequestPayload(file_id=button.deferred_file_id)))
+            response = self._request(back_msg, request_id, "رابط التحميل")
+            if response.error_msg:
+                raise RuntimeError(response.error_msg)
+            url = response.deferred_file.url
+        with urllib.request.urlopen(urllib.parse.urljoin(self.base_url, url), timeout=self.timeout) as response:
+            content = response.read()
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            return len(archive.namelist())
+
+
+def run_user(base_url, path, args, barrier, results):
+    """مسار مستخدم واحد؛ يضيف زمن كل خطوة (أو الخطأ) إلى results."""
+    timings = {}
+    client = None
+    try:
+        barrier.wait()
+        user_start = time.perf_counter()
+
+        start = time.perf_counter()
+        client = AppClient(base_url, args.timeout, args.poll)
+        client.run()
+        timings['open'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        client.upload(path)
+        timings['upload'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        client.click('process_button')
+        client.wait_for_element('download_button', "المعالجة", label=EXCEL_DOWNLOAD_LABEL)
+        timings['process'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        client.click('encryption_button')
+        client.wait_for_element('download_button', "التشفير", label=TXT_DOWNLOAD_LABEL)
+        timings['encrypt'] = time.perf_counter() - start
+
+        # أزرار التحميل من آخر تشغيل كامل (كل تشغيل يسجل دوال تحميل مؤجلة جديدة)
+        start = time.perf_counter()
+        for label in (EXCEL_DOWNLOAD_LABEL, TXT_DOWNLOAD_LABEL):
+            if not client.download(client.find('download_button', label=label)):
+                raise RuntimeError("أرشيف التحميل فارغ")
+        timings['download'] = time.perf_counter() - start
+
+        timings['total'] = time.perf_counter() - user_start
+        results.append(timings)
+    except Exception as error:  # يُحسب المستخدم فاشلاً ويستمر الاختبار
+        results.append({'error': f"{type(error).__name__}: {error}"})
+    finally:
+        if client is not None:
+            client.close()
+
+
+def percentiles(values):
+    if not values:
+        return None
+    summary = {f'p{p}': round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+    summary['max'] = round(max(values), 3)
+    return summary
+
+
+def load_round(n_users, inputs, args, env):
+    """تشغيل n_users مستخدمين معاً على خادم جديد (يبدؤون في اللحظة نفسها) وإرجاع ملخص الجولة."""
+    process, base_url = start_server(env)
+    try:
+        barrier = threading.Barrier(n_users)
+        results = []
+        sampler = RssSampler(process.pid)
+        rss_idle = sampler.peak
+        sampler.start()
+        start = time.perf_counter()
+        threads = [threading.Thread(target=run_user, args=(base_url, inputs[i % len(inputs)], args, barrier, results))
+                   for i in range(n_users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        peak = sampler.stop()
+        rss_after = tree_rss_mb(process.pid)
+    finally:
+        stop_server(process)
+
+    ok = [r for r in results if 'error' not in r]
+    return {
+        'users': n_users, 'ok': len(ok), 'failed': len(results) - len(ok),
+        'errors': sorted({r['error'] for r in results if 'error' in r}),
+        'wall_s': round(wall, 3),
+        'latency_s': {step: percentiles([r[step] for r in ok]) for step in STEPS},
+        # الذاكرة المقيمة لعملية الخادم الواحدة (مع عملياتها الفرعية): قبل الجولة، وذروتها، وبعدها
+        'server_rss_idle_mb': rss_idle, 'server_peak_rss_mb': peak, 'server_rss_after_mb': rss_after,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 4, 8], help="أعداد المستخدمين المتزامنين")
+    parser.add_argument('--rows', type=int, default=20_000, help="صفوف ملف كل مستخدم")
+    parser.add_argument('--same-input', action='store_true', help="كل المستخدمين يرفعون نفس الملف")
+    parser.add_argument('--max-jobs', type=int, default=None, help="PAYROLL_MAX_JOBS لخادم الاختبار")
+    parser.add_argument('--poll', type=float, default=0.5, help="أقصى ثوانٍ بين فحوص الانتظار")
+    parser.add_argument('--timeout', type=float, default=120, help="مهلة كل خطوة بالثواني")
+    parser.add_argument('--output', help="حفظ النتائج كملف JSON")
+    args = parser.parse_args()
+    if connect is None:
+        parser.error("يتطلب هذا الاختبار حزمة websockets (pip install websockets)")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # ذاكرة نتائج وسجل تشغيلات ومجلدات تشغيل مؤقتة حتى لا يتأثر (أو يؤثر) سجل المستخدم الحقيقي
+        env = dict(os.environ,
+                   PAYROLL_CACHE_DIR=os.path.join(work_dir, 'cache'),
+                   PAYROLL_HISTORY_DB=os.path.join(work_dir, 'history.sqlite3'),
+                   PAYROLL_WORK_DIR=os.path.join(work_dir, 'runs'))
+        if args.max_jobs:
+            env['PAYROLL_MAX_JOBS'] = str(args.max_jobs)
+
+        # ملف مختلف لكل مستخدم في كل جولة حتى لا تُسترجع النتائج من ذاكرة النتائج
+        n_inputs = 1 if args.same_input else sum(args.users)
+        inputs = [write_payroll_workbook(os.path.join(work_dir, f'payroll_{seed}.xlsx'), args.rows, seed=seed)
+                  for seed in range(n_inputs)]
+
+        rounds = []
+        offset = 0
+        for n_users in args.users:
+            summary = load_round(n_users, inputs if args.same_input else inputs[offset:offset + n_users], args, env)
+            offset += n_users
+            print(summary)
+            rounds.append(summary)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump({'rows': args.rows, 'same_input': args.same_input, 'max_jobs': args.max_jobs, 'rounds': rounds},
+                      handle, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""مقارنة مسار الإدخال/الإخراج في الذاكرة مع مسار القرص (مجلد عمل لكل تشغيل).
+
+مسار الذاكرة يحاكي التطبيق السابق: بايتات الملف المرفوع (getvalue) في BytesIO، وملفات xlsx
+و TXT/CSV كبايتات، والأرشيف في SpooledTemporaryFile ثم read() للتحميل. مسار القرص: الملف
+المرفوع يُنسخ إلى مجلد التشغيل ويُقرأ منه، وملفات xlsx و TXT تُكتب مباشرة في المجلد (CSV
+رابط صلب لـ TXT)، والأرشيف يُكتب إلى ملف. يُتحقق أولاً من تطابق الملفات بايتاً ببايت ومن
+تطابق محتوى الأرشيفين، ثم يُطبع الزمن وذروة تخصيصات الذاكرة (tracemalloc) وحجم بايتات
+الملفات المحتفظ بها في الذاكرة بعد التشغيل.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_disk_io.py --rows 100000
+"""
+import argparse
+import gc
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+from payroll_generator import write_payroll_workbook  # noqa: E402
+from run_workspace import EXCEL_DIR, TXT_DIR, create_run_dir, read_output, spool_upload  # noqa: E402
+import payroll_core  # noqa: E402
+
+RUN_DATE = datetime(2026, 1, 15)
+
+
+def memory_run(path):
+    with open(path, 'rb') as handle:
+        upload = io.BytesIO(handle.read())
+    source = io.BytesIO(upload.getvalue())
+    source.name = os.path.basename(path)
+    files = payroll_core.split_payroll(source, today=RUN_DATE)['files']
+    txt_files = payroll_core.convert_files_to_txt(files)
+    archives = []
+    for files_list in (files, txt_files):
+        with payroll_core.build_zip_archive(files_list) as archive:
+            archives.append(archive.read())
+    return files, txt_files, archives
+
+
+def disk_run(path, root):
+    run_dir = create_run_dir(root)
+    with open(path, 'rb') as upload:
+        spooled = spool_upload(upload, run_dir)
+    files = payroll_core.split_payroll(spooled, today=RUN_DATE, output_dir=os.path.join(run_dir, EXCEL_DIR))['files']
+    txt_files = payroll_core.convert_files_to_txt(files, output_dir=os.path.join(run_dir, TXT_DIR))
+    archives = []
+    for name, files_list in (('excel.zip', files), ('txt.zip', txt_files)):
+        archives.append(payroll_core.write_zip_archive(os.path.join(run_dir, name), files_list))
+    return files, txt_files, archives
+
+
+def zip_members(archive):
+    source = io.BytesIO(archive) if isinstance(archive, bytes) else archive
+    with zipfile.ZipFile(source) as zip_file:
+        return {name: zip_file.read(name) for name in zip_file.namelist()}
+
+
+def check_equivalent(memory, disk):
+    for memory_files, disk_files in zip(memory[:2], disk[:2]):
+        if [f['filename'] for f in memory_files] != [f['filename'] for f in disk_files]:
+            raise AssertionError("أسماء الملفات غير متطابقة")
+        for memory_file, disk_file in zip(memory_files, disk_files):
+            if 'content' in disk_file or read_output(disk_file) != memory_file['content']:
+                raise AssertionError(f"الملف غير متطابق: {memory_file['filename']}")
+    for memory_archive, disk_archive in zip(memory[2], disk[2]):
+        if zip_members(memory_archive) != zip_members(disk_archive):
+            raise AssertionError("محتوى الأرشيف غير متطابق")
+
+
+def held_bytes(result):
+    """بايتات الملفات الناتجة المحتفظ بها في الذاكرة (قبل إزالة التكرار بين TXT و CSV)."""
+    files, txt_files, archives = result
+    size = sum(len(f['content']) for f in files + txt_files if f.get('content') is not None)
+    return size + sum(len(a) for a in archives if isinstance(a, bytes))
+
+
+def measure(run, *args):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = run(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, round(peak / (1024 * 1024), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000])
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as work_dir:
+            path = write_payroll_workbook(os.path.join(work_dir, 'payroll.xlsx'), n_rows, seed=0)
+            check_equivalent(memory_run(path), disk_run(path, work_dir))
+            for name, run, run_args in (('memory', memory_run, (path,)), ('disk', disk_run, (path, work_dir))):
+                result, seconds, peak = measure(run, *run_args)
+                print({
+                    'mode': name, 'rows': n_rows, 'input_mb': round(os.path.getsize(path) / (1024 * 1024), 2),
+                    'seconds': round(seconds, 3), 'traced_peak_mb': peak,
+                    'held_mb': round(held_bytes(result) / (1024 * 1024), 2),
+                })
+
+
+if __name__ == '__main__':
+    main()
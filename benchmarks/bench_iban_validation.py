@@ -0,0 +1,124 @@
+"""قياس التحقق المُتجه من IBAN (validate_ibans) مقارنة بتحقق صف بصف بلغة Python.
+
+تُولَّد أرقام IBAN صحيحة ثم يُفسد جزء منها (تبديل خانتين، رمز دولة خاطئ، رمز غير صالح،
+طول خاطئ) ويُكتب جزء آخر بأحرف صغيرة أو مسافات محيطة (صالحة بعد التوحيد)، ويُتحقق من تطابق
+أسباب الرفض مع المرجع قبل قياس الزمن. --check يشغّل حالات ثابتة صغيرة فقط (دون قياس).
+التشغيل من جذر المستودع:
+    python benchmarks/bench_iban_validation.py --rows 100000 1000000
+    python benchmarks/bench_iban_validation.py --check
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+from payroll_generator import generate_payroll_frame  # noqa: E402
+import payroll_core  # noqa: E402
+
+
+def reference_reason(iban):
+    """مرجع صف بصف (نفس ترتيب الفحوص في validate_ibans)."""
+    iban = str(iban).strip().upper()
+    if len(iban) != payroll_core.IBAN_LENGTH:
+        return 'length'
+    if iban[:2] != payroll_core.IBAN_COUNTRY_CODE:
+        return 'country'
+    if not all(ch.isdigit() or 'A' <= ch <= 'Z' for ch in iban) or not iban.isascii():
+        return 'chars'
+    rearranged = iban[4:] + iban[:4]
+    if int(''.join(str(int(ch, 36)) for ch in rearranged)) % 97 != 1:
+        return 'checksum'
+    return None
+
+
+def make_ibans(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    ibans = generate_payroll_frame(n_rows, seed=seed)['Iban'].dropna().astype(str).to_numpy(dtype=object)
+    corrupt = np.flatnonzero(rng.random(len(ibans)) < 0.05)
+    for position, kind in zip(corrupt, rng.integers(0, 6, len(corrupt))):
+        iban = ibans[position]
+        if kind == 0 and len(iban) > 12:
+            iban = iban[:10] + iban[11] + iban[10] + iban[12:]
+        elif kind == 1:
+            iban = 'IR' + iban[2:]
+        elif kind == 2:
+            iban = iban[:8] + '-' + iban[9:]
+        elif kind == 3:
+            iban = iban + '0'
+        elif kind == 4:
+            iban = iban.lower()
+        else:
+            iban = f' {iban}\t'
+        ibans[position] = iban
+    # فهرس يبدأ من رقم أول صف بيانات كما في دفعات iter_input_chunks
+    return pd.Series(ibans, index=pd.RangeIndex(payroll_core.INPUT_FIRST_DATA_ROW, payroll_core.INPUT_FIRST_DATA_ROW + len(ibans)))
+
+
+def check_cases():
+    """حالات ثابتة: الأحرف الصغيرة والمسافات المحيطة تُقبل بعد التوحيد، وبقية الأخطاء تُرفض."""
+    valid = make_ibans(20, seed=1).iloc[0]
+    cases = {
+        valid: None,
+        valid.lower(): None,
+        f'  {valid} ': None,
+        f'\t{valid.lower()}\n': None,
+        valid[:-1]: 'length',
+        'IR' + valid[2:]: 'country',
+        valid[:8] + '-' + valid[9:]: 'chars',
+        valid[:10] + valid[11] + valid[10] + valid[12:]: 'checksum',
+    }
+    ibans = pd.Series(list(cases))
+    rejected = payroll_core.validate_ibans(ibans).notna().tolist()
+    for (iban, expected), is_rejected in zip(cases.items(), rejected):
+        if reference_reason(iban) != expected or is_rejected != (expected is not None):
+            raise AssertionError(f"نتيجة غير متوقعة لـ {iban!r}")
+
+    # الدفعة المقبولة تحمل IBAN الموحد، ومفتاح المصرف يُؤخذ منه
+    frame = generate_payroll_frame(50, seed=2).dropna()
+    frame = frame[pd.to_numeric(frame['الراتب الصافي'], errors='coerce') > 0]
+    expected, _, _ = payroll_core.clean_input_chunk(frame)
+    messy = frame.assign(Iban=' ' + frame['Iban'].astype(str).str.lower() + ' ')
+    cleaned, _, rejects = payroll_core.clean_input_chunk(messy)
+    pd.testing.assert_frame_equal(cleaned, expected)
+    if len(rejects) != len(frame) - len(expected):
+        raise AssertionError("عدد المرفوض تغير بعد إضافة المسافات والأحرف الصغيرة")
+    print({'check': 'iban_normalization', 'cases': len(cases), 'rows': len(frame), 'ok': True})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--check', action='store_true', help="الحالات الثابتة فقط دون قياس الزمن")
+    args = parser.parse_args()
+
+    check_cases()
+    if args.check:
+        return
+    for n_rows in args.rows:
+        ibans = make_ibans(n_rows)
+
+        start = time.perf_counter()
+        reasons = payroll_core.validate_ibans(ibans)
+        vectorized = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = [reference_reason(iban) for iban in ibans]
+        per_row = time.perf_counter() - start
+
+        if not np.array_equal(reasons.isna().to_numpy(), np.array([reason is None for reason in expected])):
+            raise AssertionError("نتيجة التحقق المُتجه لا تطابق المرجع")
+        print({
+            'rows': len(ibans), 'rejected': int(reasons.notna().sum()),
+            'vectorized_s': round(vectorized, 3), 'per_row_s': round(per_row, 3),
+            'speedup': round(per_row / vectorized, 1),
+            'rows_per_s': round(len(ibans) / vectorized),
+        })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""قياس إعادة الإنشاء التدريجية: تصحيح راتب واحد ثم إعادة المعالجة مع إعادة استخدام الشرائح التي لم تتغير.
+
+يُعالج ملف تركيبي كاملاً، ثم يُعدل راتب صف واحد مقبول ويُعالج الملف المصحح مرتين: كاملاً
+ومع reuse من ملفات التشغيل الأول. يُتحقق من أن الناتجين متطابقان بايتاً ببايت (xlsx و TXT)
+وأن ملفاً واحداً فقط تغيرت بصمته قبل طباعة الأزمنة.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_incremental.py --rows 100000
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+from payroll_generator import generate_payroll_frame  # noqa: E402
+from run_manifest import CHUNK_CHANGED, build_manifest, compare_manifests, count_changes  # noqa: E402
+import payroll_core  # noqa: E402
+
+RUN_DATE = datetime(2026, 1, 15)
+
+
+def digests(files_list):
+    return [(f['filename'], hashlib.sha256(f['content']).hexdigest()) for f in files_list]
+
+
+def by_hash(files_list):
+    contents = {f['chunk_hash']: f['content'] for f in files_list}
+    return contents.get
+
+
+def timed_run(path, reuse_xlsx=None, reuse_txt=None):
+    start = time.perf_counter()
+    files = payroll_core.split_payroll(path, today=RUN_DATE, reuse=reuse_xlsx)['files']
+    txt_files = payroll_core.convert_files_to_txt(files, reuse=reuse_txt)
+    return files, txt_files, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000])
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        frame = generate_payroll_frame(n_rows, seed=0)
+        with tempfile.TemporaryDirectory() as work_dir:
+            original = os.path.join(work_dir, 'original.xlsx')
+            corrected = os.path.join(work_dir, 'corrected.xlsx')
+            frame.to_excel(original, index=False)
+            previous_files, previous_txt, first_seconds = timed_run(original)
+
+            # تصحيح راتب أول صف مقبول في ملف الإدخال
+            accepted, _, _ = payroll_core.read_payroll_rows(original)
+            row = frame.index[frame['Iban'] == accepted['Iban'].iloc[0]][0]
+            frame.loc[row, 'الراتب الصافي'] = frame.loc[row, 'الراتب الصافي'] + 1000
+            frame.to_excel(corrected, index=False)
+
+            full_files, full_txt, full_seconds = timed_run(corrected)
+            files, txt_files, incremental_seconds = timed_run(corrected, by_hash(previous_files), by_hash(previous_txt))
+
+        if digests(files) != digests(full_files) or digests(txt_files) != digests(full_txt):
+            raise AssertionError("ناتج إعادة الإنشاء التدريجية لا يطابق المعالجة الكاملة")
+        counts = count_changes(compare_manifests(build_manifest(previous_files), build_manifest(files)))
+        if counts[CHUNK_CHANGED] != 1:
+            raise AssertionError(f"يُتوقع تغير ملف واحد فقط: {counts}")
+        print({
+            'rows': n_rows, 'files': len(files), 'rewritten': sum(not f['reused'] for f in files),
+            'first_s': round(first_seconds, 3), 'full_s': round(full_seconds, 3),
+            'incremental_s': round(incremental_seconds, 3),
+            'speedup': round(full_seconds / incremental_seconds, 1),
+        })
+
+
+if __name__ == '__main__':
+    main()
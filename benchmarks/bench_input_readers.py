@@ -0,0 +1,126 @@
+"""مقارنة محركات قراءة الإدخال (input_readers) على نفس البيانات التركيبية.
+
+تُكتب البيانات نفسها كملف xlsx و csv و parquet، ثم يُقرأ كل ملف بكل محرك يدعمه
+(openpyxl و calamine لملف xlsx) في عملية مستقلة لقياس الزمن وذروة الذاكرة، ويُتحقق
+من أن الصفوف المنظفة (الاسم، IBAN، الراتب) وعدد المرفوض متطابقة بين كل المحركات.
+ويُتحقق كذلك من ملف xlsx بعنصر <dimension ref="A1"/> خاطئ (تكتبه بعض البرامج) بمقارنة
+ناتج كل محرك xlsx مع pd.read_excel.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_input_readers.py --rows 10000 100000
+"""
+import argparse
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+from payroll_generator import write_payroll_file  # noqa: E402
+import input_readers  # noqa: E402
+
+FORMAT_READERS = {'xlsx': ['openpyxl', 'calamine'], 'csv': ['csv'], 'parquet': ['parquet']}
+STALE_DIMENSION_ROWS = 200
+
+
+def child(reader, path):
+    """قراءة وتنظيف الملف بالمحرك المحدد ثم طباعة الصفوف والمرفوض والبصمة والزمن والذاكرة."""
+    import pandas as pd
+    import payroll_core
+
+    start = time.perf_counter()
+    with open(path, 'rb') as source:
+        cleaned, _, rejects = payroll_core.read_payroll_rows(source, reader=reader)
+    elapsed = time.perf_counter() - start
+    digest = int(pd.util.hash_pandas_object(pd.DataFrame({
+        'name': cleaned['الاسم'].astype(str),
+        'iban': cleaned['Iban'].astype(str),
+        'salary': cleaned['الراتب الصافي'].astype(float),
+    }), index=False).sum())
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{len(cleaned)} {len(rejects)} {digest} {elapsed:.3f} {peak_mb:.1f}")
+
+
+def measure(reader, path):
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', reader, path],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    rows, rejected, digest, elapsed, peak_mb = output[-5:]
+    return int(rows), int(rejected), digest, float(elapsed), float(peak_mb)
+
+
+def write_stale_dimension(path, n_rows=STALE_DIMENSION_ROWS):
+    """ملف xlsx تركيبي يُستبدل فيه نطاق الورقة المسجل بـ A1 (كما تكتبه بعض البرامج)."""
+    source = write_payroll_file(path + '.orig.xlsx', n_rows)
+    with zipfile.ZipFile(source) as original, zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as stale:
+        for item in original.infolist():
+            data = original.read(item.filename)
+            if item.filename == 'xl/worksheets/sheet1.xml':
+                data = re.sub(rb'<dimension ref="[^"]*"/>', b'<dimension ref="A1"/>', data)
+            stale.writestr(item, data)
+    os.remove(source)
+    return path
+
+
+def check_stale_dimension(tmp, available):
+    """كل محرك xlsx يقرأ كل صفوف ملف بنطاق A1 خاطئ، بنفس ناتج pd.read_excel."""
+    import pandas as pd
+    import payroll_core
+
+    path = write_stale_dimension(os.path.join(tmp, 'stale_dimension.xlsx'))
+    frame = pd.read_excel(path, dtype=object)[payroll_core.INPUT_REQUIRED_COLS]
+    frame.index = pd.RangeIndex(payroll_core.INPUT_FIRST_DATA_ROW, payroll_core.INPUT_FIRST_DATA_ROW + len(frame))
+    expected, _, expected_rejects = payroll_core.clean_input_chunk(frame)
+    for reader in FORMAT_READERS['xlsx']:
+        if reader not in available:
+            continue
+        cleaned, _, rejects = payroll_core.read_payroll_rows(path, reader=reader)
+        pd.testing.assert_frame_equal(cleaned, expected, check_dtype=False)
+        if len(rejects) != len(expected_rejects):
+            raise AssertionError(f"المرفوض من {reader} لا يطابق pd.read_excel")
+        print({'stale_dimension_rows': len(frame), 'reader': reader, 'accepted': len(cleaned), 'ok': True})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--child', nargs=2, metavar=('READER', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    available = input_readers.available_readers()
+    with tempfile.TemporaryDirectory() as tmp:
+        check_stale_dimension(tmp, available)
+        for n_rows in args.rows:
+            results = {}
+            for input_format, readers in FORMAT_READERS.items():
+                path = write_payroll_file(os.path.join(tmp, f"payroll_{n_rows}.{input_format}"), n_rows, seed=args.seed)
+                auto = input_readers.select_readers(path)[0]
+                for reader in readers:
+                    if reader not in available:
+                        print({'rows': n_rows, 'format': input_format, 'reader': reader, 'skipped': 'غير مثبت'})
+                        continue
+                    rows, rejected, digest, elapsed, peak_mb = measure(reader, path)
+                    results[(input_format, reader)] = (rows, digest)
+                    print({
+                        'rows': n_rows, 'format': input_format, 'reader': reader, 'auto': reader == auto,
+                        'file_mb': round(os.path.getsize(path) / 1024 / 1024, 2), 'seconds': elapsed,
+                        'rows_per_s': round(n_rows / elapsed), 'peak_rss_mb': peak_mb,
+                        'accepted': rows, 'rejected': rejected,
+                    })
+            reference = results.get(('xlsx', 'openpyxl'))
+            for key, value in results.items():
+                if value != reference:
+                    raise AssertionError(f"ناتج المحرك {key} لا يطابق openpyxl")
+
+
+if __name__ == '__main__':
+    main()
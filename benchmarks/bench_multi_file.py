@@ -0,0 +1,75 @@
+"""قياس قراءة عدة ملفات إدخال (ملف لكل قسم) تسلسلياً وبالتوازي، مع التحقق من الدمج.
+
+تُقسم بيانات تركيبية إلى عدة ملفات xlsx، ويُتحقق أولاً من أن معالجة الملفات معاً
+تُنتج نفس ملفات الإخراج (بايتاً ببايت) التي تنتجها معالجة ملف واحد بكل الصفوف، ثم
+يُكرر جزء من الصفوف في الملف الأخير للتحقق من رفض IBAN المكرر بين الملفات.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_multi_file.py --rows 60000 --files 4 --workers 1 2 4
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+from payroll_generator import generate_payroll_frame  # noqa: E402
+import payroll_core  # noqa: E402
+
+RUN_DATE = datetime(2026, 1, 15)
+
+
+def digests(result):
+    return [(f['filename'], hashlib.sha256(f['content']).hexdigest()) for f in result['files']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=60000)
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--duplicates', type=int, default=50)
+    args = parser.parse_args()
+
+    frame = generate_payroll_frame(args.rows, seed=0)
+    parts = np.array_split(np.arange(len(frame)), args.files)
+    with tempfile.TemporaryDirectory() as work_dir:
+        combined = os.path.join(work_dir, 'all.xlsx')
+        frame.to_excel(combined, index=False)
+        paths = []
+        for number, rows in enumerate(parts, start=1):
+            path = os.path.join(work_dir, f"department_{number}.xlsx")
+            frame.iloc[rows].to_excel(path, index=False)
+            paths.append(path)
+
+        reference = digests(payroll_core.split_payroll(combined, today=RUN_DATE))
+        for workers in args.workers:
+            start = time.perf_counter()
+            sources = payroll_core.read_payroll_sources(paths, workers=workers)[3]
+            read_seconds = time.perf_counter() - start
+            result = payroll_core.split_payroll(paths, today=RUN_DATE, read_workers=workers)
+            if digests(result) != reference:
+                raise AssertionError("ناتج دمج الملفات لا يطابق معالجة ملف واحد بكل الصفوف")
+            print({'rows': args.rows, 'files': args.files, 'workers': workers, 'read_s': round(read_seconds, 3),
+                   'accepted': sum(stats['rows'] for stats in sources)})
+
+        # تكرار صفوف مقبولة من الملف الأول في الملف الأخير
+        accepted, _, _ = payroll_core.read_payroll_rows(paths[0])
+        repeated = frame[frame['Iban'].isin(accepted['Iban'].head(args.duplicates))]
+        pd.concat([frame.iloc[parts[-1]], repeated]).to_excel(paths[-1], index=False)
+        result = payroll_core.split_payroll(paths, today=RUN_DATE)
+        duplicates = result['rejects'][payroll_core.REJECT_REASON_COL].str.startswith(payroll_core.DUPLICATE_IBAN_REASON)
+        if digests(result) != reference or duplicates.sum() != len(repeated):
+            raise AssertionError("لم تُرفض كل الصفوف المكررة بين الملفات")
+        print({'duplicated_rows': len(repeated), 'rejected_as_duplicate': int(duplicates.sum()),
+               'sources': [(stats['source'], stats['duplicates']) for stats in result['sources']]})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""قياس تدرج كتابة ملفات Excel المقسمة مع عدد العمليات (1 إلى N).
+
+يتحقق من تطابق البايتات والترتيب مع المسار التسلسلي لكل عدد عمليات.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_parallel_export.py --files 16 --workers 1 2 4
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+from bench_txt_export import make_slice  # noqa: E402
+from excel_export import export_excel_files  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=16)
+    parser.add_argument('--rows', type=int, default=4000)
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    frames = [make_slice(args.rows, seed) for seed in range(args.files)]
+    created = datetime(2026, 1, 1)
+    baseline = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        contents = export_excel_files(frames, workers=workers, created=created)
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline, baseline_time = contents, elapsed
+        elif contents != baseline:
+            raise AssertionError(f"الناتج مع {workers} عمليات لا يطابق المسار التسلسلي")
+        print({
+            'files': args.files, 'rows_per_file': args.rows, 'workers': workers,
+            'seconds': round(elapsed, 3), 'speedup': round(baseline_time / elapsed, 2),
+        })
+
+
+if __name__ == '__main__':
+    main()
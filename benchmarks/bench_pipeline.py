@@ -0,0 +1,158 @@
+"""قياس زمن كل مرحلة من خط المعالجة على ملفات تركيبية بعدة أحجام، مع حفظ النتائج بصيغة JSON.
+
+المراحل: read (قراءة وتنظيف)، bic (تحديد Receiver BIC)، frame (تجهيز الأعمدة)،
+split (خطة التقسيم)، xlsx (كتابة الملفات)، summary، txt، zip. لكل مرحلة يُحفظ أقل
+زمن وأوسطه عبر التكرارات وعدد الصفوف في الثانية. --compare يطبع نسبة كل مرحلة إلى
+ملف نتائج سابق لكشف التراجع في الأداء.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_pipeline.py --rows 10000 100000 --output bench_pipeline.json
+    python benchmarks/bench_pipeline.py --rows 10000 100000 --compare bench_pipeline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+from excel_export import export_excel_files  # noqa: E402
+from payroll_generator import write_payroll_workbook  # noqa: E402
+import payroll_core  # noqa: E402
+
+STAGES = ['read', 'bic', 'frame', 'split', 'xlsx', 'summary', 'txt', 'zip']
+RUN_DATE = datetime(2026, 1, 15)
+
+
+def run_pipeline(path, split_mode='greedy', workers=1):
+    """تشغيل المراحل بالترتيب وإرجاع (أزمنة المراحل بالثواني، إحصاءات الناتج)."""
+    timings = {}
+
+    def timed(stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    with open(path, 'rb') as source:
+        df_filtered, _, _ = timed('read', payroll_core.read_payroll_rows, source)
+    bics = timed('bic', payroll_core.resolve_receiver_bics, df_filtered['Iban'])
+    df_final = timed('frame', payroll_core.build_final_frame, df_filtered, RUN_DATE, bics)
+    split_plan = timed('split', payroll_core.build_split_plan, df_final, split_mode)
+
+    files = payroll_core.build_file_entries(split_plan, RUN_DATE)
+    contents = timed('xlsx', export_excel_files, [entry['frame'] for entry in split_plan], workers, RUN_DATE,
+                     writer=payroll_core.write_final_excel_bytes)
+    for file_data, content in zip(files, contents):
+        file_data['content'] = content
+
+    timed('summary', payroll_core.build_summary, files, RUN_DATE)
+    txt_files = timed('txt', payroll_core.convert_files_to_txt, files)
+
+    def zip_all():
+        archive = payroll_core.build_zip_archive(files + txt_files)
+        size = archive.seek(0, os.SEEK_END)
+        archive.close()
+        return size
+
+    zip_bytes = timed('zip', zip_all)
+    return timings, {
+        'rows_out': len(df_final),
+        'files': len(files),
+        'xlsx_bytes': sum(len(content) for content in contents),
+        'zip_bytes': zip_bytes,
+    }
+
+
+def benchmark_size(n_rows, repeat, split_mode, workers, seed):
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = write_payroll_workbook(os.path.join(work_dir, 'input.xlsx'), n_rows, seed=seed)
+        runs = [run_pipeline(path, split_mode, workers) for _ in range(repeat)]
+
+    stages = {}
+    for stage in STAGES:
+        samples = [timings[stage] for timings, _ in runs]
+        best = min(samples)
+        stages[stage] = {
+            'min_s': round(best, 4),
+            'median_s': round(statistics.median(samples), 4),
+            'rows_per_s': round(n_rows / best) if best else None,
+        }
+    total = min(sum(timings.values()) for timings, _ in runs)
+    return {'rows': n_rows, 'stages': stages, 'total_s': round(total, 4), 'output': runs[0][1]}
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline):
+    """طباعة نسبة أقل زمن لكل مرحلة إلى النتائج السابقة (أكبر من 1 يعني أبطأ)."""
+    previous = {entry['rows']: entry for entry in baseline['results']}
+    for entry in results:
+        old = previous.get(entry['rows'])
+        if old is None:
+            continue
+        ratios = {
+            stage: round(entry['stages'][stage]['min_s'] / old['stages'][stage]['min_s'], 2)
+            for stage in STAGES
+            if stage in old['stages'] and old['stages'][stage]['min_s']
+        }
+        print({'rows': entry['rows'], 'vs': baseline['environment'].get('commit'), **ratios})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 50000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--split-mode', choices=['greedy', 'min_files'], default='greedy')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='مسار ملف JSON لحفظ النتائج')
+    parser.add_argument('--compare', help='ملف JSON سابق للمقارنة')
+    args = parser.parse_args()
+
+    results = []
+    for n_rows in args.rows:
+        entry = benchmark_size(n_rows, args.repeat, args.split_mode, args.workers, args.seed)
+        print({'rows': n_rows, 'total_s': entry['total_s'],
+               **{stage: entry['stages'][stage]['min_s'] for stage in STAGES}})
+        results.append(entry)
+
+    report = {
+        'environment': environment(),
+        'parameters': {'repeat': args.repeat, 'split_mode': args.split_mode,
+                       'workers': args.workers, 'seed': args.seed},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            compare(results, json.load(handle))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""قياس حفظ تشغيلين في سجل التشغيلات (SQLite) ومقارنتهما، والتحقق من النتيجة مقابل pandas.
+
+الشهر الثاني = الشهر الأول بعد حذف جزء من المستفيدين وإضافة مستفيدين جدد وتغيير
+رواتب جزء آخر. يُطبع زمن الحفظ والمقارنة وخطة الاستعلام للتأكد من استخدام الفهرس.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_run_history.py --rows 100000 1000000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+from payroll_generator import generate_payroll_frame  # noqa: E402
+import payroll_core  # noqa: E402
+import run_history  # noqa: E402
+
+
+def month_rows(n_rows, seed):
+    """صفوف تشغيل مطبعة (بعد التنظيف والتحقق) من ملف تركيبي."""
+    frame = generate_payroll_frame(n_rows, seed=seed)
+    cleaned, _, _ = payroll_core.clean_input_chunk(frame)
+    return pd.DataFrame({
+        'iban': cleaned['Iban'].astype(str),
+        'name': cleaned['الاسم'],
+        'amount': cleaned['الراتب الصافي'].astype(float),
+        'bank_key': cleaned['Bank Key'],
+        'receiver_bic': payroll_core.resolve_receiver_bics(cleaned['Iban']),
+    }).drop_duplicates('iban').reset_index(drop=True)
+
+
+def next_month(rows, seed):
+    rng = np.random.default_rng(seed)
+    kept = rows[rng.random(len(rows)) >= 0.02].copy()
+    changed = rng.random(len(kept)) < 0.05
+    kept.loc[changed, 'amount'] = np.round(kept.loc[changed, 'amount'] * rng.uniform(0.7, 1.3, changed.sum()), -3)
+    newcomers = month_rows(max(len(rows) // 50, 1), seed + 1000)
+    newcomers = newcomers[~newcomers['iban'].isin(rows['iban'])]
+    return pd.concat([kept, newcomers], ignore_index=True)
+
+
+def reference_diff(previous, current, min_amount, min_percent):
+    merged = previous.merge(current, on='iban', how='outer', suffixes=('_p', '_c'), indicator=True)
+    both = merged[merged['_merge'] == 'both']
+    difference = (both['amount_c'] - both['amount_p']).abs()
+    changed = both[(difference > 0) & (difference >= min_amount) & (difference * 100 / both['amount_p'].abs() >= min_percent)]
+    return (set(merged.loc[merged['_merge'] == 'right_only', 'iban']),
+            set(merged.loc[merged['_merge'] == 'left_only', 'iban']),
+            set(changed['iban']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--min-change-percent', type=float, default=run_history.DIFF_MIN_CHANGE_PERCENT)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        previous = month_rows(n_rows, seed=1)
+        current = next_month(previous, seed=2)
+        with tempfile.TemporaryDirectory() as work_dir:
+            history = run_history.RunHistory(os.path.join(work_dir, 'history.sqlite3'))
+
+            start = time.perf_counter()
+            previous_id = history.save_run(previous, datetime(2026, 1, 15))
+            current_id = history.save_run(current, datetime(2026, 2, 15))
+            save_seconds = (time.perf_counter() - start) / 2
+
+            start = time.perf_counter()
+            diff = history.diff(previous_id, current_id, min_change_percent=args.min_change_percent)
+            diff_seconds = time.perf_counter() - start
+
+            with sqlite3.connect(history.path) as connection:
+                plan = [row[-1] for row in connection.execute(
+                    'EXPLAIN QUERY PLAN ' + run_history._CHANGED_QUERY, (previous_id, current_id, 0, 0))]
+
+        expected = reference_diff(previous, current, run_history.DIFF_MIN_CHANGE_AMOUNT, args.min_change_percent)
+        actual = (set(diff['added']['iban']), set(diff['removed']['iban']), set(diff['changed']['iban']))
+        if actual != expected:
+            raise AssertionError("نتيجة المقارنة لا تطابق المرجع (pandas merge)")
+        print({
+            'rows': len(previous), 'added': len(diff['added']), 'removed': len(diff['removed']),
+            'changed': len(diff['changed']), 'save_run_s': round(save_seconds, 3),
+            'diff_s': round(diff_seconds, 3), 'plan': plan,
+        })
+
+
+if __name__ == '__main__':
+    main()
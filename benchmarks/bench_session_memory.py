@@ -0,0 +1,70 @@
+"""قياس ذاكرة الملفات الناتجة لكل جلسة: بايتات كاملة في st.session_state مقابل مراجع BlobStore.
+
+يُحاكى N جلسات رفعت الملف نفسه (ناتج التقسيم + الملخص + TXT/CSV)، ويُقارن مجموع
+البايتات المحفوظة بالطريقة القديمة مع البايتات الفريدة الفعلية في المخزن، ثم يُتحقق
+من أن المحتوى المسترجع مطابق وأن تحرير الجلسات يفرغ المخزن.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_session_memory.py --rows 20000 --sessions 1 4 16
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+from bench_streaming_reader import write_workbook  # noqa: E402
+from blob_store import BlobSession, BlobStore  # noqa: E402
+import payroll_core  # noqa: E402
+
+
+def session_outputs(path):
+    """الملفات التي كانت تُحفظ في جلسة واحدة (كل ملف ببايتاته الكاملة)."""
+    result = payroll_core.split_payroll(path, today=datetime(2026, 1, 15))
+    files = result['files']
+    summary = payroll_core.build_summary(files, now=datetime(2026, 1, 15))
+    txt_files = payroll_core.convert_files_to_txt(files)
+    return [{'filename': f['filename'], 'content': f['content']} for f in files + [summary] + txt_files]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--budget-mb', type=float, default=None,
+                        help='ميزانية ذاكرة المخزن (الافتراضي BLOB_MEMORY_BUDGET)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'input.xlsx')
+        write_workbook(path, args.rows)
+        outputs = session_outputs(path)
+
+    per_session_bytes = sum(len(f['content']) for f in outputs)
+    for n_sessions in args.sessions:
+        store = BlobStore() if args.budget_mb is None else BlobStore(int(args.budget_mb * 1024 * 1024))
+        sessions = [BlobSession(store) for _ in range(n_sessions)]
+        refs = [[session.put(f['content']) for f in outputs] for session in sessions]
+        for session_refs in refs:
+            for f, ref in zip(outputs, session_refs):
+                if store.get(ref) != f['content']:
+                    raise AssertionError(f"المحتوى المسترجع لا يطابق {f['filename']}")
+        stats = store.stats()
+        print({
+            'rows': args.rows, 'sessions': n_sessions, 'files_per_session': len(outputs),
+            'before_mb': round(per_session_bytes * n_sessions / 1024 / 1024, 2),
+            'after_memory_mb': round(stats['memory_bytes'] / 1024 / 1024, 2),
+            'after_disk_mb': round(stats['disk_bytes'] / 1024 / 1024, 2),
+            'unique_blobs': stats['blobs'],
+        })
+        del sessions, refs
+        gc.collect()
+        if store.stats()['blobs']:
+            raise AssertionError("بقيت بايتات في المخزن بعد انتهاء كل الجلسات")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
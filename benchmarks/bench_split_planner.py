@@ -0,0 +1,127 @@
+"""مقارنة مخطط التقسيم (مجاميع تراكمية + بحث ثنائي) مع حلقة التقسيم القديمة.
+
+يتحقق أولاً من حالات الحدود الثابتة (إدخال فارغ، صف يتجاوز الحد وحده، مجموع يساوي الحد
+تماماً، عدد صفوف يساوي الحد تماماً) بحدود متوقعة صريحة ومطابقة الحلقة القديمة، ثم من تطابق
+الحدود في النمط الجشع لبيانات كبيرة، ثم يقيس الزمن. --check يشغّل الحالات الثابتة وحدها.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_split_planner.py --rows 20000 100000
+    python benchmarks/bench_split_planner.py --check
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import payroll_core  # noqa: E402
+
+
+def legacy_boundaries(amounts, max_rows, max_amount):
+    """نسخة طبق الأصل من حلقة التقسيم السابقة في process_excel_data_st."""
+    bank_df = pd.DataFrame({'Amount': amounts})
+    num_rows = len(bank_df)
+    boundaries = []
+    start_row = 0
+    while start_row < num_rows:
+        end_row = min(start_row + max_rows, num_rows)
+        current_slice = bank_df.iloc[start_row:end_row]
+        total_amount = current_slice['Amount'].sum()
+        while total_amount > max_amount and len(current_slice) > 1:
+            end_row -= 1
+            current_slice = bank_df.iloc[start_row:end_row]
+            total_amount = current_slice['Amount'].sum()
+        if total_amount > max_amount:
+            end_row = start_row + 1
+        boundaries.append((start_row, end_row))
+        start_row = end_row
+    return boundaries
+
+
+def make_amounts(n_rows, seed=0):
+    """رواتب عالية تُجبر التقسيم حسب المبلغ، مع بعض الرواتب التي تتجاوز الحد وحدها."""
+    rng = np.random.default_rng(seed)
+    amounts = rng.integers(500_000, 3_000_000, n_rows).astype(float)
+    amounts[rng.integers(0, n_rows, max(1, n_rows // 5000))] = payroll_core.MAX_AMOUNT_PER_FILE * 2
+    return amounts
+
+
+def check_edge_cases():
+    """حالات الحدود: (المبالغ، أقصى صفوف، أقصى مبلغ، الحدود الجشعة المتوقعة)."""
+    cases = [
+        ([], 4, 10, []),                                          # إدخال فارغ
+        ([11], 5, 10, [(0, 1)]),                                  # صف واحد يتجاوز الحد وحده
+        ([3, 25, 4], 5, 10, [(0, 1), (1, 2), (2, 3)]),           # صف يتجاوز الحد بين صفوف عادية
+        ([5, 5, 5, 5], 10, 10, [(0, 2), (2, 4)]),                 # مجموع يساوي الحد تماماً
+        ([4, 6, 1], 10, 10, [(0, 2), (2, 3)]),
+        ([1, 1, 1, 1, 1, 1], 3, 100, [(0, 3), (3, 6)]),           # عدد صفوف يساوي الحد تماماً
+        ([1, 2, 3, 4, 5, 6, 7], 3, 100, [(0, 3), (3, 6), (6, 7)]),
+        ([20, 1, 1, 20, 3], 10, 10, [(0, 1), (1, 3), (3, 4), (4, 5)]),
+        ([4, -3, 8, 2, 9, -1, 1], 3, 9, None),                    # مبالغ سالبة: مطابقة الحلقة القديمة فقط
+    ]
+    for amounts, max_rows, max_amount, expected in cases:
+        amounts = np.asarray(amounts, dtype=float)
+        legacy = legacy_boundaries(amounts, max_rows, max_amount)
+        actual = payroll_core.plan_split_boundaries(amounts, max_rows, max_amount)
+        if actual != legacy or (expected is not None and actual != expected):
+            raise AssertionError(f"{amounts.tolist()}: {actual} (المتوقع {expected}، الحلقة القديمة {legacy})")
+        groups = payroll_core.plan_min_file_count(amounts, max_rows, max_amount)
+        covered = np.sort(np.concatenate(groups)) if groups else np.array([], dtype=int)
+        if not np.array_equal(covered, np.arange(len(amounts))):
+            raise AssertionError(f"min_files لم يغطِ كل الصفوف: {amounts.tolist()}")
+        for group in groups:
+            if len(group) > max_rows or (len(group) > 1 and amounts[group].sum() > max_amount):
+                raise AssertionError(f"min_files تجاوز أحد الحدود: {amounts.tolist()}")
+    print({'check': 'split_planner', 'cases': len(cases), 'ok': True})
+
+
+def run(n_rows, include_legacy=True):
+    amounts = make_amounts(n_rows)
+    max_rows, max_amount = payroll_core.MAX_ROWS_PER_FILE, payroll_core.MAX_AMOUNT_PER_FILE
+
+    start = time.perf_counter()
+    planned = payroll_core.plan_split_boundaries(amounts, max_rows, max_amount)
+    planned_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    groups = payroll_core.plan_min_file_count(amounts, max_rows, max_amount)
+    min_files_time = time.perf_counter() - start
+    for group in groups:
+        if len(group) > max_rows or (len(group) > 1 and amounts[group].sum() > max_amount):
+            raise AssertionError("min_files تجاوز أحد الحدود")
+
+    result = {
+        'rows': n_rows,
+        'greedy_files': len(planned),
+        'min_files': len(groups),
+        'planner_s': round(planned_time, 4),
+        'min_files_s': round(min_files_time, 4),
+    }
+    if include_legacy:
+        start = time.perf_counter()
+        expected = legacy_boundaries(amounts, max_rows, max_amount)
+        legacy_time = time.perf_counter() - start
+        if expected != planned:
+            raise AssertionError(f"حدود غير متطابقة عند {n_rows} صف")
+        result['legacy_s'] = round(legacy_time, 4)
+        result['speedup'] = round(legacy_time / planned_time, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[20_000, 100_000])
+    parser.add_argument('--skip-legacy', action='store_true', help="قياس المخطط الجديد فقط")
+    parser.add_argument('--check', action='store_true', help="حالات الحدود الثابتة فقط دون قياس الزمن")
+    args = parser.parse_args()
+    check_edge_cases()
+    if args.check:
+        return
+    for n_rows in args.rows:
+        print(run(n_rows, include_legacy=not args.skip_legacy))
+
+
+if __name__ == '__main__':
+    main()
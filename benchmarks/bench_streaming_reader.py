@@ -0,0 +1,93 @@
+"""مقارنة ذروة الذاكرة (peak RSS) بين pd.read_excel للملف كاملاً والقراءة التدفقية على دفعات.
+
+يُولَّد ملف إدخال بأعمدة إضافية غير مستخدمة، ويُشغَّل كل مسار في عملية مستقلة
+لقياس ذروة الذاكرة الخاصة به.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_streaming_reader.py --rows 10000 100000 1000000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import xlsxwriter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+EXTRA_COLS = ['الرقم الوظيفي', 'القسم', 'العنوان الوظيفي', 'الراتب الاسمي', 'المخصصات', 'الاستقطاعات', 'ملاحظات']
+
+
+def write_workbook(path, n_rows, seed=0):
+    """كتابة ملف إدخال تركيبي بطريقة constant_memory حتى لا يؤثر التوليد على القياس."""
+    rng = np.random.default_rng(seed)
+    keys = ['RAFB', 'RDBA', 'AIBI', 'IDBQ', 'AINI', 'NBIQ']
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    sheet = workbook.add_worksheet()
+    sheet.write_row(0, 0, ['الاسم', 'Iban', 'الراتب الصافي'] + EXTRA_COLS)
+    for row in range(1, n_rows + 1):
+        salary = int(rng.integers(0, 3_000_000)) if row % 40 else 0
+        iban = f"IQ12{keys[row % len(keys)]}{row % 1000:03d}{row:012d}"
+        sheet.write_row(row, 0, [
+            f"موظف رقم {row} بن محمد علي", iban, salary,
+            row, 'قسم الحسابات', 'معلم', salary, 10_000, 5_000, 'لا يوجد',
+        ])
+    workbook.close()
+
+
+def child(mode, path):
+    """تشغيل مسار القراءة والتنظيف ثم طباعة الزمن وذروة الذاكرة (بالميغابايت)."""
+    import pandas as pd
+    import payroll_core
+
+    start = time.perf_counter()
+    if mode == 'legacy':
+        df = pd.read_excel(path)
+        cleaned = payroll_core.clean_input_chunk(df[payroll_core.INPUT_REQUIRED_COLS])[0]
+        rows = len(cleaned)
+    else:
+        with open(path, 'rb') as source:
+            rows = sum(len(payroll_core.clean_input_chunk(chunk)[0]) for chunk in payroll_core.iter_input_chunks(source, reader='openpyxl'))
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{rows} {elapsed:.3f} {peak_mb:.1f}")
+
+
+def measure(mode, path):
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', mode, path],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    rows, elapsed, peak_mb = output[-3:]
+    return int(rows), float(elapsed), float(peak_mb)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in args.rows:
+            path = os.path.join(tmp, f"payroll_{n_rows}.xlsx")
+            write_workbook(path, n_rows)
+            legacy_rows, legacy_s, legacy_mb = measure('legacy', path)
+            stream_rows, stream_s, stream_mb = measure('streaming', path)
+            if legacy_rows != stream_rows:
+                raise AssertionError(f"عدد الصفوف غير متطابق: {legacy_rows} != {stream_rows}")
+            print({
+                'rows': n_rows,
+                'legacy_s': legacy_s, 'legacy_peak_rss_mb': legacy_mb,
+                'streaming_s': stream_s, 'streaming_peak_rss_mb': stream_mb,
+            })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""مقارنة الترميز المباشر إلى TXT (encode_bank_txt) مع مسار إعادة قراءة ملف xlsx.
+
+يتحقق من تطابق البايتات لكل ملف ثم يقيس الزمن.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_txt_export.py --rows 4000 --files 10
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import payroll_core  # noqa: E402
+
+
+def make_slice(n_rows, seed=0):
+    """شريحة ملف واحد بأعمدة FINAL_EXCEL_COLS كما ينتجها process_excel_data_st."""
+    rng = np.random.default_rng(seed)
+    ibans = pd.Series(rng.integers(10**11, 10**12, n_rows)).astype(str).radd('IQ12AINI009')
+    return pd.DataFrame({
+        'Reference': '20260101 ' + ibans,
+        'Value Date': '20260101',
+        'Payer Name': payroll_core.PAYER_NAME,
+        'Payer Acount': payroll_core.PAYER_ACCOUNT,
+        'Amount': rng.integers(250_000, 3_000_000, n_rows).astype(float),
+        'Currency': payroll_core.CURRENCY,
+        'Receiver BIC': 'AINIIQBA009',
+        'Beneficiary Name': [f"موظف رقم {i} بن محمد" for i in range(n_rows)],
+        'Beneficiary Acount': ibans,
+        'Remittance Information': payroll_core.REMITTANCE_INFO_TEMPLATE.format(2026, payroll_core.ARABIC_MONTHS[1]),
+        'Details of Charges': payroll_core.DETAILS_OF_CHARGES,
+    })[payroll_core.FINAL_EXCEL_COLS]
+
+
+def to_xlsx(frame):
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        frame.to_excel(writer, index=False, sheet_name='Sheet1')
+    return output.getvalue()
+
+
+def run(n_rows, n_files):
+    slices = [make_slice(n_rows, seed) for seed in range(n_files)]
+    workbooks = [to_xlsx(frame) for frame in slices]
+
+    start = time.perf_counter()
+    legacy = [payroll_core.convert_excel_bytes_to_txt(content) for content in workbooks]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    direct = [payroll_core.encode_bank_txt(frame) for frame in slices]
+    direct_time = time.perf_counter() - start
+
+    if legacy != direct:
+        raise AssertionError("محتوى TXT غير متطابق")
+    return {
+        'rows_per_file': n_rows,
+        'files': n_files,
+        'legacy_s': round(legacy_time, 4),
+        'direct_s': round(direct_time, 4),
+        'speedup': round(legacy_time / direct_time, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=payroll_core.MAX_ROWS_PER_FILE)
+    parser.add_argument('--files', type=int, default=10)
+    args = parser.parse_args()
+    print(run(args.rows, args.files))
+
+
+if __name__ == '__main__':
+    main()
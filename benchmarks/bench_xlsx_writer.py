@@ -0,0 +1,111 @@
+"""مقارنة كاتب xlsx المباشر (write_final_excel_bytes، xlsxwriter بوضع constant_memory) مع مسار pandas.
+
+تُبنى شرائح الملفات من ملف تركيبي عبر خط المعالجة نفسه (الإطار المضغوط وخطة التقسيم)،
+ويُتحقق أولاً من أن ملفات الكاتب الجديد تُقرأ بنفس القيم عبر pd.read_excel و openpyxl
+و calamine (إن كانت مثبتة) وأن TXT المُعاد قراءته منها يطابق encode_bank_txt، ثم يُقاس
+الزمن والصفوف في الثانية وذروة تخصيصات الذاكرة (tracemalloc) لكتابة شريحة كبيرة واحدة.
+التشغيل من جذر المستودع:
+    python benchmarks/bench_xlsx_writer.py --rows 100000 --large-rows 50000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.dirname(__file__))
+from excel_export import write_excel_bytes  # noqa: E402
+from input_readers import python_calamine  # noqa: E402
+from payroll_generator import generate_payroll_frame  # noqa: E402
+import payroll_core  # noqa: E402
+
+RUN_DATE = datetime(2026, 1, 15)
+
+
+def write_pandas(frame, created=RUN_DATE):
+    return write_excel_bytes(payroll_core.expand_final_frame(frame), created)
+
+
+def write_streaming(frame, created=RUN_DATE):
+    return payroll_core.write_final_excel_bytes(frame, created)
+
+
+def build_slices(n_rows):
+    frame = generate_payroll_frame(n_rows, seed=0)
+    df_filtered, _, _ = payroll_core.clean_input_chunk(
+        frame.set_axis(pd.RangeIndex(payroll_core.INPUT_FIRST_DATA_ROW, payroll_core.INPUT_FIRST_DATA_ROW + len(frame)))
+    )
+    df_final = payroll_core.build_final_frame(df_filtered, RUN_DATE)
+    return df_final, [entry['frame'] for entry in payroll_core.build_split_plan(df_final)]
+
+
+def openpyxl_rows(content):
+    workbook = load_workbook(io.BytesIO(content), read_only=True)
+    try:
+        return [list(row) for row in workbook.worksheets[0].iter_rows(values_only=True)]
+    finally:
+        workbook.close()
+
+
+def calamine_rows(content):
+    workbook = python_calamine.CalamineWorkbook.from_filelike(io.BytesIO(content))
+    return workbook.get_sheet_by_index(0).to_python()
+
+
+def check_equivalent(frame):
+    legacy, streaming = write_pandas(frame), write_streaming(frame)
+    pd.testing.assert_frame_equal(pd.read_excel(io.BytesIO(streaming), dtype=str),
+                                  pd.read_excel(io.BytesIO(legacy), dtype=str))
+    if openpyxl_rows(streaming) != openpyxl_rows(legacy):
+        raise AssertionError("قيم openpyxl غير متطابقة")
+    if python_calamine is not None and calamine_rows(streaming) != calamine_rows(legacy):
+        raise AssertionError("قيم calamine غير متطابقة")
+    if payroll_core.convert_excel_bytes_to_txt(streaming) != payroll_core.encode_bank_txt(frame):
+        raise AssertionError("TXT المُعاد قراءته من الملف الجديد لا يطابق encode_bank_txt")
+
+
+def measure(writer, frames, memory=False):
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    size = sum(len(writer(frame)) for frame in frames)
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        tracemalloc.stop()
+    return seconds, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000, help="صفوف الملف التركيبي (كل الشرائح)")
+    parser.add_argument('--large-rows', type=int, default=50_000, help="صفوف الشريحة الكبيرة لقياس الذاكرة")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df_final, slices = build_slices(args.rows)
+    for frame in slices:
+        check_equivalent(frame)
+
+    rows = sum(len(frame) for frame in slices)
+    for name, writer in (('pandas', write_pandas), ('streaming', write_streaming)):
+        seconds = min(measure(writer, slices)[0] for _ in range(args.repeat))
+        _, size, _ = measure(writer, slices)
+        large = df_final.iloc[:args.large_rows]
+        large_seconds, _, peak = measure(writer, [large], memory=True)
+        print({
+            'writer': name, 'files': len(slices), 'rows': rows, 'seconds': round(seconds, 3),
+            'rows_per_s': round(rows / seconds), 'xlsx_mb': round(size / (1024 * 1024), 2),
+            'large_rows': len(large), 'large_seconds': round(large_seconds, 3), 'large_peak_mb': peak,
+        })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""مولّد ملفات رواتب تركيبية واقعية (الاسم / Iban / الراتب الصافي) للقياس والاختبار.
+
+يغطي مزيج المصارف في BANK_BICS ورموز الفروع في ALL_BRANCHES_BIC (مع فروع غير
+معروفة تعود إلى BIC الإدارة العامة)، والرواتب الصفرية، والصفوف التالفة (اسم أو IBAN
+مفقود، راتب نصي، IBAN قصير أو لمصرف غير مدعوم)، وتوزيع رواتب يُفعّل التقسيم بحسب
+MAX_AMOUNT_PER_FILE. أرقام IBAN الصالحة تحمل أرقام تحقق صحيحة (ISO 13616 mod-97).
+الاستخدام من جذر المستودع (الصيغة حسب الامتداد: xlsx أو csv أو parquet):
+    python benchmarks/payroll_generator.py out.xlsx --rows 100000 --seed 1
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import payroll_core  # noqa: E402
+
+# حصة كل مصرف من الموظفين (الرافدين والرشيد الأكبر كما في ملفات الرواتب الفعلية)
+BANK_WEIGHTS = {'RAFB': 0.38, 'RDBA': 0.27, 'AIBI': 0.05, 'IDBQ': 0.06, 'AINI': 0.10, 'NBIQ': 0.14}
+# نسبة الصفوف في فروع غير موجودة في ALL_BRANCHES_BIC للمصارف ذات الفروع
+UNKNOWN_BRANCH_SHARE = 0.05
+ZERO_SALARY_SHARE = 0.02
+BAD_ROW_SHARE = 0.01
+# حصة صفوف من مصارف غير مدعومة (تُستبعد بالفلترة)
+UNSUPPORTED_BANK_SHARE = 0.01
+# رواتب بوسيط ~1.1 مليون دينار: متوسط 4000 صف يتجاوز MAX_AMOUNT_PER_FILE فيُقسَّم بحسب المبلغ
+SALARY_MEDIAN = 1_100_000
+SALARY_SIGMA = 0.35
+
+FIRST_NAMES = ['محمد', 'علي', 'حسين', 'أحمد', 'فاطمة', 'زينب', 'مريم', 'عباس', 'حسن', 'نور',
+               'سجاد', 'كاظم', 'هدى', 'رقية', 'مصطفى', 'عبد الله', 'جعفر', 'سارة', 'منتظر', 'إيمان']
+FAMILY_NAMES = ['الموسوي', 'الحسيني', 'العبادي', 'التميمي', 'الأسدي', 'الكعبي', 'المالكي',
+                'الساعدي', 'البصري', 'الخفاجي', 'الجبوري', 'الربيعي']
+UNSUPPORTED_BANK_KEYS = ['CBIQ', 'TRIQ', 'BBAC']
+
+
+def _letters_to_digits(text):
+    """تحويل الحروف إلى أرقام وفق ISO 13616 (A=10 ... Z=35)."""
+    return ''.join(str(int(ch, 36)) for ch in text)
+
+
+def iban_check_digits(prefixes, accounts, country='IQ'):
+    """أرقام التحقق (mod-97) لأرقام IBAN بشكل مُتجه.
+
+    prefixes: مصفوفة (مفتاح المصرف + رمز الفرع) بطول 7، accounts: أرقام حسابات من 12 خانة.
+    """
+    country_tail = int(_letters_to_digits(country) + '00')
+    uniques, codes = np.unique(prefixes, return_inverse=True)
+    prefix_mod = np.array([int(_letters_to_digits(p)) % 97 for p in uniques], dtype=np.int64)[codes]
+    remainder = (prefix_mod * (10**12 % 97) + accounts % 97) % 97
+    remainder = (remainder * (10**6 % 97) + country_tail) % 97
+    return 98 - remainder
+
+
+def _branch_codes(rng, banks):
+    """رموز فروع لكل صف: فروع ALL_BRANCHES_BIC للمصارف ذات الفروع، وعشوائية لغيرها."""
+    branches = rng.integers(1, 1000, len(banks)).astype(str)
+    branches = np.char.zfill(branches.astype('U3'), 3)
+    for key in payroll_core.BANKS_WITH_DYNAMIC_BRANCHES:
+        known = sorted(bic[8:] for bic in payroll_core.ALL_BRANCHES_BIC if bic[:4] == key)
+        rows = np.flatnonzero(banks == key)
+        use_known = rng.random(len(rows)) >= UNKNOWN_BRANCH_SHARE
+        branches[rows[use_known]] = rng.choice(known, use_known.sum())
+    return branches
+
+
+def generate_payroll_frame(n_rows, seed=0, salary_median=SALARY_MEDIAN):
+    """إنشاء DataFrame بأعمدة INPUT_REQUIRED_COLS (قيم من نوع object كما تُقرأ من Excel)."""
+    rng = np.random.default_rng(seed)
+    keys = list(BANK_WEIGHTS)
+    weights = np.array(list(BANK_WEIGHTS.values()))
+    banks = rng.choice(keys, n_rows, p=weights / weights.sum()).astype('U4')
+    unsupported = rng.random(n_rows) < UNSUPPORTED_BANK_SHARE
+    banks[unsupported] = rng.choice(UNSUPPORTED_BANK_KEYS, unsupported.sum())
+
+    prefixes = np.char.add(banks, _branch_codes(rng, banks))
+    accounts = rng.integers(10**11, 10**12, n_rows, dtype=np.int64)
+    checks = iban_check_digits(prefixes, accounts)
+    ibans = (pd.Series(checks).astype(str).str.zfill(2).radd('IQ')
+             + prefixes + pd.Series(accounts).astype(str))
+
+    names = (pd.Series(rng.choice(FIRST_NAMES, n_rows)) + ' ' + rng.choice(FIRST_NAMES, n_rows)
+             + ' ' + rng.choice(FIRST_NAMES, n_rows) + ' ' + rng.choice(FAMILY_NAMES, n_rows))
+
+    salaries = np.round(rng.lognormal(np.log(salary_median), SALARY_SIGMA, n_rows), -3)
+    salaries[rng.random(n_rows) < ZERO_SALARY_SHARE] = 0
+
+    frame = pd.DataFrame({
+        'الاسم': names.to_numpy(dtype=object),
+        'Iban': ibans.to_numpy(dtype=object),
+        'الراتب الصافي': salaries.astype(object),
+    })
+
+    # صفوف تالفة: اسم مفقود، IBAN مفقود، راتب نصي، IBAN قصير
+    bad_rows = np.flatnonzero(rng.random(n_rows) < BAD_ROW_SHARE)
+    kinds = rng.integers(0, 4, len(bad_rows))
+    frame.loc[bad_rows[kinds == 0], 'الاسم'] = None
+    frame.loc[bad_rows[kinds == 1], 'Iban'] = None
+    frame.loc[bad_rows[kinds == 2], 'الراتب الصافي'] = 'غير متوفر'
+    frame.loc[bad_rows[kinds == 3], 'Iban'] = frame.loc[bad_rows[kinds == 3], 'Iban'].str[:10]
+    return frame
+
+
+def write_payroll_workbook(path, n_rows, seed=0, salary_median=SALARY_MEDIAN, extra_columns=()):
+    """كتابة ملف xlsx تركيبي بطريقة constant_memory (بدون تحميل كامل الملف في الذاكرة).
+
+    extra_columns: أسماء أعمدة إضافية غير مستخدمة تُملأ بقيم نصية لمحاكاة ملفات الرواتب الكاملة.
+    """
+    frame = generate_payroll_frame(n_rows, seed=seed, salary_median=salary_median)
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    sheet = workbook.add_worksheet()
+    sheet.write_row(0, 0, payroll_core.INPUT_REQUIRED_COLS + list(extra_columns))
+    extra_values = [f"قيمة {col}" for col in extra_columns]
+    for row_index, row in enumerate(frame.itertuples(index=False, name=None), start=1):
+        for col_index, value in enumerate(row):
+            if not pd.isna(value):
+                sheet.write(row_index, col_index, value)
+        if extra_values:
+            sheet.write_row(row_index, len(row), extra_values)
+    workbook.close()
+    return path
+
+
+def write_payroll_csv(path, n_rows, seed=0, salary_median=SALARY_MEDIAN):
+    """كتابة نفس البيانات كملف CSV بترميز UTF-8 مع BOM (كما يصدّره Excel)."""
+    frame = generate_payroll_frame(n_rows, seed=seed, salary_median=salary_median)
+    frame.to_csv(path, index=False, encoding='utf-8-sig')
+    return path
+
+
+def write_payroll_parquet(path, n_rows, seed=0, salary_median=SALARY_MEDIAN):
+    """كتابة نفس البيانات كملف Parquet بأعمدة محددة النوع (الراتب غير الرقمي يصبح فارغاً)."""
+    frame = generate_payroll_frame(n_rows, seed=seed, salary_median=salary_median)
+    frame['الراتب الصافي'] = pd.to_numeric(frame['الراتب الصافي'], errors='coerce')
+    frame.to_parquet(path, index=False)
+    return path
+
+
+PAYROLL_WRITERS = {'.xlsx': write_payroll_workbook, '.csv': write_payroll_csv, '.parquet': write_payroll_parquet}
+
+
+def write_payroll_file(path, n_rows, seed=0, salary_median=SALARY_MEDIAN):
+    """كتابة ملف تركيبي بالصيغة المحددة بامتداد المسار."""
+    writer = PAYROLL_WRITERS[os.path.splitext(path)[1].lower()]
+    return writer(path, n_rows, seed=seed, salary_median=salary_median)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--salary-median', type=float, default=SALARY_MEDIAN)
+    args = parser.parse_args()
+    write_payroll_file(args.output, args.rows, seed=args.seed, salary_median=args.salary_median)
+    print(args.output)
+
+
+if __name__ == '__main__':
+    main()
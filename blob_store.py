@@ -0,0 +1,187 @@
+"""مخزن بايتات (blobs) مُعنون بالمحتوى للملفات الناتجة، مع إزالة التكرار والنقل إلى القرص.
+
+تحتفظ st.session_state بمراجع (بصمات SHA-256) فقط بدلاً من بايتات الملفات. المحتوى
+المتطابق (مثل ملفي TXT و CSV لنفس الملف، أو نفس الناتج في جلستين) يُخزن مرة واحدة
+مع عداد مراجع. عند تجاوز ميزانية الذاكرة تُنقل أقدم البايتات إلى مجلد مؤقت، وتُحرَّر
+مراجع كل جلسة تلقائياً عند انتهائها. الملفات المكتوبة على القرص (put_file) تُسجَّل برابط
+صلب في مجلد المخزن دون قراءتها في الذاكرة.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import Counter, OrderedDict
+
+from run_workspace import file_digest, link_or_copy
+
+BLOB_MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+class BlobStore:
+    """مخزن مشترك بين الجلسات: put/get/release بمراجع SHA-256. آمن للاستخدام من عدة خيوط."""
+
+    def __init__(self, memory_budget=BLOB_MEMORY_BUDGET, spill_dir=None):
+        self.memory_budget = memory_budget
+        self._spill_dir = spill_dir
+        self._owns_spill_dir = spill_dir is None
+        self._blobs = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._finalizer = None
+
+    def put(self, data):
+        """تخزين البايتات (أو زيادة عداد المراجع إن وُجدت) وإرجاع المرجع."""
+        ref = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            blob = self._blobs.get(ref)
+            if blob is not None:
+                blob['refs'] += 1
+                return ref
+            self._blobs[ref] = {'data': data, 'path': None, 'size': len(data), 'refs': 1}
+            self._memory_bytes += len(data)
+            self._spill_over_budget()
+        return ref
+
+    def put_file(self, path):
+        """تسجيل ملف على القرص (رابط صلب في مجلد المخزن، بدون نسخه في الذاكرة) وإرجاع المرجع.
+
+        الرابط يبقى صالحاً بعد حذف الملف الأصلي (مثل حذف مجلد التشغيل) حتى تُحرَّر كل مراجعه.
+        """
+        ref = file_digest(path).hexdigest()
+        with self._lock:
+            blob = self._blobs.get(ref)
+            if blob is not None:
+                blob['refs'] += 1
+                return ref
+            stored = os.path.join(self._ensure_spill_dir(), ref)
+            link_or_copy(path, stored)
+            self._blobs[ref] = {'data': None, 'path': stored, 'size': os.path.getsize(stored), 'refs': 1}
+        return ref
+
+    def get(self, ref):
+        with self._lock:
+            blob = self._blobs[ref]
+            if blob['data'] is not None:
+                self._blobs.move_to_end(ref)
+                return blob['data']
+            path = blob['path']
+        with open(path, 'rb') as handle:
+            return handle.read()
+
+    def size(self, ref):
+        with self._lock:
+            return self._blobs[ref]['size']
+
+    def path(self, ref):
+        """مسار الملف على القرص لمرجع منقول إلى القرص، أو None إن كانت بايتاته في الذاكرة."""
+        with self._lock:
+            blob = self._blobs[ref]
+            return blob['path'] if blob['data'] is None else None
+
+    def release(self, ref):
+        """إنقاص عداد المراجع وحذف البايتات (من الذاكرة أو القرص) عند وصوله إلى صفر."""
+        with self._lock:
+            blob = self._blobs.get(ref)
+            if blob is None:
+                return
+            blob['refs'] -= 1
+            if blob['refs'] > 0:
+                return
+            del self._blobs[ref]
+            if blob['data'] is not None:
+                self._memory_bytes -= blob['size']
+            path = blob['path']
+        if path is not None:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            disk_bytes = sum(b['size'] for b in self._blobs.values() if b['data'] is None)
+            logical_bytes = sum(b['size'] * b['refs'] for b in self._blobs.values())
+            return {
+                'blobs': len(self._blobs),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': disk_bytes,
+                'logical_bytes': logical_bytes,
+            }
+
+    def close(self):
+        """حذف مجلد النقل المؤقت (إن أنشأه المخزن) وكل البايتات."""
+        with self._lock:
+            self._blobs.clear()
+            self._memory_bytes = 0
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def _spill_over_budget(self):
+        # تُستدعى والقفل مُمسك: نقل الأقدم استخداماً إلى القرص حتى العودة تحت الميزانية
+        for ref, blob in self._blobs.items():
+            if self._memory_bytes <= self.memory_budget:
+                break
+            if blob['data'] is None:
+                continue
+            path = os.path.join(self._ensure_spill_dir(), ref)
+            with open(path, 'wb') as handle:
+                handle.write(blob['data'])
+            blob['data'], blob['path'] = None, path
+            self._memory_bytes -= blob['size']
+
+    def _ensure_spill_dir(self):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix='payroll_blobs_')
+        if self._owns_spill_dir and self._finalizer is None:
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._spill_dir, ignore_errors=True)
+        os.makedirs(self._spill_dir, exist_ok=True)
+        return self._spill_dir
+
+
+def _release_refs(store, refs):
+    for ref, count in list(refs.items()):
+        for _ in range(count):
+            store.release(ref)
+    refs.clear()
+
+
+class BlobSession:
+    """مراجع جلسة واحدة في BlobStore مشترك، تُحرَّر كلها عند جمع كائن الجلسة أو عند الخروج."""
+
+    def __init__(self, store):
+        self.store = store
+        self._refs = Counter()
+        self._finalizer = weakref.finalize(self, _release_refs, store, self._refs)
+
+    def put(self, data):
+        ref = self.store.put(data)
+        self._refs[ref] += 1
+        return ref
+
+    def put_file(self, path):
+        ref = self.store.put_file(path)
+        self._refs[ref] += 1
+        return ref
+
+    def get(self, ref):
+        return self.store.get(ref)
+
+    def size(self, ref):
+        return self.store.size(ref)
+
+    def path(self, ref):
+        return self.store.path(ref)
+
+    def release(self, ref):
+        if self._refs[ref] > 0:
+            self._refs[ref] -= 1
+            self.store.release(ref)
+
+    def release_all(self):
+        _release_refs(self.store, self._refs)
+
+    def held_bytes(self):
+        """حجم البايتات الفريدة التي تشير إليها هذه الجلسة (بعد إزالة التكرار)."""
+        return sum(self.store.size(ref) for ref, count in self._refs.items() if count > 0)
@@ -0,0 +1,134 @@
+"""كتابة ملفات Excel المقسمة في الذاكرة أو مباشرة إلى القرص، تسلسلياً أو بالتوازي عبر مجموعة عمليات.
+
+هذه الوحدة لا تستورد Streamlit حتى يمكن لعمليات العمل (worker processes)
+استيرادها وتنفيذ مهام الكتابة دون تشغيل واجهة التطبيق.
+"""
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+# نفس تنسيق صف العناوين الذي يكتبه pandas (عريض، بحدود، في المنتصف)
+HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+
+
+def _written(output, path):
+    # البايتات عند الكتابة في الذاكرة، أو حجم الملف عند الكتابة مباشرة إلى path
+    return output.getvalue() if path is None else os.path.getsize(path)
+
+
+def write_excel_bytes(frame, created=None, sheet_name='Sheet1', path=None):
+    """كتابة شريحة بيانات إلى ملف xlsx في الذاكرة وإرجاع البايتات.
+
+    تمرير created (تاريخ الإنشاء في خصائص الملف) يجعل الناتج ثابتاً بايتاً ببايت
+    مهما كان وقت الكتابة أو العملية التي نفذتها. مع path يُكتب الملف مباشرة إلى هذا
+    المسار (بدون نسخة في الذاكرة) ويُرجع حجمه.
+    """
+    output = io.BytesIO() if path is None else path
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer: # استخدام xlsxwriter لتجنب التبعيات المعقدة لـ openpyxl في هذه الخطوة
+        if created is not None:
+            writer.book.set_properties({'created': created})
+        frame.to_excel(writer, index=False, sheet_name=sheet_name)
+    return _written(output, path)
+
+
+def _cell_values(values):
+    """قيم عمود كقائمة Python مع None للقيم الفارغة، ودالة الكتابة المناسبة لنوع العمود."""
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        numbers = values.to_numpy(dtype=float, na_value=np.nan)
+        cells = numbers.astype(object)
+        cells[np.isnan(numbers)] = None
+        return cells.tolist(), 'write_number'
+    cells = values.astype(object)
+    cells = cells.where(cells.notna(), None).tolist()
+    if all(value is None or type(value) is str for value in cells):
+        return cells, 'write_string'
+    return cells, 'write'
+
+
+def write_columns_xlsx(columns, created=None, sheet_name='Sheet1', column_widths=None, number_formats=None,
+                       path=None):
+    """كتابة أعمدة جاهزة {الاسم: Series} إلى xlsx بوضع constant_memory (صفاً بصف) وإرجاع البايتات.
+
+    بديل أسرع لـ write_excel_bytes للتخطيطات الثابتة: نوع كل عمود يُحدد مرة واحدة (أرقام أو
+    نصوص) بدلاً من تنسيق pandas لكل خلية، ولا تُبنى الورقة كاملة في الذاكرة. النصوص تُكتب
+    كما هي (inline strings، بدون تحويل إلى صيغ أو روابط). column_widths و number_formats
+    (اختيارية) قواميس باسم العمود لعرض العمود وتنسيق الأرقام. مع path يُكتب الملف مباشرة
+    إلى هذا المسار ويُرجع حجمه.
+    """
+    output = io.BytesIO() if path is None else path
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    if created is not None:
+        workbook.set_properties({'created': created})
+    worksheet = workbook.add_worksheet(sheet_name)
+    header = workbook.add_format(HEADER_FORMAT)
+    number_formats = {name: workbook.add_format({'num_format': fmt}) for name, fmt in (number_formats or {}).items()}
+
+    names = list(columns)
+    cell_lists, writes, formats = [], [], []
+    for position, name in enumerate(names):
+        cells, method = _cell_values(columns[name])
+        cell_lists.append(cells)
+        writes.append(getattr(worksheet, method))
+        formats.append(number_formats.get(name))
+        width = (column_widths or {}).get(name)
+        if width is not None:
+            worksheet.set_column(position, position, width)
+
+    for position, name in enumerate(names):
+        worksheet.write_string(0, position, name, header)
+    for row, cells in enumerate(zip(*cell_lists), start=1):
+        for position, value in enumerate(cells):
+            if value is not None:
+                writes[position](row, position, value, formats[position])
+    workbook.close()
+    return _written(output, path)
+
+
+def _write_prepared(frame, created, prepare, writer=None, path=None):
+    # دالة على مستوى الوحدة حتى يمكن إرسالها إلى عمليات العمل
+    if writer is not None:
+        return writer(frame, created) if path is None else writer(frame, created, path=path)
+    return write_excel_bytes(frame if prepare is None else prepare(frame), created, path=path)
+
+
+def export_excel_files(frames, workers=1, created=None, on_done=None, prepare=None, writer=None, paths=None):
+    """كتابة قائمة شرائح إلى ملفات xlsx وإرجاع البايتات بنفس ترتيب الشرائح.
+
+    workers=1 يكتب الملفات تسلسلياً، وأكثر من ذلك يوزع مهام الكتابة المستقلة على
+    مجموعة عمليات (spawn). on_done(index, content) تُستدعى عند اكتمال كل ملف
+    (بترتيب الاكتمال في الوضع المتوازي) لتحديث شريط الحالة. prepare(frame) (اختيارية،
+    على مستوى وحدة) تُحوّل كل شريحة قبل كتابتها مباشرة، داخل عملية العمل في الوضع المتوازي.
+    writer(frame, created) (اختيارية، على مستوى وحدة) تكتب الشريحة بدلاً من write_excel_bytes.
+    paths (اختيارية، مسار لكل شريحة) تكتب كل ملف مباشرة إلى مساره (writer يستقبل path)
+    وتُرجع أحجام الملفات بدلاً من البايتات، فلا تُنقل البايتات من عمليات العمل.
+    """
+    results = [None] * len(frames)
+    paths = paths or [None] * len(frames)
+    if workers <= 1 or len(frames) <= 1:
+        for index, frame in enumerate(frames):
+            results[index] = _write_prepared(frame, created, prepare, writer, paths[index])
+            if on_done is not None:
+                on_done(index, results[index])
+        return results
+
+    # spawn بدلاً من fork: خادم Streamlit متعدد الخيوط ولا يُنسخ بأمان
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(frames)), mp_context=context) as pool:
+        futures = {pool.submit(_write_prepared, frame, created, prepare, writer, paths[index]): index
+                   for index, frame in enumerate(frames)}
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                if on_done is not None:
+                    on_done(index, results[index])
+        except BaseException:
+            # خطأ أو إلغاء من on_done: لا داعي لانتظار كتابة بقية الملفات
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    return results
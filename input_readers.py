@@ -0,0 +1,245 @@
+"""قراءة جدول الإدخال على دفعات عبر عدة محركات قراءة، مع اختيار تلقائي حسب نوع الملف وحجمه.
+
+المحركات: openpyxl (xlsx تدفقياً بذاكرة ثابتة)، calamine (xlsx/xls بمكتبة python-calamine
+المكتوبة بـ Rust إن كانت مثبتة)، xls (pd.read_excel)، csv، parquet (pyarrow). كل محرك
+يُرجع دفعات بالأعمدة المطلوبة فقط وبقيم من نوع object، وفهرس كل دفعة = رقم الصف في الملف
+(صف العناوين هو الصف الأول). إذا فشل المحرك المختار قبل إرجاع أول دفعة (غير مثبت أو
+لا يدعم الملف) يُجرب المحرك التالي. هذه الوحدة لا تستورد Streamlit.
+"""
+import os
+
+import pandas as pd
+from openpyxl import load_workbook
+
+try:
+    import python_calamine
+except ImportError:  # اختيارية: pip install python-calamine
+    python_calamine = None
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+INPUT_READER_ENV = 'PAYROLL_INPUT_READER'
+# calamine يحمّل الورقة كاملة في الذاكرة (نحو 8 أضعاف حجم ملف xlsx)، أما openpyxl فذاكرته شبه
+# ثابتة؛ فلا يُختار calamine تلقائياً إلا للملفات الصغيرة (نحو 250 ألف صف رواتب). الملفات الأكبر
+# تُقرأ تدفقياً بـ openpyxl ما لم يُطلب calamine صراحة (reader أو PAYROLL_INPUT_READER)
+FAST_READER_MAX_BYTES = 8 * 1024 * 1024
+CSV_ENCODING = 'utf-8-sig'
+
+
+class MissingColumnsError(ValueError):
+    """ملف الإدخال لا يحتوي على كل الأعمدة المطلوبة (INPUT_REQUIRED_COLS)."""
+
+
+def _rewound(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source
+
+
+def _head_bytes(source, size=8):
+    if hasattr(source, 'read'):
+        position = source.tell()
+        try:
+            return source.read(size)
+        finally:
+            source.seek(position)
+    with open(source, 'rb') as handle:
+        return handle.read(size)
+
+
+def source_size(source):
+    """حجم المصدر بالبايت (مسار أو ملف مفتوح قابل للتنقل)."""
+    if hasattr(source, 'seek'):
+        position = source.tell()
+        try:
+            return source.seek(0, os.SEEK_END)
+        finally:
+            source.seek(position)
+    return os.path.getsize(source)
+
+
+def detect_input_format(source):
+    """نوع الملف من بايتاته الأولى: xlsx أو xls أو parquet، وغير ذلك csv."""
+    head = _head_bytes(source)
+    if head.startswith(b'PK\x03\x04'):
+        return 'xlsx'
+    if head.startswith(b'\xd0\xcf\x11\xe0'):
+        return 'xls'
+    if head.startswith(b'PAR1'):
+        return 'parquet'
+    return 'csv'
+
+
+def _frame(rows, columns, first_row):
+    index = pd.RangeIndex(first_row, first_row + len(rows))
+    return pd.DataFrame(rows, columns=columns, index=index, dtype=object)
+
+
+def _column_positions(header, columns):
+    header = [None if value is None else str(value) for value in header]
+    if not all(col in header for col in columns):
+        raise MissingColumnsError(columns)
+    return [header.index(col) for col in columns]
+
+
+def _iter_row_chunks(rows, columns, chunk_rows, first_row, na_strings, convert=None):
+    """تجميع صفوف (قوائم قيم) إلى دفعات بالأعمدة المطلوبة. الصف الأول هو صف العناوين."""
+    positions = _column_positions(next(rows, None) or [], columns)
+    last_position = max(positions)
+    buffer = []
+    for row in rows:
+        if len(row) <= last_position:
+            row = tuple(row) + (None,) * (last_position + 1 - len(row))
+        values = [row[i] for i in positions]
+        if convert is not None:
+            values = [convert(value) for value in values]
+        # القيم النصية الفارغة أو من نوع NA تُعامل كما يعاملها pd.read_excel
+        buffer.append([None if isinstance(value, str) and value in na_strings else value for value in values])
+        if len(buffer) >= chunk_rows:
+            yield _frame(buffer, columns, first_row)
+            first_row += len(buffer)
+            buffer = []
+    if buffer:
+        yield _frame(buffer, columns, first_row)
+
+
+def read_openpyxl(source, columns, chunk_rows, first_row, na_strings):
+    """xlsx تدفقياً (openpyxl read_only): لا يُحمَّل الملف كاملاً ولا بقية الأعمدة."""
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # بعض البرامج تكتب <dimension ref="A1"/> خاطئاً؛ بدون إعادة الضبط يُقرأ الصف الأول فقط
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        yield from _iter_row_chunks(rows, columns, chunk_rows, first_row, na_strings)
+    finally:
+        workbook.close()
+
+
+def _calamine_cell(value):
+    # calamine يُرجع كل الأرقام float، و openpyxl يُرجع الأعداد الصحيحة int
+    if type(value) is float and value.is_integer():
+        return int(value)
+    return value
+
+
+def read_calamine(source, columns, chunk_rows, first_row, na_strings):
+    """xlsx/xls عبر python-calamine (أسرع بعدة مرات من openpyxl، لكنه يحمّل الورقة كاملة)."""
+    if python_calamine is None:
+        raise ImportError("python-calamine غير مثبتة")
+    if hasattr(source, 'read'):
+        workbook = python_calamine.CalamineWorkbook.from_filelike(source)
+    else:
+        workbook = python_calamine.CalamineWorkbook.from_path(source)
+    try:
+        sheet = workbook.get_sheet_by_index(0)
+        # الورقة تبدأ من أول خلية غير فارغة، فيُزاح رقم الصف بمقدار الصفوف الفارغة قبلها
+        first_row += sheet.start[0] if sheet.start else 0
+        yield from _iter_row_chunks(iter(sheet.iter_rows()), columns, chunk_rows, first_row, na_strings,
+                                    convert=_calamine_cell)
+    finally:
+        workbook.close()
+
+
+def read_xls(source, columns, chunk_rows, first_row, na_strings):
+    """xls القديمة عبر pd.read_excel (تحتاج xlrd) كدفعة واحدة."""
+    df = pd.read_excel(source, usecols=lambda col: col in columns, dtype=object)
+    if not all(col in df.columns for col in columns):
+        raise MissingColumnsError(columns)
+    df.index = pd.RangeIndex(first_row, first_row + len(df))
+    yield df[columns]
+
+
+def read_csv(source, columns, chunk_rows, first_row, na_strings):
+    """CSV (UTF-8، مع BOM أو بدونه) على دفعات. كل القيم تُقرأ نصوصاً كما هي في الملف."""
+    header = pd.read_csv(_rewound(source), nrows=0, encoding=CSV_ENCODING).columns
+    _column_positions(list(header), columns)
+    reader = pd.read_csv(
+        _rewound(source), usecols=columns, dtype=object, chunksize=chunk_rows, encoding=CSV_ENCODING,
+        keep_default_na=False, na_values=sorted(na_strings),
+    )
+    for chunk in reader:
+        chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+        first_row += len(chunk)
+        yield chunk[columns]
+
+
+def read_parquet(source, columns, chunk_rows, first_row, na_strings):
+    """Parquet على دفعات (row groups) بالأعمدة المطلوبة فقط."""
+    if pq is None:
+        raise ImportError("pyarrow غير مثبتة")
+    parquet_file = pq.ParquetFile(source)
+    _column_positions(parquet_file.schema_arrow.names, columns)
+    for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+        chunk = batch.to_pandas().astype(object)
+        chunk.index = pd.RangeIndex(first_row, first_row + len(chunk))
+        first_row += len(chunk)
+        yield chunk[columns]
+
+
+INPUT_READERS = {
+    'openpyxl': read_openpyxl,
+    'calamine': read_calamine,
+    'xls': read_xls,
+    'csv': read_csv,
+    'parquet': read_parquet,
+}
+
+
+def available_readers():
+    """المحركات التي يمكن استخدامها في هذه البيئة."""
+    missing = {'calamine': python_calamine is None, 'parquet': pq is None}
+    return [name for name in INPUT_READERS if not missing.get(name)]
+
+
+def select_readers(source, reader=None):
+    """ترتيب المحركات المرشحة لهذا المصدر: المطلوب صراحة (أو من PAYROLL_INPUT_READER) أولاً.
+
+    xlsx: calamine إن كانت مثبتة والملف لا يتجاوز FAST_READER_MAX_BYTES، ثم openpyxl.
+    xls: calamine ثم pd.read_excel. csv و parquet بمحركيهما.
+    """
+    input_format = detect_input_format(source)
+    if input_format == 'xlsx':
+        candidates = ['openpyxl']
+        if python_calamine is not None and source_size(source) <= FAST_READER_MAX_BYTES:
+            candidates.insert(0, 'calamine')
+    elif input_format == 'xls':
+        candidates = ['calamine', 'xls'] if python_calamine is not None else ['xls']
+    else:
+        candidates = [input_format]
+
+    reader = reader or os.environ.get(INPUT_READER_ENV) or None
+    if reader is not None:
+        if reader not in INPUT_READERS:
+            raise ValueError(f"محرك قراءة غير معروف: {reader}")
+        candidates = [reader] + [name for name in candidates if name != reader]
+    return candidates
+
+
+def iter_table_chunks(source, columns, chunk_rows, first_row, na_strings, reader=None, on_reader=None):
+    """دفعات الأعمدة columns من المصدر بأول محرك ينجح (انظر select_readers).
+
+    on_reader(name) تُستدعى باسم المحرك المستخدم فعلاً. الانتقال إلى المحرك التالي يحدث
+    فقط إذا فشل المحرك قبل أول دفعة، و MissingColumnsError لا يُجرَّب بعده محرك آخر.
+    """
+    candidates = select_readers(source, reader)
+    for attempt, name in enumerate(candidates):
+        chunks = INPUT_READERS[name](_rewound(source), columns, chunk_rows, first_row, na_strings)
+        try:
+            first = next(chunks, None)
+        except MissingColumnsError:
+            raise
+        except Exception:
+            # المحرك غير مثبت أو لا يدعم هذا الملف: يُجرب المحرك التالي إن وُجد
+            if attempt == len(candidates) - 1:
+                raise
+            continue
+        if on_reader is not None:
+            on_reader(name)
+        if first is not None:
+            yield first
+            yield from chunks
+        return
@@ -0,0 +1,167 @@
+"""تشغيل مهام المعالجة الطويلة في الخلفية (مجموعة خيوط) مع سجل مهام مشترك بين الجلسات.
+
+submit يُرجع معرف المهمة فوراً، وتُنفذ المهمة في خيط من مجموعة محدودة بعدد أقصى من
+المهام المتزامنة (المهام الزائدة تنتظر في الطابور). الدالة المنفذة تستقبل progress(label)
+التي تحفظ آخر رسالة تقدم وتُنهي المهمة (JobCancelled) إذا طُلب إلغاؤها، فالإلغاء يحدث
+عند أول تقرير تقدم بعد الطلب. المهام المنتهية تبقى في السجل مدة JOB_RETENTION_SECONDS
+حتى يمكن الرجوع إلى نتيجتها بعد إعادة تحميل الصفحة. هذه الوحدة لا تستورد Streamlit.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_MAX_CONCURRENT = 2
+JOB_MAX_CONCURRENT_ENV = 'PAYROLL_MAX_JOBS'
+JOB_RETENTION_SECONDS = 60 * 60
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+JOB_FINISHED_STATES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobCancelled(Exception):
+    """طُلب إلغاء المهمة؛ تُرفع من progress داخل الدالة المنفذة."""
+
+
+class Job:
+    """مهمة واحدة: الحالة وآخر رسالة تقدم والنتيجة أو الخطأ. تُقرأ من خيوط الواجهة."""
+
+    def __init__(self, kind, label=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.label = label
+        self.state = JOB_QUEUED
+        self.message = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def finished(self):
+        return self.state in JOB_FINISHED_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def progress(self, label):
+        """تقرير تقدم من داخل المهمة (ونقطة الإلغاء)."""
+        self.message = label
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def snapshot(self):
+        """حالة المهمة كقاموس (بدون النتيجة) للعرض."""
+        return {
+            'id': self.id, 'kind': self.kind, 'label': self.label, 'state': self.state,
+            'message': self.message, 'error': None if self.error is None else str(self.error),
+            'elapsed_s': round(self.elapsed(), 1), 'cancel_requested': self.cancel_requested,
+        }
+
+
+class JobRunner:
+    """سجل المهام ومجموعة الخيوط المنفذة لها. آمن للاستخدام من عدة جلسات."""
+
+    def __init__(self, max_concurrent=JOB_MAX_CONCURRENT, retention_seconds=JOB_RETENTION_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.retention_seconds = retention_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='payroll-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, func, *args, label=None, **kwargs):
+        """جدولة func(*args, progress=..., **kwargs) وإرجاع معرف المهمة فوراً."""
+        self.prune()
+        job = Job(kind, label)
+        with self._lock:
+            self._jobs[job.id] = job
+        job._future = self._pool.submit(self._run, job, func, args, kwargs)
+        return job.id
+
+    def _run(self, job, func, args, kwargs):
+        if job.cancel_requested:
+            job.state, job.finished_at = JOB_CANCELLED, time.time()
+            return
+        job.state, job.started_at = JOB_RUNNING, time.time()
+        try:
+            job.result = func(*args, progress=job.progress, **kwargs)
+            job.state = JOB_DONE
+        except JobCancelled:
+            job.state = JOB_CANCELLED
+        except Exception as error:  # تُعرض للمستخدم عند متابعة المهمة
+            job.error = error
+            job.state = JOB_FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """طلب إلغاء مهمة: المنتظرة تُلغى فوراً، والجارية عند تقرير تقدمها التالي."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job._cancel.set()
+        if job._future is not None and job._future.cancel():
+            job.state, job.finished_at = JOB_CANCELLED, time.time()
+        return True
+
+    def queue_position(self, job_id):
+        """عدد المهام المنتظرة قبل هذه المهمة (0 إن كانت تالية أو جارية)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != JOB_QUEUED:
+                return 0
+            return sum(1 for other in self._jobs.values()
+                       if other.state == JOB_QUEUED and other.created_at < job.created_at)
+
+    def prune(self, now=None):
+        """حذف المهام المنتهية منذ أكثر من retention_seconds (مع نتائجها)."""
+        now = now or time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at is not None
+                       and now - job.finished_at > self.retention_seconds]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {
+            'max_concurrent': self.max_concurrent,
+            'running': states.count(JOB_RUNNING),
+            'queued': states.count(JOB_QUEUED),
+            'finished': sum(state in JOB_FINISHED_STATES for state in states),
+        }
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            with self._lock:
+                jobs = list(self._jobs.values())
+            for job in jobs:
+                self.cancel(job.id)
+        self._pool.shutdown(wait=True)
+
+
+def runner_from_environment():
+    """JobRunner بعدد المهام المتزامنة المحدد في PAYROLL_MAX_JOBS (أو JOB_MAX_CONCURRENT)."""
+    value = os.environ.get(JOB_MAX_CONCURRENT_ENV)
+    return JobRunner(max(1, int(value)) if value else JOB_MAX_CONCURRENT)
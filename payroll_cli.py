@@ -0,0 +1,250 @@
+"""واجهة سطر الأوامر لمعالجة ملف الرواتب بدون Streamlit (للمهام الدفعية الليلية).
+
+مثال:
+    python payroll_cli.py payroll.xlsx -o output/ --workers 4
+    python payroll_cli.py payroll.parquet -o output/
+    python payroll_cli.py dept_a.xlsx dept_b.xlsx dept_c.csv -o output/ --workers 3
+    python payroll_cli.py payroll_corrected.xlsx -o output/ --incremental
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from input_readers import INPUT_READERS
+from payroll_core import (
+    INPUT_REQUIRED_COLS,
+    MissingColumnsError,
+    XLSX_WRITERS,
+    build_rejects_workbook,
+    build_summary,
+    convert_files_to_txt,
+    split_payroll,
+    write_zip_archive,
+)
+from run_history import (
+    DIFF_MIN_CHANGE_AMOUNT,
+    DIFF_MIN_CHANGE_PERCENT,
+    RUN_HISTORY_DEFAULT_DB,
+    RunHistory,
+    build_diff_workbook,
+    history_rows_from_files,
+)
+from run_manifest import (
+    CHUNK_UNCHANGED,
+    MANIFEST_VERSION,
+    build_manifest,
+    compare_manifests,
+    count_changes,
+    read_manifest,
+    write_manifest,
+)
+from run_metrics import RunRecorder, measure
+
+
+def _write_files(directory, files_list, keep=()):
+    """كتابة الملفات إلى المجلد؛ الملفات الموجودة التي يبدأ اسمها بأحد keep (بدون الامتداد) لا تُعاد كتابتها."""
+    os.makedirs(directory, exist_ok=True)
+    for file_data in files_list:
+        path = os.path.join(directory, file_data['filename'])
+        if os.path.splitext(file_data['filename'])[0] in keep and os.path.exists(path):
+            continue
+        with open(path, 'wb') as handle:
+            handle.write(file_data['content'])
+
+
+def _previous_output(directory, manifest, extension):
+    """دالة reuse(chunk_hash) تقرأ ملف التشغيل السابق لنفس الشريحة من directory (إن وُجد)."""
+    names = {}
+    if manifest is not None and manifest.get('version') == MANIFEST_VERSION:
+        names = {chunk['hash']: os.path.splitext(chunk['filename'])[0] + extension for chunk in manifest['chunks']}
+
+    def lookup(hash_value):
+        name = names.get(hash_value)
+        if name is None:
+            return None
+        try:
+            with open(os.path.join(directory, name), 'rb') as handle:
+                return handle.read()
+        except OSError:
+            return None
+    return lookup
+
+
+def _remove_stale_outputs(output_dir, previous_manifest, processed_files):
+    """حذف ملفات شرائح التشغيل السابق التي لم تعد ضمن النواتج (حتى لا تُرسل ملفات قديمة)."""
+    current = {os.path.splitext(f['filename'])[0] for f in processed_files}
+    for chunk in previous_manifest['chunks']:
+        base_name = os.path.splitext(chunk['filename'])[0]
+        if base_name in current:
+            continue
+        for path in (os.path.join(output_dir, 'excel', chunk['filename']),
+                     os.path.join(output_dir, 'txt', base_name + '.txt'),
+                     os.path.join(output_dir, 'txt', base_name + '.csv')):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def run(input_path, output_dir, split_mode='greedy', workers=1, today=None, make_txt=True, make_zip=True,
+        zip_level=None, progress=None, recorder=None, history=None, diff_previous=False,
+        min_change_amount=DIFF_MIN_CHANGE_AMOUNT, min_change_percent=DIFF_MIN_CHANGE_PERCENT, reader=None,
+        incremental=False, xlsx_writer=None):
+    """تشغيل خط المعالجة كاملاً وكتابة النواتج إلى output_dir. يُرجع قاموس إحصائيات.
+
+    history (RunHistory اختياري) يحفظ صفوف التشغيل، و diff_previous يكتب تقرير المقارنة
+    مع أحدث تشغيل سابق محفوظ. reader يفرض محرك قراءة الإدخال (الافتراضي اختيار تلقائي)،
+    و xlsx_writer محرك كتابة ملفات المصارف (الافتراضي pandas).
+    input_path مسار واحد أو قائمة مسارات تُدمج قبل التقسيم (تُقرأ بالتوازي بـ workers عملية).
+    بيان التشغيل (manifest.json) يُكتب دائماً في output_dir؛ مع incremental تُستخدم ملفات
+    التشغيل السابق في المجلد نفسه للشرائح التي لم تتغير صفوفها ولا يُعاد إنشاؤها أو كتابتها.
+    """
+    today = today or datetime.now()
+    stamp = today.strftime('%Y%m%d_%H%M%S')
+
+    input_paths = list(input_path) if isinstance(input_path, (list, tuple)) else [input_path]
+    previous_manifest = read_manifest(output_dir) if incremental else None
+    result = split_payroll(input_paths if len(input_paths) > 1 else input_paths[0], split_mode=split_mode,
+                           export_workers=workers, today=today, progress=progress, recorder=recorder, reader=reader,
+                           read_workers=workers, xlsx_writer=xlsx_writer,
+                           reuse=_previous_output(os.path.join(output_dir, 'excel'), previous_manifest, '.xlsx'))
+    processed_files = result['files']
+    manifest = build_manifest(processed_files, created=today)
+    changes = compare_manifests(previous_manifest, manifest)
+    unchanged = {os.path.splitext(name)[0] for name, status in changes['files'].items() if status == CHUNK_UNCHANGED}
+    if previous_manifest is not None:
+        _remove_stale_outputs(output_dir, previous_manifest, processed_files)
+    _write_files(os.path.join(output_dir, 'excel'), processed_files, keep=unchanged)
+
+    summary = build_summary(processed_files, now=today, recorder=recorder,
+                            sources=result['sources'] if len(result['sources']) > 1 else None, summary=result['summary'])
+    _write_files(output_dir, [summary])
+    if len(result['rejects']):
+        _write_files(output_dir, [build_rejects_workbook(result['rejects'], now=today)])
+
+    encrypted_files = []
+    if make_txt:
+        encrypted_files = convert_files_to_txt(
+            processed_files, progress=progress, recorder=recorder,
+            reuse=_previous_output(os.path.join(output_dir, 'txt'), previous_manifest, '.txt')
+        )
+        _write_files(os.path.join(output_dir, 'txt'), encrypted_files, keep=unchanged)
+
+    if make_zip:
+        with measure(recorder, 'zip', sum(f['rows'] for f in processed_files)):
+            write_zip_archive(os.path.join(output_dir, f"Processed_Excel_Files_{stamp}.zip"), processed_files, zip_level)
+            if encrypted_files:
+                write_zip_archive(os.path.join(output_dir, f"Encrypted_Files_{stamp}.zip"), encrypted_files, zip_level)
+
+    # البيان يُكتب بعد كل النواتج حتى لا يشير تشغيل متوقف إلى ملفات لم تُكتب
+    write_manifest(output_dir, manifest)
+
+    diff_counts = None
+    if history is not None:
+        run_id = history.save_run(history_rows_from_files(processed_files), today, label='، '.join(os.path.basename(path) for path in input_paths))
+        previous_run_id = history.previous_run_id(run_id) if diff_previous else None
+        if previous_run_id is not None:
+            diff = history.diff(previous_run_id, run_id, min_change_amount, min_change_percent)
+            _write_files(output_dir, [build_diff_workbook(diff, now=today)])
+            diff_counts = {key: len(diff[key]) for key in ('added', 'removed', 'changed')}
+
+    return {
+        'diff': diff_counts,
+        'reconciliation': result['summary']['reconciliation'],
+        'changes': count_changes(changes) if previous_manifest is not None else None,
+        'reused_files': sum(1 for f in processed_files if f['reused']),
+        'excel_files': len(processed_files),
+        'txt_files': len(encrypted_files),
+        'rows': sum(f['rows'] for f in processed_files),
+        'amount': round(sum(f['amount'] for f in processed_files), 2),
+        'zero_rows_dropped': result['zero_rows_dropped'],
+        'rejected_rows': len(result['rejects']),
+        'duplicate_rows': sum(stats['duplicates'] for stats in result['sources']),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="معالجة ملف الرواتب وتقسيمه إلى ملفات المصارف (بدون Streamlit).")
+    parser.add_argument('input', nargs='+',
+                        help="ملف أو ملفات الإدخال (xlsx/xls/csv/parquet) بالأعمدة: " + "، ".join(INPUT_REQUIRED_COLS))
+    parser.add_argument('-o', '--output-dir', required=True, help="مجلد النواتج")
+    parser.add_argument('--reader', choices=list(INPUT_READERS), default=None,
+                        help="محرك قراءة الإدخال (الافتراضي: اختيار تلقائي حسب نوع الملف وحجمه)")
+    parser.add_argument('--xlsx-writer', choices=XLSX_WRITERS, default=None,
+                        help="محرك كتابة ملفات المصارف: pandas (الافتراضي) أو streaming (xlsxwriter بذاكرة"
+                             " ثابتة ونصوص inline؛ لم يُتحقق من قبول أنظمة المصارف له، يُستخدم صراحة فقط)")
+    parser.add_argument('--split-mode', choices=['greedy', 'min_files'], default='greedy')
+    parser.add_argument('--workers', type=int, default=1, help="عدد العمليات المتوازية لقراءة ملفات الإدخال وكتابة ملفات Excel")
+    parser.add_argument('--date', type=lambda value: datetime.strptime(value, '%Y-%m-%d'), default=None,
+                        help="تاريخ المعالجة YYYY-MM-DD (الافتراضي: اليوم)")
+    parser.add_argument('--no-txt', action='store_true', help="عدم إنشاء ملفات TXT/CSV")
+    parser.add_argument('--no-zip', action='store_true', help="عدم إنشاء الأرشيفات المضغوطة")
+    parser.add_argument('--zip-level', type=int, choices=range(10), default=None, metavar='0-9',
+                        help="مستوى ضغط DEFLATE لملفات TXT/CSV داخل الأرشيف (الافتراضي: بدون ضغط)")
+    parser.add_argument('--history', nargs='?', const=RUN_HISTORY_DEFAULT_DB, metavar='DB',
+                        help=f"حفظ صفوف التشغيل في سجل SQLite للمقارنة الشهرية (الافتراضي: {RUN_HISTORY_DEFAULT_DB})")
+    parser.add_argument('--diff', action='store_true',
+                        help="كتابة تقرير المقارنة (Payroll_Diff) مع أحدث تشغيل سابق في السجل")
+    parser.add_argument('--min-change-amount', type=float, default=DIFF_MIN_CHANGE_AMOUNT,
+                        help="أقل فرق في الراتب (د.ع) ليُعد تغيراً")
+    parser.add_argument('--min-change-percent', type=float, default=DIFF_MIN_CHANGE_PERCENT,
+                        help="أقل نسبة تغير في الراتب (٪) ليُعد تغيراً")
+    parser.add_argument('--incremental', action='store_true',
+                        help="إعادة إنشاء ملفات الشرائح التي تغيرت صفوفها فقط منذ التشغيل السابق في مجلد النواتج")
+    parser.add_argument('--report', metavar='PATH',
+                        help="حفظ تقرير زمن وذاكرة كل مرحلة (JSON، أو CSV إذا انتهى المسار بـ .csv)")
+    parser.add_argument('--profile', action='store_true',
+                        help="تشغيل cProfile و tracemalloc أثناء المراحل وإضافة النتائج إلى التقرير")
+    parser.add_argument('-q', '--quiet', action='store_true', help="عدم طباعة رسائل التقدم")
+    args = parser.parse_args(argv)
+
+    progress = None if args.quiet else (lambda label: print(label, file=sys.stderr))
+    recorder = RunRecorder(profile=args.profile) if args.report or args.profile else None
+    history_path = args.history or (RUN_HISTORY_DEFAULT_DB if args.diff else None)
+    try:
+        stats = run(
+            args.input, args.output_dir,
+            split_mode=args.split_mode, workers=args.workers, today=args.date,
+            make_txt=not args.no_txt, make_zip=not args.no_zip, zip_level=args.zip_level, progress=progress,
+            recorder=recorder, history=RunHistory(history_path) if history_path else None,
+            diff_previous=args.diff, min_change_amount=args.min_change_amount,
+            min_change_percent=args.min_change_percent, reader=args.reader, incremental=args.incremental,
+            xlsx_writer=args.xlsx_writer,
+        )
+    except MissingColumnsError:
+        print(f"الملف يجب أن يحتوي على الأعمدة: {', '.join(INPUT_REQUIRED_COLS)}", file=sys.stderr)
+        return 2
+
+    if stats['zero_rows_dropped']:
+        print(f"تم حذف {stats['zero_rows_dropped']} صفاً من عمود 'الراتب الصافي' بقيمة صفر.", file=sys.stderr)
+    if stats['duplicate_rows']:
+        print(f"تم رفض {stats['duplicate_rows']} صفاً لأن IBAN موجود في ملف إدخال آخر سبقه.", file=sys.stderr)
+    invalid_rows = stats['rejected_rows'] - stats['zero_rows_dropped'] - stats['duplicate_rows']
+    if invalid_rows:
+        print(f"تم رفض {invalid_rows} صفاً لبيانات غير صالحة (التفاصيل في ملف Rejected_Rows).", file=sys.stderr)
+    print(f"اكتملت المعالجة: {stats['excel_files']} ملف Excel، {stats['txt_files']} ملف TXT/CSV، "
+          f"{stats['rows']} صف، المبلغ الإجمالي {stats['amount']:,} د.ع")
+    check = stats['reconciliation']
+    if not check['ok']:
+        print(f"تحذير: مجموع ملفات المصارف ({check['file_rows']} صف، {check['file_amount']:,} د.ع) لا يطابق "
+              f"مجموع الإدخال المقبول ({check['input_rows']} صف، {check['input_amount']:,} د.ع).", file=sys.stderr)
+    if stats['changes'] is not None:
+        print(f"مقارنة بالتشغيل السابق في المجلد: {stats['changes']['changed']} ملف تغير، "
+              f"{stats['changes']['added']} جديد، {stats['changes']['removed']} محذوف، "
+              f"{stats['changes']['unchanged']} بدون تغيير (أعيد استخدام {stats['reused_files']}).")
+    elif args.incremental:
+        print("لا يوجد بيان تشغيل سابق في مجلد النواتج؛ تم إنشاء كل الملفات.", file=sys.stderr)
+    if stats['diff'] is not None:
+        print(f"المقارنة مع التشغيل السابق: {stats['diff']['added']} مستفيد جديد، "
+              f"{stats['diff']['removed']} محذوف، {stats['diff']['changed']} تغير راتبه.")
+    elif args.diff:
+        print("لا يوجد تشغيل سابق في السجل للمقارنة.", file=sys.stderr)
+    if args.report:
+        with open(args.report, 'wb') as handle:
+            handle.write(recorder.to_csv() if args.report.lower().endswith('.csv') else recorder.to_json())
+    elif args.profile:
+        print(recorder.profile_text(), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
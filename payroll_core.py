@@ -0,0 +1,1060 @@
+"""المنطق الأساسي لمعالجة ملفات الرواتب بدون أي اعتماد على Streamlit.
+
+يمكن استيراد هذه الوحدة من واجهة Streamlit (AllSal.py) أو من سطر الأوامر
+(payroll_cli.py) أو من أي مهمة دفعية. الدوال ترجع قيماً عادية وتقبل دالة
+progress(label) اختيارية لتقارير التقدم بدلاً من حاويات الحالة في Streamlit.
+"""
+import pandas as pd
+import numpy as np
+import io
+import os
+import csv
+import re
+import tempfile
+import time
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from excel_export import export_excel_files, write_columns_xlsx, write_excel_bytes
+from input_readers import MissingColumnsError, iter_table_chunks
+from run_manifest import chunk_hash
+from run_metrics import measure
+from run_workspace import link_or_copy, read_output, write_file
+
+# ----------------------------------------------------------------------
+# --- الثوابت والبيانات الثابتة ---
+# ----------------------------------------------------------------------
+PAYER_NAME = "مديرية تربية البصرة"
+PAYER_ACCOUNT = "IQ26RAFB002100366585001"
+CURRENCY = "IQD"
+DETAILS_OF_CHARGES = "SLEV"
+REMITTANCE_INFO_TEMPLATE = "SALARY {} {}"
+MAX_ROWS_PER_FILE = 4000
+MAX_AMOUNT_PER_FILE = 4_500_000_000
+BANK_BICS = {
+    'RAFB': 'RAFBIQB1098', 'RDBA': 'RDBAIQB1046', 'AIBI': 'AIBIIQBA991',
+    'IDBQ': 'IDBQIQBA004', 'AINI': 'AINIIQBA015', 'NBIQ': 'NBIQIQBA830'
+}
+ARABIC_BANK_NAME_MAP = {
+    'RAFB': 'الرافدين', 'RDBA': 'الرشيد', 'AIBI': 'آشور',
+    'IDBQ': 'التنمية', 'AINI': 'الطيف', 'NBIQ': 'الأهلي'
+}
+ALL_BRANCHES_BIC = {
+    'RAFBIQB1098', 'RDBAIQB1046', 'AIBIIQBA991', 'IDBQIQBA004',
+    'AINIIQBA015', 'AINIIQBA009',
+    'NBIQIQBA830', 'NBIQIQBA856', 'NBIQIQBA859', 'NBIQIQBA005',
+    'NBIQIQBA860', 'NBIQIQBA862', 'NBIQIQBA849', 'NBIQIQBA865',
+    'NBIQIQBA844', 'NBIQIQBA848', 'NBIQIQBA850'
+}
+BANKS_WITH_DYNAMIC_BRANCHES = ['AINI', 'NBIQ']
+BANK_KEYS_FOR_FILTERING = list(BANK_BICS.keys())
+INPUT_REQUIRED_COLS = ['الاسم', 'Iban', 'الراتب الصافي']
+INPUT_CHUNK_ROWS = 50_000
+# رقم أول صف بيانات في ملف الإدخال (الصف 1 للعناوين)، لترقيم الصفوف المرفوضة كما في Excel
+INPUT_FIRST_DATA_ROW = 2
+IBAN_COUNTRY_CODE = 'IQ'
+IBAN_LENGTH = 23
+REJECT_REASON_COL = 'سبب الرفض'
+REJECT_ROW_COL = 'رقم الصف'
+# يُضاف إلى الصفوف المرفوضة عند معالجة أكثر من ملف إدخال معاً
+SOURCE_FILE_COL = 'الملف المصدر'
+DUPLICATE_IBAN_REASON = "IBAN مكرر في ملف آخر"
+ZIP_SPOOL_MAX_BYTES = 32 * 1024 * 1024
+# ملفات مضغوطة أصلاً لا فائدة من إعادة ضغطها داخل الأرشيف
+PRECOMPRESSED_EXTENSIONS = ('.xlsx', '.zip')
+ARABIC_MONTHS = {
+    1: "كانون الثاني", 2: "شباط", 3: "آذار", 4: "نيسان", 5: "أيار", 6: "حزيران",
+    7: "تموز", 8: "آب", 9: "أيلول", 10: "تشرين الأول", 11: "تشرين الثاني", 12: "كانون الأول"
+}
+FINAL_EXCEL_COLS = [
+    'Reference', 'Value Date', 'Payer Name', 'Payer Acount', 'Amount',
+    'Currency', 'Receiver BIC', 'Beneficiary Name', 'Beneficiary Acount',
+    'Remittance Information', 'Details of Charges'
+]
+TXT_EXPORT_COLS = [col for col in FINAL_EXCEL_COLS if col != 'Reference']
+# عرض الأعمدة وتنسيق المبلغ في ملفات المصارف (كما في نسخة سطح المكتب القديمة)
+XLSX_COLUMN_WIDTHS = {
+    'Reference': 34, 'Value Date': 12, 'Payer Name': 22, 'Payer Acount': 27, 'Amount': 16,
+    'Currency': 10, 'Receiver BIC': 14, 'Beneficiary Name': 40, 'Beneficiary Acount': 27,
+    'Remittance Information': 26, 'Details of Charges': 18,
+}
+XLSX_NUMBER_FORMATS = {'Amount': '#,##0'}
+# سماح المطابقة لكل ملف: مبلغ الملف في الملخص مقرب إلى منزلتين عشريتين
+SUMMARY_ROUNDING_TOLERANCE = 0.005
+# محرك كتابة ملفات المصارف: 'pandas' (to_excel، الافتراضي) أو 'streaming' (xlsxwriter بوضع
+# constant_memory، اختياري). streaming يكتب النصوص inline بدل جدول النصوص المشتركة، وهو xlsx صالح
+# لكن لم يُتحقق بعد من قبول أنظمة استيراد المصارف له؛ لذا لا يُفعَّل إلا صراحة.
+XLSX_WRITER_ENV = 'PAYROLL_XLSX_WRITER'
+XLSX_WRITERS = ('pandas', 'streaming')
+DEFAULT_XLSX_WRITER = 'pandas'
+# القيم النصية التي يعتبرها pd.read_excel فارغة (NaN) عند إعادة قراءة ملف xlsx
+EXCEL_NA_STRINGS = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+})
+
+# ----------------------------------------------------------------------
+# --- الدوال المساعدة (بدون تغيير كبير في المنطق الداخلي) ---
+# ----------------------------------------------------------------------
+
+# (تم إزالة دالة adjust_column_width و set_arabic_number_format لتبسيط التوافق مع بيئة Streamlit)
+# لأن التعامل مع تنسيقات openpyxl يكون معقداً داخل Streamlit ويُفضل ترك التنسيق اليدوي
+# أو استخدام أدوات تخطيط البيانات في Streamlit.
+
+def get_receiver_bic_dynamic(row):
+    """تحديد BIC للمصرف بناءً على مفتاح المصرف ورقم IBAN."""
+    key = row['Bank Key']
+    iban = str(row['Iban'])
+    if key in BANKS_WITH_DYNAMIC_BRANCHES:
+        try:
+            branch_code = iban[8:11]
+            bic_prefix = key + 'IQBA'
+            suggested_bic = bic_prefix + branch_code
+            if suggested_bic in ALL_BRANCHES_BIC:
+                return suggested_bic
+            else:
+                return BANK_BICS[key]
+        except Exception:
+            return BANK_BICS[key]
+    else:
+        return BANK_BICS[key]
+
+
+def build_bic_lookup_index(bank_bics, all_branches_bic, dynamic_banks):
+    """بناء فهرس بحث مسبق يربط IBAN[4:11] (مفتاح المصرف + رمز الفرع) برمز BIC الفرع."""
+    branch_index = {}
+    for bic in all_branches_bic:
+        key = bic[:4]
+        if key in dynamic_banks and bic[4:8] == 'IQBA':
+            branch_index[key + bic[8:]] = bic
+    return {'head_office': dict(bank_bics), 'branches': branch_index}
+
+
+BIC_LOOKUP_INDEX = build_bic_lookup_index(BANK_BICS, ALL_BRANCHES_BIC, BANKS_WITH_DYNAMIC_BRANCHES)
+# فئات ثابتة (مرتبة) لعمود Receiver BIC حتى يبقى التجميع بنفس ترتيب النصوص السابق
+RECEIVER_BIC_CATEGORIES = sorted(
+    set(BIC_LOOKUP_INDEX['head_office'].values()) | set(BIC_LOOKUP_INDEX['branches'].values())
+)
+
+
+def resolve_receiver_bics(iban_series, bic_index=None):
+    """تحديد BIC لكامل عمود IBAN دفعة واحدة (بديل مُتجه لـ get_receiver_bic_dynamic).
+
+    يُقتطع IBAN[4:11] عمودياً ثم يُبحث عن القيم الفريدة فقط في الفهرس، مع الرجوع
+    إلى BIC الإدارة العامة للمصرف عند عدم وجود الفرع. المفاتيح غير المعروفة تعطي NaN.
+    """
+    if bic_index is None:
+        bic_index = BIC_LOOKUP_INDEX
+    ibans = iban_series.astype(str)
+
+    # البحث في القيم الفريدة فقط ثم إعادة توزيعها على الصفوف
+    codes, uniques = pd.factorize(ibans.str[4:11])
+    head_office = bic_index['head_office']
+    branches = bic_index['branches']
+    resolved = [branches.get(u, head_office.get(u[:4])) for u in uniques]
+    resolved.append(None)  # الرمز -1 (IBAN مفقود) يُشير إلى آخر عنصر
+    return pd.Series(np.array(resolved, dtype=object)[codes], index=iban_series.index, dtype=object)
+
+def plan_split_boundaries(amounts, max_rows=MAX_ROWS_PER_FILE, max_amount=MAX_AMOUNT_PER_FILE):
+    """حساب حدود الملفات [(بداية، نهاية)] بالطريقة الجشعة نفسها للحلقة القديمة.
+
+    لكل ملف يُختار أكبر عدد من الصفوف (بحد MAX_ROWS_PER_FILE) لا يتجاوز مجموعها
+    MAX_AMOUNT_PER_FILE، والصف الذي يتجاوز الحد وحده يوضع في ملف مستقل. تُستخدم
+    المجاميع التراكمية مع البحث الثنائي بدلاً من إعادة الجمع بعد حذف كل صف.
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    num_rows = len(amounts)
+    cumsum = np.concatenate(([0.0], np.cumsum(amounts)))
+    # البحث الثنائي يتطلب مجاميع تراكمية غير متناقصة (لا مبالغ سالبة)
+    monotonic = not (amounts < 0).any()
+    boundaries = []
+    start_row = 0
+    while start_row < num_rows:
+        cap = min(start_row + max_rows, num_rows)
+        window = cumsum[start_row + 1:cap + 1]
+        if monotonic:
+            fits = int(np.searchsorted(window, cumsum[start_row] + max_amount, side='right'))
+        else:
+            ok = np.flatnonzero(window - cumsum[start_row] <= max_amount)
+            fits = int(ok[-1]) + 1 if ok.size else 0
+        end_row = start_row + max(fits, 1)
+        boundaries.append((start_row, end_row))
+        start_row = end_row
+    return boundaries
+
+
+def plan_min_file_count(amounts, max_rows=MAX_ROWS_PER_FILE, max_amount=MAX_AMOUNT_PER_FILE):
+    """توزيع الصفوف على أقل عدد ممكن من الملفات مع احترام الحدين (يسمح بإعادة ترتيب الصفوف).
+
+    يُرجع قائمة بمصفوفات مواقع الصفوف لكل ملف (مرتبة تصاعدياً داخل الملف). الصفوف
+    التي يتجاوز مبلغها الحد وحدها توضع في ملفات مستقلة، والباقي يُوزع بترتيب
+    تنازلي حسب المبلغ بنمط متعرج (snake) على k ملفات مع زيادة k حتى تتحقق الحدود.
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    oversized = np.flatnonzero(amounts > max_amount)
+    rest = np.flatnonzero(amounts <= max_amount)
+    groups = [oversized[i:i + 1] for i in range(len(oversized))]
+
+    if rest.size:
+        order = rest[np.argsort(-amounts[rest], kind='stable')]
+        sorted_amounts = amounts[order]
+        num_files = max(
+            -(-rest.size // max_rows),
+            int(np.ceil(max(sorted_amounts.sum(), 0.0) / max_amount)),
+            1,
+        )
+        positions = np.arange(rest.size)
+        while True:
+            round_no, slot = np.divmod(positions, num_files)
+            file_of_row = np.where(round_no % 2 == 0, slot, num_files - 1 - slot)
+            totals = np.bincount(file_of_row, weights=sorted_amounts, minlength=num_files)
+            if totals.max() <= max_amount or num_files >= rest.size:
+                break
+            num_files += 1
+        for file_no in range(num_files):
+            groups.append(np.sort(order[file_of_row == file_no]))
+
+    groups = [g for g in groups if g.size]
+    groups.sort(key=lambda g: g[0])
+    return groups
+
+
+def build_split_plan(df_final, split_mode='greedy', max_rows=MAX_ROWS_PER_FILE, max_amount=MAX_AMOUNT_PER_FILE):
+    """بناء خطة التقسيم لكل Receiver BIC قبل كتابة أي ملف Excel.
+
+    يُرجع قائمة قواميس: bic، file_index، rows (مدى الصفوف slice أو مصفوفة مواقع)،
+    row_count، amount، frame (شريحة البيانات). split_mode: 'greedy' (السلوك الحالي)
+    أو 'min_files' (أقل عدد ملفات).
+    """
+    if split_mode not in ('greedy', 'min_files'):
+        raise ValueError(f"نمط تقسيم غير معروف: {split_mode}")
+
+    plan = []
+    for bic, bank_df in df_final.groupby('Receiver BIC', observed=True):
+        amounts = bank_df['Amount'].to_numpy(dtype=float)
+        if split_mode == 'greedy':
+            row_groups = [slice(start, end) for start, end in plan_split_boundaries(amounts, max_rows, max_amount)]
+        else:
+            row_groups = plan_min_file_count(amounts, max_rows, max_amount)
+
+        for file_index, rows in enumerate(row_groups, start=1):
+            current_slice = bank_df.iloc[rows]
+            plan.append({
+                'bic': bic,
+                'file_index': file_index,
+                'rows': rows,
+                'row_count': len(current_slice),
+                'amount': current_slice['Amount'].sum(),
+                'frame': current_slice
+            })
+    return plan
+
+def format_amounts_for_txt(amounts):
+    """تنسيق عمود المبلغ كنص بفواصل الآلاف بين علامتي تنصيص ("1,500,000") دفعة واحدة.
+
+    يطابق ناتج المسار القديم (كتابة xlsx ثم قراءته ثم f'"{int(x):,}"'): القيم غير
+    الصحيحة تُقرَّب أولاً إلى 16 رقماً معنوياً كما يخزنها xlsx ثم يُحذف الكسر.
+    """
+    values = pd.to_numeric(amounts, errors='coerce').to_numpy(dtype=float, na_value=np.nan, copy=True)
+    valid = ~np.isnan(values)
+    fractional = valid & (values != np.trunc(values))
+    if fractional.any():
+        values[fractional] = [float(f'{v:.16G}') for v in values[fractional]]
+
+    ints = np.trunc(values[valid]).astype(np.int64)
+    remaining = np.abs(ints)
+    grouped = pd.Series(remaining % 1000).astype(str).str.zfill(3)
+    remaining = remaining // 1000
+    while (remaining > 0).any():
+        grouped = pd.Series(remaining % 1000).astype(str).str.zfill(3) + ',' + grouped
+        remaining = remaining // 1000
+    grouped = grouped.str.lstrip('0,').replace('', '0')
+    grouped = grouped.where(ints >= 0, '-' + grouped)
+
+    formatted = np.full(len(values), '', dtype=object)
+    formatted[valid] = ('"' + grouped + '"').to_numpy(dtype=object)
+    return pd.Series(formatted, index=amounts.index, dtype=object)
+
+
+def encode_bank_txt(frame):
+    """ترميز شريحة ملف (بأعمدة FINAL_EXCEL_COLS) مباشرة إلى محتوى TXT/CSV المفصول بـ | (UTF-8).
+
+    بديل لإعادة قراءة ملف xlsx المُولَّد: يُنتج البايتات نفسها بالضبط، مع تطبيق
+    استبدال المسافات/الـ TAB بـ | مرة واحدة على النص كاملاً بدلاً من كل سطر.
+    """
+    out = pd.DataFrame(index=frame.index)
+    for col in TXT_EXPORT_COLS:
+        if col == 'Amount':
+            out[col] = format_amounts_for_txt(frame[col])
+        else:
+            values = frame[col].astype(object)
+            text = values.where(values.isna(), values.astype(str))
+            # محاكاة إعادة القراءة من xlsx: القيم الفارغة ونصوص NA تُكتب فارغة
+            out[col] = text.where(~text.isin(EXCEL_NA_STRINGS) & text.notna(), '')
+
+    buffer = io.StringIO()
+    out.to_csv(buffer, sep='\t', index=False, header=False, quoting=csv.QUOTE_NONE, escapechar='\\')
+    content = re.sub(r'[ \t]+', '|', buffer.getvalue())
+    return '\n'.join(content.splitlines()).encode('utf-8')
+
+def convert_excel_bytes_to_txt(excel_content):
+    """تحويل ملف xlsx مقسم (بايتات) إلى محتوى TXT/CSV بإعادة قراءته (المسار الأصلي)."""
+    # 1. قراءة الملف المقسم من الذاكرة
+    df = pd.read_excel(io.BytesIO(excel_content), dtype=str)
+
+    # تنسيق عمود المبلغ
+    if 'Amount' in df.columns:
+        df['Amount'] = df['Amount'].astype(str).str.replace(',', '')
+        df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce').map(
+            lambda x: f'"{int(x):,}"' if pd.notnull(x) else ""
+        )
+
+    # 2. تحضير لملف TXT (إزالة عمود Reference)
+    cols_to_keep = [col for col in df.columns if col != 'Reference']
+
+    # حفظ مؤقت إلى مصفوفة بايت بترميز utf-16 مفصول بـ TAB
+    buffer_utf16 = io.StringIO()
+    df[cols_to_keep].to_csv(buffer_utf16, sep='\t', index=False, encoding='utf-16', quoting=csv.QUOTE_NONE, escapechar='\\')
+
+    # 3. قراءة المحتوى واستبدال المسافات/الـ TAB بـ | والترميز إلى UTF-8
+    lines = buffer_utf16.getvalue().splitlines()
+    new_lines = []
+    for line in lines:
+        new_line = re.sub(r'[ \t]+', '|', line.rstrip('\n\r'))
+        new_lines.append(new_line)
+
+    # إزالة السطر الأول (رؤوس الأعمدة)
+    if new_lines:
+        new_lines.pop(0)
+
+    # 4. حفظ الملف النهائي بترميز UTF-8 في الذاكرة
+    return '\n'.join(new_lines).encode('utf-8')
+
+
+def iter_input_chunks(source, chunk_rows=INPUT_CHUNK_ROWS, reader=None, on_reader=None):
+    """قراءة الأعمدة المطلوبة فقط من ملف الإدخال على دفعات من الصفوف (فهرس الدفعة = رقم الصف).
+
+    محرك القراءة يُختار تلقائياً حسب نوع الملف وحجمه (xlsx/xls/csv/parquet)، أو يُحدد
+    بـ reader، مع الانتقال إلى محرك بديل عند الفشل (انظر input_readers.select_readers).
+    on_reader(name) تُستدعى باسم المحرك المستخدم.
+    """
+    return iter_table_chunks(source, INPUT_REQUIRED_COLS, chunk_rows, INPUT_FIRST_DATA_ROW, EXCEL_NA_STRINGS,
+                             reader=reader, on_reader=on_reader)
+
+
+def _mod97_transitions():
+    """جدول انتقال باقي القسمة على 97 لكل بايت: table[r * 256 + byte].
+
+    الرقم يضيف خانة واحدة (r*10 + d) والحرف يضيف خانتين (r*100 + 10..35) وفق ISO 13616.
+    """
+    codes = np.arange(256)
+    is_letter = codes >= ord('A')
+    values = np.where(is_letter, codes - (ord('A') - 10), codes - ord('0'))
+    scales = np.where(is_letter, 100, 10)
+    return ((np.arange(97)[:, None] * scales + values) % 97).ravel()
+
+
+MOD97_TRANSITIONS = _mod97_transitions()
+
+
+def iban_mod97(ibans, width=IBAN_LENGTH):
+    """باقي قسمة IBAN على 97 وفق ISO 13616 لعمود كامل دفعة واحدة (بدون حلقة على الصفوف).
+
+    ibans: قيم نصية بطول width من أحرف إنجليزية كبيرة وأرقام فقط. تُجمع البايتات في
+    مصفوفة (width × n) ثم يُحدَّث الباقي لكل الصفوف معاً خانة بخانة عبر جدول انتقال،
+    بدءاً من الخانة الخامسة ثم الخانات الأربع الأولى. IBAN الصحيح باقيه 1.
+    """
+    data = ''.join(np.asarray(ibans, dtype=object)).encode('ascii')
+    columns = np.ascontiguousarray(np.frombuffer(data, dtype=np.uint8).reshape(-1, width).T)
+    remainder = np.zeros(columns.shape[1], dtype=np.intp)
+    for position in [*range(4, width), *range(4)]:
+        remainder *= 256
+        remainder += columns[position]
+        remainder = MOD97_TRANSITIONS.take(remainder)
+    return remainder
+
+
+def normalize_ibans(iban_series):
+    """IBAN نصياً بدون المسافات المحيطة وبأحرف كبيرة (الشكل المكتوب في ملفات المصارف)."""
+    return iban_series.astype(str).str.strip().str.upper()
+
+
+def validate_ibans(iban_series):
+    """سبب رفض كل IBAN (أو NaN إذا كان صالحاً): الطول، رمز الدولة، الرموز، رقم التحقق mod-97.
+
+    الفحوص تجري على IBAN بعد normalize_ibans، فالمسافات المحيطة والأحرف الصغيرة لا تُرفض.
+    """
+    ibans = normalize_ibans(iban_series)
+    reasons = pd.Series(np.nan, index=iban_series.index, dtype=object)
+
+    bad_length = ibans.str.len() != IBAN_LENGTH
+    reasons[bad_length] = f"طول IBAN غير صحيح (المطلوب {IBAN_LENGTH} خانة)"
+    bad_country = reasons.isna() & (ibans.str[:2] != IBAN_COUNTRY_CODE)
+    reasons[bad_country] = f"رمز الدولة ليس {IBAN_COUNTRY_CODE}"
+    bad_chars = reasons.isna() & ~ibans.str.fullmatch(r'[A-Z0-9]+')
+    reasons[bad_chars] = "IBAN يحتوي على رموز غير صالحة"
+
+    to_check = reasons.isna().to_numpy()
+    if to_check.any():
+        checksum_ok = iban_mod97(ibans[to_check]) == 1
+        reasons.iloc[np.flatnonzero(to_check)[~checksum_ok]] = "رقم التحقق (mod-97) غير صحيح"
+    return reasons
+
+
+def clean_input_chunk(chunk):
+    """تنظيف دفعة من صفوف الإدخال والتحقق منها: حذف الفارغ والراتب الصفري، التحقق من IBAN
+    وتوحيد شكله (normalize_ibans)، قص الاسم، وفلترة مفتاح المصرف.
+
+    يُرجع (الدفعة المنظفة مع عمود Bank Key، عدد الصفوف المحذوفة بسبب الراتب الصفري،
+    الصفوف المرفوضة بقيمها الأصلية مع رقم الصف وسبب الرفض).
+    """
+    salaries = pd.to_numeric(chunk['الراتب الصافي'], errors='coerce')
+    reasons = pd.Series(np.nan, index=chunk.index, dtype=object)
+    reasons[chunk['الاسم'].isna()] = "الاسم مفقود"
+    reasons[reasons.isna() & chunk['Iban'].isna()] = "IBAN مفقود"
+    reasons[reasons.isna() & salaries.isna()] = "الراتب الصافي مفقود أو غير رقمي"
+
+    # فلترة وحذف الصفوف ذات الراتب الصفر
+    zero_salary = reasons.isna() & (salaries == 0)
+    reasons[zero_salary] = "الراتب الصافي صفر"
+    zero_rows = int(zero_salary.sum())
+
+    pending = reasons.isna()
+    reasons[pending] = validate_ibans(chunk.loc[pending, 'Iban'])
+    ibans = normalize_ibans(chunk['Iban'])
+    bank_keys = ibans.str[4:8]
+    unsupported = reasons.isna() & ~bank_keys.isin(BANK_KEYS_FOR_FILTERING)
+    reasons[unsupported] = "مصرف غير مدعوم (" + bank_keys[unsupported] + ")"
+
+    rejected_mask = reasons.notna()
+    rejected = chunk[rejected_mask].assign(**{REJECT_REASON_COL: reasons[rejected_mask]})
+    rejected.insert(0, REJECT_ROW_COL, rejected.index)
+
+    accepted = ~rejected_mask
+    chunk = chunk[accepted].assign(**{
+        'الراتب الصافي': salaries[accepted],
+        'Iban': ibans[accepted],
+        'الاسم': chunk.loc[accepted, 'الاسم'].astype(str).str[:35],
+        # فئات ثابتة لكل الدفعات حتى يبقى العمود فئوياً بعد دمجها
+        'Bank Key': pd.Categorical(bank_keys[accepted], categories=BANK_KEYS_FOR_FILTERING),
+    })
+    return chunk, zero_rows, rejected.reset_index(drop=True)
+
+
+# ----------------------------------------------------------------------
+# --- مراحل خط المعالجة (قيم عادية + دالة تقدم اختيارية) ---
+# ----------------------------------------------------------------------
+
+def _report(progress, label):
+    if progress is not None:
+        progress(label)
+
+
+def read_payroll_rows(source, progress=None, reader=None, on_reader=None):
+    """قراءة ملف الإدخال على دفعات وتنظيفه والتحقق منه.
+
+    يُرجع (الصفوف المنظفة مع عمود Bank Key وفهرسها رقم الصف في الملف، عدد الصفوف المحذوفة
+    بسبب الراتب الصفري، الصفوف المرفوضة مع سبب الرفض). يرفع MissingColumnsError إذا نقصت
+    أعمدة الإدخال المطلوبة. reader و on_reader كما في iter_input_chunks.
+    """
+    _report(progress, "جاري قراءة ملف الإدخال...")
+    cleaned_chunks = []
+    rejected_chunks = []
+    rows_dropped = 0
+    rows_read = 0
+    for chunk in iter_input_chunks(source, reader=reader, on_reader=on_reader):
+        cleaned, zero_rows, rejected = clean_input_chunk(chunk)
+        cleaned_chunks.append(cleaned)
+        rejected_chunks.append(rejected)
+        rows_dropped += zero_rows
+        rows_read += len(chunk)
+        _report(progress, f"تمت قراءة {rows_read} صف...")
+
+    if cleaned_chunks:
+        df_filtered = pd.concat(cleaned_chunks)
+        rejects = pd.concat(rejected_chunks, ignore_index=True)
+    else:
+        df_filtered = pd.DataFrame(columns=INPUT_REQUIRED_COLS + ['Bank Key'])
+        rejects = pd.DataFrame(columns=[REJECT_ROW_COL] + INPUT_REQUIRED_COLS + [REJECT_REASON_COL])
+    return df_filtered, rows_dropped, rejects
+
+
+def _constant_column(value, length):
+    """عمود فئوي بقيمة واحدة (رموز int8) بدلاً من تكرار النص في كل صف."""
+    return pd.Categorical.from_codes(np.zeros(length, dtype=np.int8), categories=[value])
+
+
+def build_final_frame(df_filtered, today=None, receiver_bics=None):
+    """تجهيز الإطار المضغوط لأعمدة FINAL_EXCEL_COLS من الصفوف المنظفة.
+
+    الأعمدة الثابتة فئوية بقيمة واحدة، و Receiver BIC فئوي،
+    و Reference لا يُخزن لأنه مشتق (Value Date + IBAN). expand_final_frame يُعيد الأعمدة
+    الكاملة لكل شريحة عند الكتابة فقط. يمكن تمرير receiver_bics محسوبة مسبقاً بـ
+    resolve_receiver_bics لتجنب إعادة حسابها.
+    """
+    if today is None:
+        today = datetime.now()
+
+    date_str = today.strftime('%Y%m%d')
+    current_year = today.strftime('%Y')
+    month_number = today.month
+    current_month_arabic = ARABIC_MONTHS.get(month_number, "شهر غير محدد")
+    remittance_info = REMITTANCE_INFO_TEMPLATE.format(current_year, current_month_arabic)
+    constants = {
+        'Value Date': date_str,
+        'Payer Name': PAYER_NAME,
+        'Payer Acount': PAYER_ACCOUNT,
+        'Currency': CURRENCY,
+        'Remittance Information': remittance_info,
+        'Details of Charges': DETAILS_OF_CHARGES,
+    }
+
+    if receiver_bics is None:
+        receiver_bics = resolve_receiver_bics(df_filtered['Iban'])
+    length = len(df_filtered)
+    # الأعمدة المنسوخة من الإدخال تشارك بياناته (بدون نسخ) ضمن Copy-on-Write
+    columns = {col: _constant_column(value, length) for col, value in constants.items()}
+    columns.update({
+        'Amount': df_filtered['الراتب الصافي'],
+        'Receiver BIC': pd.Categorical(receiver_bics, categories=RECEIVER_BIC_CATEGORIES),
+        'Beneficiary Name': df_filtered['الاسم'],
+        'Beneficiary Acount': df_filtered['Iban'],
+    })
+    return pd.DataFrame(columns, index=df_filtered.index)[TXT_EXPORT_COLS]
+
+
+def expand_final_frame(frame):
+    """توسيع شريحة من الإطار المضغوط إلى أعمدة FINAL_EXCEL_COLS الكاملة (نصوص عادية).
+
+    تُستدعى لكل ملف قبل كتابته فقط، فلا يوجد الإطار الموسع لكامل التشغيل في الذاكرة.
+    """
+    expanded = {}
+    for col in TXT_EXPORT_COLS:
+        values = frame[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        expanded[col] = values
+    expanded['Reference'] = frame['Value Date'].astype(str) + ' ' + frame['Beneficiary Acount'].astype(str)
+    return pd.DataFrame(expanded, index=frame.index)[FINAL_EXCEL_COLS]
+
+
+def write_final_excel_bytes(frame, created=None, path=None):
+    """كتابة شريحة من الإطار المضغوط مباشرة إلى ملف xlsx بأعمدة FINAL_EXCEL_COLS (بدون pandas.to_excel).
+
+    Reference يُشتق عمودياً والأعمدة الفئوية تُكتب بقيمها، مع عرض الأعمدة وتنسيق المبلغ.
+    القيم المقروءة من الملف مطابقة لمسار expand_final_frame + write_excel_bytes. مع path
+    يُكتب الملف إلى هذا المسار ويُرجع حجمه.
+    """
+    columns = {'Reference': frame['Value Date'].astype(str) + ' ' + frame['Beneficiary Acount'].astype(str)}
+    columns.update({col: frame[col] for col in TXT_EXPORT_COLS})
+    return write_columns_xlsx({col: columns[col] for col in FINAL_EXCEL_COLS}, created,
+                              column_widths=XLSX_COLUMN_WIDTHS, number_formats=XLSX_NUMBER_FORMATS, path=path)
+
+
+def xlsx_writer_name(writer=None):
+    """محرك كتابة ملفات المصارف: المطلوب صراحة، أو من PAYROLL_XLSX_WRITER، أو 'pandas'."""
+    writer = writer or os.environ.get(XLSX_WRITER_ENV) or DEFAULT_XLSX_WRITER
+    if writer not in XLSX_WRITERS:
+        raise ValueError(f"محرك كتابة غير معروف: {writer}")
+    return writer
+
+
+def load_payroll_frame(source, today=None, progress=None):
+    """قراءة ملف الإدخال وتنظيفه وتجهيز الإطار المضغوط (انظر build_final_frame).
+
+    يُرجع (df_final، عدد الصفوف المحذوفة بسبب الراتب الصفري). يرفع
+    MissingColumnsError إذا نقصت أعمدة الإدخال المطلوبة.
+    """
+    df_filtered, rows_dropped, _ = read_payroll_rows(source, progress=progress)
+    return build_final_frame(df_filtered, today=today), rows_dropped
+
+
+def build_file_entries(split_plan, today):
+    """وصف ملفات الناتج (الاسم، المصرف، الفرع، الصفوف، المبلغ، الشريحة) من خطة التقسيم.
+
+    تُملأ 'content' (أو 'path' و 'size' عند الكتابة إلى القرص) لاحقاً بعد كتابة ملفات xlsx.
+    """
+    date_str = today.strftime('%Y%m%d')
+    processed_files_list = []
+    for entry in split_plan:
+        bic = entry['bic']
+        arabic_bank_name = ARABIC_BANK_NAME_MAP.get(bic[:4], 'مصرف_غير_معروف')
+        processed_files_list.append({
+            'filename': f"{arabic_bank_name}_الملف_{entry['file_index']}_{bic[-3:]}_{date_str}.xlsx",
+            'content': None,
+            'bic': bic,
+            'file_index': entry['file_index'],
+            'bank_name': arabic_bank_name,
+            'branch_code': bic[-3:],
+            'rows': entry['row_count'],
+            'amount': round(entry['amount'], 2),
+            'frame': entry['frame']  # تُستخدم للتحويل المباشر إلى TXT دون إعادة قراءة xlsx
+        })
+    return processed_files_list
+
+
+def source_label(source, position=1):
+    """اسم ملف الإدخال في التقارير: اسم الملف المرفوع أو اسم الملف من المسار."""
+    name = os.fspath(source) if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', None)
+    if isinstance(name, str) and name:
+        return os.path.basename(name)
+    return f"ملف_{position}"
+
+
+def _portable_source(source):
+    # المسار كما هو، وغير ذلك نسخة BytesIO من البايتات (قابلة للإرسال إلى عملية عمل)
+    if isinstance(source, (str, os.PathLike)):
+        return source
+    if hasattr(source, 'getvalue'):
+        return io.BytesIO(source.getvalue())
+    source.seek(0)
+    return io.BytesIO(source.read())
+
+
+def _read_source(source, reader=None, progress=None):
+    """قراءة ملف إدخال واحد مع اسم محرك القراءة المستخدم (على مستوى الوحدة لعمليات العمل)."""
+    readers = []
+    df_filtered, rows_dropped, rejects = read_payroll_rows(source, progress=progress, reader=reader,
+                                                           on_reader=readers.append)
+    return df_filtered, rows_dropped, rejects, (readers[0] if readers else None)
+
+
+def read_payroll_sources(sources, workers=1, progress=None, reader=None):
+    """قراءة عدة ملفات إدخال (بالتوازي عبر مجموعة عمليات عند workers > 1) ودمجها في إطار واحد.
+
+    IBAN الموجود في أكثر من ملف يُقبل من أول ملف يظهر فيه ويُرفض في الملفات التالية
+    (DUPLICATE_IBAN_REASON)، وتحمل الصفوف المرفوضة عمود SOURCE_FILE_COL عند وجود أكثر
+    من ملف. يُرجع (الصفوف المنظفة، عدد صفوف الراتب الصفري، الصفوف المرفوضة، قائمة
+    إحصائيات لكل ملف: source، reader، rows، amount، rejected، zero_rows، duplicates).
+    """
+    names = []
+    for position, source in enumerate(sources, start=1):
+        name = label = source_label(source, position)
+        copy = 2
+        while name in names:
+            name = f"{label} ({copy})"
+            copy += 1
+        names.append(name)
+
+    results = [None] * len(sources)
+    if workers <= 1 or len(sources) <= 1:
+        for index, source in enumerate(sources):
+            if len(sources) > 1:
+                _report(progress, f"جاري قراءة ملف الإدخال: {names[index]}...")
+            results[index] = _read_source(source, reader, progress)
+    else:
+        _report(progress, f"جاري قراءة {len(sources)} ملفات إدخال بالتوازي...")
+        # spawn بدلاً من fork: خادم Streamlit متعدد الخيوط ولا يُنسخ بأمان
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(sources)), mp_context=context) as pool:
+            futures = {pool.submit(_read_source, _portable_source(source), reader): index
+                       for index, source in enumerate(sources)}
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                _report(progress, f"تمت قراءة ملف: {names[index]} ({len(results[index][0])} صف).")
+
+    multiple = len(sources) > 1
+    frames = [df_filtered.assign(**{SOURCE_FILE_COL: name}) if multiple else df_filtered
+              for name, (df_filtered, _, _, _) in zip(names, results)]
+    merged = pd.concat(frames) if frames else pd.DataFrame(columns=INPUT_REQUIRED_COLS + ['Bank Key'])
+    reject_frames = [rejects.assign(**{SOURCE_FILE_COL: name}) if multiple else rejects
+                     for name, (_, _, rejects, _) in zip(names, results)]
+
+    duplicate_counts = {}
+    if multiple and len(merged):
+        # أول ملف يظهر فيه كل IBAN (الملفات بترتيب رفعها)
+        ibans = merged['Iban']
+        first = ~ibans.duplicated().to_numpy()
+        first_source = ibans.map(pd.Series(merged[SOURCE_FILE_COL].to_numpy()[first], index=ibans.to_numpy()[first]))
+        duplicate = merged[SOURCE_FILE_COL].to_numpy() != first_source.to_numpy()
+        if duplicate.any():
+            duplicates = merged[duplicate]
+            reject_frames.append(pd.DataFrame({
+                REJECT_ROW_COL: duplicates.index,
+                **{col: duplicates[col].to_numpy() for col in INPUT_REQUIRED_COLS},
+                REJECT_REASON_COL: (DUPLICATE_IBAN_REASON + " (" + first_source[duplicate] + ")").to_numpy(),
+                SOURCE_FILE_COL: duplicates[SOURCE_FILE_COL].to_numpy(),
+            }))
+            duplicate_counts = duplicates[SOURCE_FILE_COL].value_counts().to_dict()
+            merged = merged[~duplicate]
+
+    rejects = pd.concat(reject_frames, ignore_index=True)
+    if multiple:
+        rejects.insert(1, SOURCE_FILE_COL, rejects.pop(SOURCE_FILE_COL))
+        accepted = merged.groupby(SOURCE_FILE_COL, sort=False)['الراتب الصافي'].agg(['size', 'sum'])
+        merged = merged.drop(columns=SOURCE_FILE_COL)
+    else:
+        accepted = pd.DataFrame({'size': [len(merged)], 'sum': [merged['الراتب الصافي'].sum()]}, index=names)
+    source_stats = [{
+        'source': name, 'reader': used_reader,
+        'rows': int(accepted['size'].get(name, 0)), 'amount': float(accepted['sum'].get(name, 0.0)),
+        'rejected': len(file_rejects) + duplicate_counts.get(name, 0), 'zero_rows': rows_dropped,
+        'duplicates': duplicate_counts.get(name, 0),
+    } for name, (_, rows_dropped, file_rejects, used_reader) in zip(names, results)]
+    rows_dropped = sum(stats['zero_rows'] for stats in source_stats)
+    return merged.reset_index(drop=True), rows_dropped, rejects, source_stats
+
+
+def _group_label(file_data):
+    """اسم مجموعة BIC (المصرف_الفرع) في تقرير التشغيل."""
+    return f"{file_data['bank_name']}_{file_data['branch_code']}"
+
+
+def split_payroll(source, split_mode='greedy', export_workers=1, today=None, progress=None, recorder=None,
+                  reader=None, read_workers=1, reuse=None, xlsx_writer=None, output_dir=None):
+    """معالجة ملف الإدخال (أو قائمة ملفات تُدمج قبل التقسيم) وتقسيمه إلى ملفات Excel حسب المصرف/الفرع.
+
+    يُرجع قاموساً: files (قائمة الملفات المعالجة بنفس بنية st.session_state.processed_files)
+    و zero_rows_dropped (عدد صفوف الراتب الصفري المحذوفة) و rejects (الصفوف المرفوضة
+    مع رقم الصف وسبب الرفض، بما فيها الراتب الصفري) و sources (إحصائيات كل ملف إدخال،
+    انظر read_payroll_sources) و summary (مجاميع المصارف والفروع مع المطابقة، انظر summarize_split). recorder (RunRecorder اختياري) يسجل زمن وذاكرة مراحل
+    read و prepare و split و xlsx، ومحرك القراءة المستخدم. reader يفرض محرك قراءة
+    (انظر input_readers.INPUT_READERS) بدلاً من الاختيار التلقائي، و read_workers عدد
+    العمليات لقراءة عدة ملفات بالتوازي.
+
+    كل ملف يحمل chunk_hash (بصمة صفوفه، انظر run_manifest). reuse(chunk_hash) اختيارية
+    تُرجع بايتات xlsx من تشغيل سابق لنفس الصفوف (أو None) فلا يُكتب إلا ما تغير، و reused
+    في كل ملف تبين إن كانت بايتاته مأخوذة من التشغيل السابق. xlsx_writer يفرض محرك كتابة
+    ملفات المصارف (انظر xlsx_writer_name). output_dir (اختياري) يكتب ملفات xlsx مباشرة في
+    هذا المجلد فيحمل كل ملف 'path' و 'size' بدلاً من 'content' (بدون نسخة في الذاكرة).
+    """
+    if today is None:
+        today = datetime.now()
+    xlsx_writer = xlsx_writer_name(xlsx_writer)
+
+    sources = list(source) if isinstance(source, (list, tuple)) else [source]
+    with measure(recorder, 'read') as record:
+        df_filtered, rows_dropped, rejects, source_stats = read_payroll_sources(
+            sources, workers=read_workers, progress=progress, reader=reader
+        )
+        record['rows'] = len(df_filtered)
+        record['reader'] = ','.join(sorted({stats['reader'] for stats in source_stats if stats['reader']})) or None
+    with measure(recorder, 'prepare', len(df_filtered)):
+        df_final = build_final_frame(df_filtered, today=today)
+    with measure(recorder, 'split', len(df_final)):
+        split_plan = build_split_plan(df_final, split_mode=split_mode)
+
+    # --- تجهيز بيانات ملفات كل بنك وفرع وفق خطة التقسيم، وتجميع الملخص والمطابقة معها ---
+    processed_files_list = build_file_entries(split_plan, today)
+    summary = summarize_split(processed_files_list, input_rows=sum(stats['rows'] for stats in source_stats),
+                              input_amount=sum(stats['amount'] for stats in source_stats))
+
+    # --- تصدير الملفات (في الذاكرة)، تسلسلياً أو بالتوازي ---
+    # زمن كل ملف = الفاصل منذ اكتمال الملف السابق (دقيق في الوضع التسلسلي، وتقريبي بالتوازي)
+    last_done = [time.perf_counter()]
+
+    def report_written(index, _content):
+        file_data = processed_files_list[index]
+        _report(progress, f"تم إنشاء ملف: {file_data['filename']}. عدد الصفوف: {file_data['rows']}.")
+        if recorder is not None:
+            now = time.perf_counter()
+            recorder.add_group('xlsx', _group_label(file_data), file_data['rows'], now - last_done[0])
+            last_done[0] = now
+
+    with measure(recorder, 'xlsx', len(df_final)) as record:
+        record['writer'] = xlsx_writer
+        # الشرائح التي لم تتغير صفوفها منذ التشغيل السابق (بنفس محرك الكتابة) لا تُكتب من جديد
+        for file_data, entry in zip(processed_files_list, split_plan):
+            file_data['chunk_hash'] = chunk_hash(entry['frame'], salt=xlsx_writer)
+            file_data['content'] = reuse(file_data['chunk_hash']) if reuse is not None else None
+            file_data['reused'] = file_data['content'] is not None
+        pending = [index for index, file_data in enumerate(processed_files_list) if not file_data['reused']]
+        paths = None
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            paths = [os.path.join(output_dir, file_data['filename']) for file_data in processed_files_list]
+            for path, file_data in zip(paths, processed_files_list):
+                if file_data['reused']:
+                    _place_output(file_data, file_data.pop('content'), path)
+        record['reused'] = len(processed_files_list) - len(pending)
+        if record['reused']:
+            _report(progress, f"لم تتغير صفوف {record['reused']} ملف؛ يُعاد استخدامها من التشغيل السابق.")
+
+        _report(progress, f"جاري كتابة {len(pending)} ملف Excel...")
+        last_done[0] = time.perf_counter()
+        contents = export_excel_files(
+            [split_plan[index]['frame'] for index in pending],
+            workers=export_workers,
+            created=today,
+            on_done=lambda position, content: report_written(pending[position], content),
+            paths=None if paths is None else [paths[index] for index in pending],
+            **({'writer': write_final_excel_bytes} if xlsx_writer == 'streaming' else {'prepare': expand_final_frame})
+        )
+    for index, content in zip(pending, contents):
+        if paths is None:
+            processed_files_list[index]['content'] = content
+        else:
+            file_data = processed_files_list[index]
+            del file_data['content']
+            file_data['path'], file_data['size'] = paths[index], content
+
+    return {'files': processed_files_list, 'zero_rows_dropped': rows_dropped, 'rejects': rejects,
+            'sources': source_stats, 'summary': summary}
+
+
+def _place_output(file_data, content, path):
+    """وضع ملف ناتج في path: بايتات تُكتب، أو مسار ملف سابق يُربط (بدون نسخة)."""
+    if isinstance(content, (str, os.PathLike)):
+        link_or_copy(content, path)
+        file_data['size'] = os.path.getsize(path)
+    else:
+        write_file(path, content)
+        file_data['size'] = len(content)
+    file_data['path'] = path
+
+
+def summarize_split(processed_files_list, input_rows=None, input_amount=None):
+    """تجميع الملخص من ملفات التقسيم: مجاميع كل فرع (BIC) وكل مصرف بـ groupby، مع المطابقة.
+
+    input_rows و input_amount مجموع الصفوف المقبولة من ملفات الإدخال؛ المطابقة تتحقق من أن
+    مجموع صفوف ومبالغ ملفات المصارف يساويها (بسماح تقريب مبلغ كل ملف إلى منزلتين).
+    يُرجع {'files'، 'branches'، 'banks' (DataFrames)، 'reconciliation' (قاموس)}.
+    """
+    files = pd.DataFrame([{
+        'bank_key': f['bic'][:4] if f.get('bic') else next(
+            (key for key, name in ARABIC_BANK_NAME_MAP.items() if name == f['bank_name']), 'Unknown'),
+        'bank_name': f['bank_name'], 'branch_code': f['branch_code'], 'filename': f['filename'],
+        'rows': f['rows'], 'amount': f['amount'],
+    } for f in processed_files_list], columns=['bank_key', 'bank_name', 'branch_code', 'filename', 'rows', 'amount'])
+
+    branches = files.groupby(['bank_key', 'branch_code'], sort=True).agg(
+        bank_name=('bank_name', 'first'), files=('filename', 'size'), rows=('rows', 'sum'), amount=('amount', 'sum')
+    ).reset_index()
+    banks = files.groupby('bank_key', sort=True).agg(
+        bank_name=('bank_name', 'first'), branches=('branch_code', 'nunique'), files=('filename', 'size'),
+        rows=('rows', 'sum'), amount=('amount', 'sum')
+    ).reset_index()
+
+    file_rows = int(files['rows'].sum())
+    file_amount = float(files['amount'].sum())
+    reconciliation = {'input_rows': input_rows, 'input_amount': input_amount,
+                      'file_rows': file_rows, 'file_amount': round(file_amount, 2), 'ok': None}
+    if input_rows is not None:
+        tolerance = SUMMARY_ROUNDING_TOLERANCE * max(len(files), 1)
+        reconciliation['ok'] = bool(input_rows == file_rows and abs(input_amount - file_amount) <= tolerance)
+    return {'files': files, 'branches': branches, 'banks': banks, 'reconciliation': reconciliation}
+
+
+def build_summary(processed_files_list, now=None, recorder=None, sources=None, summary=None):
+    """إنشاء ملف الملخص الإحصائي من ملفات التقسيم (نظرة عامة، الملخص الهيكلي، ورقة لكل مصرف).
+
+    summary نتيجة summarize_split المحسوبة أثناء التقسيم (split_payroll تُرجعها مع المطابقة)؛
+    بدونها يُجمع الملخص من قائمة الملفات مباشرة دون مطابقة مع الإدخال. sources (إحصائيات
+    ملفات الإدخال من split_payroll) تضيف ورقة لكل ملف مصدر عند معالجة أكثر من ملف معاً.
+    يُرجع {'filename': ..., 'content': بايتات xlsx}.
+    """
+    with measure(recorder, 'summary', sum(f['rows'] for f in processed_files_list)):
+        if summary is None:
+            summary = summarize_split(processed_files_list)
+        return _build_summary(summary, now, sources)
+
+
+def _source_summary_frame(sources):
+    """ملخص ملفات الإدخال: المقبول والمبلغ والمرفوض (ومنه IBAN المكرر) لكل ملف مع المجموع."""
+    rows = [{
+        SOURCE_FILE_COL: stats['source'],
+        'عدد المنتسبين (الصفوف)': stats['rows'],
+        'المبلغ الإجمالي (د.ع)': round(stats['amount'], 2),
+        'الصفوف المرفوضة': stats['rejected'],
+        'منها IBAN مكرر': stats['duplicates'],
+    } for stats in sources]
+    rows.append({
+        SOURCE_FILE_COL: "**المجموع الكلي**",
+        'عدد المنتسبين (الصفوف)': sum(stats['rows'] for stats in sources),
+        'المبلغ الإجمالي (د.ع)': round(sum(stats['amount'] for stats in sources), 2),
+        'الصفوف المرفوضة': sum(stats['rejected'] for stats in sources),
+        'منها IBAN مكرر': sum(stats['duplicates'] for stats in sources),
+    })
+    return pd.DataFrame(rows)
+
+
+FIELD_FILE = 'اسم الملف / المصرف'
+FIELD_BRANCH = 'رمز الفرع / المفتاح'
+FIELD_COUNT = 'عدد المنتسبين (الصفوف)'
+FIELD_AMOUNT = 'المبلغ الإجمالي (د.ع)'
+
+
+def _structured_summary_frame(summary):
+    """الورقة الهيكلية الكاملة: ملفات كل مصرف ثم مجموعه ثم سطر فارغ، وفي النهاية المجموع الكلي."""
+    rows = []
+    files = summary['files']
+    for bank in summary['banks'].itertuples(index=False):
+        for file_data in files[files['bank_key'] == bank.bank_key].itertuples(index=False):
+            rows.append({FIELD_FILE: file_data.filename, FIELD_BRANCH: file_data.branch_code,
+                         FIELD_COUNT: file_data.rows, FIELD_AMOUNT: file_data.amount})
+        rows.append({FIELD_FILE: f"**المجموع الكلي لـ {bank.bank_name}**", FIELD_BRANCH: bank.bank_key,
+                     FIELD_COUNT: bank.rows, FIELD_AMOUNT: round(bank.amount, 2)})
+        rows.append({FIELD_FILE: '', FIELD_BRANCH: '', FIELD_COUNT: '', FIELD_AMOUNT: ''})
+    rows.append({FIELD_FILE: "**المجموع الكلي النهائي لكافة المصارف**", FIELD_BRANCH: "GRAND TOTAL",
+                 FIELD_COUNT: int(summary['banks']['rows'].sum()), FIELD_AMOUNT: round(summary['banks']['amount'].sum(), 2)})
+    return pd.DataFrame(rows, columns=[FIELD_FILE, FIELD_BRANCH, FIELD_COUNT, FIELD_AMOUNT])
+
+
+def _overview_frames(summary):
+    """ورقة النظرة العامة: مجموع كل مصرف مع المجموع الكلي، وجدول المطابقة مع الإدخال."""
+    banks = summary['banks']
+    overview = pd.DataFrame({
+        'المفتاح': banks['bank_key'], 'المصرف': banks['bank_name'], 'عدد الفروع': banks['branches'],
+        'عدد الملفات': banks['files'], FIELD_COUNT: banks['rows'], FIELD_AMOUNT: banks['amount'].round(2),
+    })
+    overview.loc[len(overview)] = ['GRAND TOTAL', "**المجموع الكلي**", int(banks['branches'].sum()),
+                                   int(banks['files'].sum()), int(banks['rows'].sum()), round(banks['amount'].sum(), 2)]
+
+    check = summary['reconciliation']
+    if check['ok'] is None:
+        status = "غير متاحة (لا توجد مجاميع الإدخال)"
+    else:
+        status = "مطابق ✔" if check['ok'] else "غير مطابق ✘"
+    reconciliation = pd.DataFrame([
+        {'المطابقة': "مجموع الإدخال المقبول", FIELD_COUNT: check['input_rows'],
+         FIELD_AMOUNT: None if check['input_amount'] is None else round(check['input_amount'], 2)},
+        {'المطابقة': "مجموع ملفات المصارف", FIELD_COUNT: check['file_rows'], FIELD_AMOUNT: check['file_amount']},
+        {'المطابقة': "الفرق",
+         FIELD_COUNT: None if check['input_rows'] is None else check['input_rows'] - check['file_rows'],
+         FIELD_AMOUNT: None if check['input_amount'] is None else round(check['input_amount'] - check['file_amount'], 2)},
+        {'المطابقة': "النتيجة", FIELD_COUNT: status, FIELD_AMOUNT: None},
+    ])
+    return overview, reconciliation
+
+
+def _bank_detail_frames(summary, bank_key):
+    """ورقة مصرف واحد: مجموع كل فرع (مع مجموع المصرف) ثم قائمة ملفاته."""
+    branches = summary['branches'][summary['branches']['bank_key'] == bank_key].reset_index(drop=True)
+    detail = pd.DataFrame({
+        'رمز الفرع': branches['branch_code'], 'عدد الملفات': branches['files'],
+        FIELD_COUNT: branches['rows'], FIELD_AMOUNT: branches['amount'].round(2),
+    })
+    detail.loc[len(detail)] = ["**المجموع**", int(branches['files'].sum()), int(branches['rows'].sum()),
+                               round(branches['amount'].sum(), 2)]
+    files = summary['files'][summary['files']['bank_key'] == bank_key]
+    file_list = pd.DataFrame({
+        'اسم الملف': files['filename'], 'رمز الفرع': files['branch_code'],
+        FIELD_COUNT: files['rows'], FIELD_AMOUNT: files['amount'],
+    })
+    return detail, file_list
+
+
+def _build_summary(summary, now, sources=None):
+    overview, reconciliation = _overview_frames(summary)
+
+    # حفظ الملخص في الذاكرة
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        overview.to_excel(writer, index=False, sheet_name='نظرة_عامة')
+        reconciliation.to_excel(writer, index=False, sheet_name='نظرة_عامة', startrow=len(overview) + 2)
+        _structured_summary_frame(summary).to_excel(writer, index=False, sheet_name='ملخص_هيكلي_كامل')
+        for bank in summary['banks'].itertuples(index=False):
+            detail, file_list = _bank_detail_frames(summary, bank.bank_key)
+            sheet_name = f"{bank.bank_name}_{bank.bank_key}"[:31]
+            detail.to_excel(writer, index=False, sheet_name=sheet_name)
+            file_list.to_excel(writer, index=False, sheet_name=sheet_name, startrow=len(detail) + 2)
+        if sources and len(sources) > 1:
+            _source_summary_frame(sources).to_excel(writer, index=False, sheet_name='حسب_الملف_المصدر')
+
+    date_str = (now or datetime.now()).strftime('%Y%m%d_%H%M%S')
+    return {'filename': f"Summary_Report_{date_str}.xlsx", 'content': output.getvalue()}
+
+
+def build_rejects_workbook(rejects, now=None):
+    """ملف Excel بالصفوف المرفوضة (رقم الصف، القيم الأصلية، سبب الرفض).
+
+    يُرجع {'filename': ..., 'content': بايتات xlsx}.
+    """
+    date_str = (now or datetime.now()).strftime('%Y%m%d_%H%M%S')
+    return {'filename': f"Rejected_Rows_{date_str}.xlsx", 'content': write_excel_bytes(rejects, sheet_name='الصفوف_المرفوضة')}
+
+
+def convert_files_to_txt(processed_files_list, progress=None, recorder=None, reuse=None, output_dir=None):
+    """تحويل الملفات المعالجة إلى TXT/CSV (في الذاكرة).
+
+    يُرجع قائمة {'filename', 'content', 'chunk_hash'} فيها ملف .txt وملف .csv لكل ملف Excel.
+    reuse(chunk_hash) اختيارية تُرجع محتوى TXT من تشغيل سابق لنفس الصفوف (أو None، أو
+    مسار ملف TXT سابق عند الكتابة إلى القرص). output_dir (اختياري) يكتب كل ملف TXT مباشرة
+    في هذا المجلد وملف CSV رابطاً صلباً إليه (نسخة واحدة على القرص)، فيحمل كل ملف 'path'
+    و 'size' بدلاً من 'content'. ملفات xlsx بدون شريحة بيانات تُقرأ من 'path' إن لم تحمل 'content'.
+    """
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    encrypted_files_list = []
+    with measure(recorder, 'txt', 0) as record:
+        record['reused'] = 0
+        for file_data in processed_files_list:
+            filename = file_data['filename']
+            base_name = os.path.splitext(filename)[0]
+            hash_value = file_data.get('chunk_hash')
+
+            _report(progress, f"معالجة الملف: **{filename}**...")
+
+            start = time.perf_counter()
+            final_content = reuse(hash_value) if reuse is not None and hash_value else None
+            if final_content is not None:
+                record['reused'] += 1
+            elif file_data.get('frame') is not None:
+                # ترميز مباشر من شريحة البيانات في الذاكرة (بدون تحليل xlsx)
+                final_content = encode_bank_txt(file_data['frame'])
+            else:
+                final_content = convert_excel_bytes_to_txt(read_output(file_data))
+            record['rows'] += file_data.get('rows', 0)
+            if recorder is not None:
+                recorder.add_group('txt', _group_label(file_data), file_data.get('rows', 0),
+                                   time.perf_counter() - start)
+
+            txt_file = {'filename': base_name + ".txt", 'chunk_hash': hash_value}
+            csv_file = {'filename': base_name + ".csv", 'chunk_hash': hash_value}
+            if output_dir is None:
+                # حفظ الملفات الناتجة (TXT و CSV) في قائمة الذاكرة
+                txt_file['content'] = csv_file['content'] = final_content
+            else:
+                _place_output(txt_file, final_content, os.path.join(output_dir, txt_file['filename']))
+                # ملف CSV هو نسخة طبق الأصل من ملف TXT: رابط صلب لنفس الملف
+                _place_output(csv_file, txt_file['path'], os.path.join(output_dir, csv_file['filename']))
+            encrypted_files_list.append(txt_file)
+            encrypted_files_list.append(csv_file)
+    return encrypted_files_list
+
+
+def _write_zip_entries(target, files_list, compresslevel):
+    with zipfile.ZipFile(target, 'w') as zip_file:
+        for file_data in files_list:
+            filename = file_data['filename']
+            if compresslevel is None or filename.lower().endswith(PRECOMPRESSED_EXTENSIONS):
+                options = {'compress_type': zipfile.ZIP_STORED}
+            else:
+                options = {'compress_type': zipfile.ZIP_DEFLATED, 'compresslevel': compresslevel}
+            if file_data.get('content') is None and file_data.get('path'):
+                # الملف على القرص يُنسخ إلى الأرشيف على أجزاء دون تحميله كاملاً
+                zip_file.write(file_data['path'], filename, **options)
+            else:
+                zip_file.writestr(filename, file_data['content'], **options)
+
+
+def build_zip_archive(files_list, compresslevel=None, spool_max_bytes=ZIP_SPOOL_MAX_BYTES):
+    """ضغط قائمة ملفات {'filename', 'content' أو 'path'} في أرشيف zip مكتوب تدفقياً إلى ملف مؤقت.
+
+    يبقى الأرشيف في الذاكرة حتى spool_max_bytes ثم يُنقل تلقائياً إلى القرص. compresslevel=None
+    يخزن المدخلات دون ضغط (السلوك السابق)، و 0-9 يضغط المدخلات النصية بـ DEFLATE مع إبقاء
+    الملفات المضغوطة أصلاً (xlsx/zip) مخزنة كما هي. يُرجع الملف المؤقت وموضعه في البداية.
+    """
+    archive = tempfile.SpooledTemporaryFile(max_size=spool_max_bytes)
+    _write_zip_entries(archive, files_list, compresslevel)
+    archive.seek(0)
+    return archive
+
+
+def write_zip_archive(path, files_list, compresslevel=None):
+    """كتابة أرشيف zip (انظر build_zip_archive) مباشرة إلى path وإرجاع المسار.
+
+    يُكتب إلى ملف مؤقت بجانبه ثم يُعاد تسميته، فلا يُقرأ أرشيف ناقص.
+    """
+    _write_zip_entries(path + '.tmp', files_list, compresslevel)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def create_zip_file(files_list, compresslevel=None):
+    """ضغط قائمة ملفات {'filename', 'content'} في أرشيف zip (بايتات)."""
+    with build_zip_archive(files_list, compresslevel) as archive:
+        return archive.read()
@@ -0,0 +1,206 @@
+"""ذاكرة تخزين مؤقت للنتائج مُعنونة بالمحتوى (content-addressed) لمراحل خط المعالجة.
+
+المفتاح هو بصمة SHA-256 لبايتات ملف الإدخال مع معاملات المعالجة (التاريخ، الحدود،
+جداول BIC...) فإعادة رفع الملف نفسه أو إعادة تشغيل السكربت لا تعيد الحساب.
+الطبقة الأولى في الذاكرة بسياسة LRU محدودة بالحجم وعدد المدخلات، والطبقة الثانية
+(اختيارية) على القرص وتبقى بعد إعادة تشغيل التطبيق.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import payroll_core
+from run_workspace import file_digest
+
+CACHE_FORMAT_VERSION = 7
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+RESULT_CACHE_MAX_ENTRIES = 32
+RESULT_CACHE_DISK_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# تفعيل الطبقة على القرص بتحديد مجلد في متغير البيئة هذا
+RESULT_CACHE_DIR_ENV = 'PAYROLL_CACHE_DIR'
+
+
+def processing_parameters(today, split_mode='greedy', source_names=None):
+    """المعاملات التي تؤثر على ناتج المعالجة (غير بايتات الإدخال).
+
+    source_names (أسماء ملفات الإدخال عند معالجة عدة ملفات معاً) تظهر في تقارير المرفوض
+    والملخص فتدخل في المفتاح.
+    """
+    parameters = {
+        'version': CACHE_FORMAT_VERSION,
+        'date': today.strftime('%Y%m%d'),
+        'split_mode': split_mode,
+        'xlsx_writer': payroll_core.xlsx_writer_name(),
+        'max_rows': payroll_core.MAX_ROWS_PER_FILE,
+        'max_amount': payroll_core.MAX_AMOUNT_PER_FILE,
+        'bank_bics': payroll_core.BANK_BICS,
+        'all_branches_bic': sorted(payroll_core.ALL_BRANCHES_BIC),
+        'dynamic_banks': sorted(payroll_core.BANKS_WITH_DYNAMIC_BRANCHES),
+        'bank_names': payroll_core.ARABIC_BANK_NAME_MAP,
+        'payer': [payroll_core.PAYER_NAME, payroll_core.PAYER_ACCOUNT, payroll_core.CURRENCY,
+                  payroll_core.DETAILS_OF_CHARGES, payroll_core.REMITTANCE_INFO_TEMPLATE],
+    }
+    if source_names is not None:
+        parameters['sources'] = list(source_names)
+    return parameters
+
+
+def _input_digest(data, digest=None):
+    # مسار ملف على القرص يُقرأ عبر mmap؛ نفس البصمة كما لو مُررت بايتاته
+    if isinstance(data, (str, os.PathLike)):
+        return file_digest(data, digest)
+    digest = digest or hashlib.sha256()
+    digest.update(data)
+    return digest
+
+
+def make_cache_key(input_bytes, parameters):
+    """بصمة SHA-256 لبايتات الإدخال مع المعاملات (بترتيب ثابت للمفاتيح).
+
+    input_bytes قائمة بايتات عند معالجة عدة ملفات معاً (تُجمع بصمة كل ملف بالترتيب).
+    يمكن تمرير مسار ملف بدلاً من البايتات (ملف مرفوع محفوظ على القرص) بنفس المفتاح الناتج.
+    """
+    if isinstance(input_bytes, (list, tuple)):
+        digest = hashlib.sha256(b''.join(_input_digest(part).digest() for part in input_bytes))
+    else:
+        digest = _input_digest(input_bytes)
+    digest.update(json.dumps(parameters, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def stage_key(result_key, stage):
+    """مفتاح مرحلة لاحقة (الملخص، TXT...) مشتق من مفتاح نتيجة التقسيم."""
+    return f"{result_key}.{stage}"
+
+
+def estimate_size(value):
+    """تقدير تقريبي لحجم القيمة في الذاكرة (بايت) لأغراض سياسة الإخلاء."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=False).sum())
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """ذاكرة LRU محدودة بالحجم مع طبقة اختيارية على القرص. آمنة للاستخدام من عدة جلسات."""
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES, max_entries=RESULT_CACHE_MAX_ENTRIES,
+                 disk_dir=None, disk_max_bytes=RESULT_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        """إرجاع القيمة المخزنة أو None (مع تحديث عدادات الإصابة/الإخفاق)."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key][0]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['disk_hits'] += 1
+            self._store(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+        self._write_disk(key, value)
+        return value
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), memory_bytes=self._total_bytes)
+
+    def _store(self, key, value):
+        size = estimate_size(value)
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self._total_bytes += size
+        while self._entries and (self._total_bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_size
+            self.stats['evictions'] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as handle:
+                value = pickle.load(handle)
+            os.utime(path)  # تحديث وقت آخر استخدام لسياسة الإخلاء على القرص
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        return value
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        # الكتابة إلى ملف مؤقت ثم إعادة التسمية حتى لا تُقرأ ملفات ناقصة
+        handle, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as temp_file:
+            pickle.dump(value, temp_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self._disk_path(key))
+        self._evict_disk()
+
+    def _evict_disk(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith('.pkl'):
+                path = os.path.join(self.disk_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def cache_from_environment():
+    """إنشاء ذاكرة النتائج، مع تفعيل طبقة القرص إذا حُدد PAYROLL_CACHE_DIR."""
+    return ResultCache(disk_dir=os.environ.get(RESULT_CACHE_DIR_ENV) or None)
@@ -0,0 +1,228 @@
+"""سجل دائم لصفوف كل تشغيل (SQLite) ومقارنة شهر بشهر سابق.
+
+تُحفظ صفوف كل تشغيل بعد التنظيف والتحقق في جدول مفتاحه (run_id, iban) بدون rowid،
+فتعمل المقارنة بين تشغيلين عبر ربط مفهرس على IBAN بدلاً من مسح الجداول كاملة.
+المقارنة تُرجع المستفيدين الجدد والمحذوفين ومن تغير راتبه بما يتجاوز الحدود المحددة،
+مع ملخص لكل مصرف من ARABIC_BANK_NAME_MAP. هذه الوحدة لا تستورد Streamlit.
+"""
+import io
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from payroll_core import ARABIC_BANK_NAME_MAP
+
+RUN_HISTORY_DB_ENV = 'PAYROLL_HISTORY_DB'
+RUN_HISTORY_DEFAULT_DB = 'payroll_history.sqlite3'
+# الحدود الافتراضية لاعتبار تغير الراتب "كبيراً": كلا الشرطين مطلوب
+DIFF_MIN_CHANGE_AMOUNT = 0
+DIFF_MIN_CHANGE_PERCENT = 10.0
+HISTORY_ROW_COLS = ['iban', 'name', 'amount', 'bank_key', 'receiver_bic']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    run_date TEXT NOT NULL,
+    label TEXT,
+    input_key TEXT UNIQUE,
+    row_count INTEGER NOT NULL,
+    total_amount REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS payroll_rows (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    iban TEXT NOT NULL,
+    name TEXT,
+    amount REAL NOT NULL,
+    entries INTEGER NOT NULL,
+    bank_key TEXT NOT NULL,
+    receiver_bic TEXT,
+    PRIMARY KEY (run_id, iban)
+) WITHOUT ROWID;
+"""
+
+# الصفوف الموجودة في التشغيل a وغير الموجودة في b (بحث بالمفتاح (run_id, iban) لكل صف)
+_ONLY_IN_QUERY = """
+SELECT a.iban, a.name, a.amount, a.bank_key, a.receiver_bic
+FROM payroll_rows AS a
+WHERE a.run_id = ?
+  AND NOT EXISTS (SELECT 1 FROM payroll_rows AS b WHERE b.run_id = ? AND b.iban = a.iban)
+"""
+_CHANGED_QUERY = """
+SELECT c.iban, c.name, p.amount AS previous_amount, c.amount AS current_amount, c.bank_key, c.receiver_bic
+FROM payroll_rows AS c
+JOIN payroll_rows AS p ON p.run_id = ? AND p.iban = c.iban
+WHERE c.run_id = ?
+  AND c.amount != p.amount
+  AND abs(c.amount - p.amount) >= ?
+  AND (p.amount = 0 OR abs(c.amount - p.amount) * 100.0 / abs(p.amount) >= ?)
+"""
+
+
+def history_rows_from_files(processed_files_list):
+    """صفوف التشغيل المطبعة (IBAN، الاسم، المبلغ، المصرف، BIC) من شرائح الملفات المقسمة."""
+    frames = [f['frame'] for f in processed_files_list if f.get('frame') is not None]
+    if not frames:
+        return pd.DataFrame(columns=HISTORY_ROW_COLS)
+    df = pd.concat(frames, ignore_index=True)
+    ibans = df['Beneficiary Acount'].astype(str)
+    return pd.DataFrame({
+        'iban': ibans,
+        'name': df['Beneficiary Name'].astype(str),
+        'amount': df['Amount'].astype(float),
+        'bank_key': ibans.str[4:8],
+        'receiver_bic': df['Receiver BIC'].astype(str),
+    })
+
+
+def _aggregate_by_iban(rows):
+    """صف واحد لكل IBAN مرتب حسب IBAN (يُلحق بنهاية الفهرس بدلاً من إدراج عشوائي في صفحاته).
+
+    التجميع (groupby) لا يُنفذ إلا عند وجود IBAN مكرر فعلاً لأنه أبطأ بكثير من الفرز.
+    """
+    if not rows['iban'].duplicated().any():
+        return rows.assign(entries=1).sort_values('iban', ignore_index=True)
+    return rows.groupby('iban', sort=True).agg(
+        name=('name', 'first'), amount=('amount', 'sum'), entries=('amount', 'size'),
+        bank_key=('bank_key', 'first'), receiver_bic=('receiver_bic', 'first'),
+    ).reset_index()
+
+
+def _bank_name(bank_key):
+    return ARABIC_BANK_NAME_MAP.get(bank_key, bank_key)
+
+
+class RunHistory:
+    """سجل التشغيلات في ملف SQLite. كل عملية تفتح اتصالها الخاص (آمن من عدة خيوط/جلسات)."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(_SCHEMA)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute('PRAGMA foreign_keys=ON')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def save_run(self, rows, run_date, label=None, input_key=None):
+        """حفظ صفوف تشغيل وإرجاع run_id. نفس input_key (نفس الملف والمعاملات) يُرجع التشغيل المحفوظ.
+
+        IBAN المكرر داخل التشغيل نفسه يُجمع في صف واحد (مجموع المبالغ وعدد التكرارات).
+        """
+        with closing(self._connect()) as connection, connection:
+            if input_key is not None:
+                existing = connection.execute('SELECT run_id FROM runs WHERE input_key = ?', (input_key,)).fetchone()
+                if existing:
+                    return existing[0]
+
+            grouped = _aggregate_by_iban(rows)
+            cursor = connection.execute(
+                'INSERT INTO runs (created_at, run_date, label, input_key, row_count, total_amount) VALUES (?, ?, ?, ?, ?, ?)',
+                (datetime.now().isoformat(timespec='seconds'), run_date.strftime('%Y-%m-%d'), label, input_key,
+                 len(rows), float(rows['amount'].sum())),
+            )
+            run_id = cursor.lastrowid
+            columns = [grouped[col].tolist() for col in ['iban', 'name', 'amount', 'entries', 'bank_key', 'receiver_bic']]
+            connection.executemany(
+                'INSERT INTO payroll_rows (run_id, iban, name, amount, entries, bank_key, receiver_bic) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                zip([run_id] * len(grouped), *columns),
+            )
+            return run_id
+
+    def list_runs(self):
+        """التشغيلات المحفوظة من الأحدث إلى الأقدم."""
+        with closing(self._connect()) as connection:
+            connection.row_factory = sqlite3.Row
+            rows = connection.execute('SELECT * FROM runs ORDER BY run_date DESC, run_id DESC').fetchall()
+        return [dict(row) for row in rows]
+
+    def previous_run_id(self, run_id):
+        """أحدث تشغيل سابق للتشغيل run_id (حسب تاريخ الرواتب)، أو None."""
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                'SELECT r.run_id FROM runs AS r, runs AS c WHERE c.run_id = ? AND r.run_id != c.run_id '
+                'AND (r.run_date < c.run_date OR (r.run_date = c.run_date AND r.run_id < c.run_id)) '
+                'ORDER BY r.run_date DESC, r.run_id DESC LIMIT 1',
+                (run_id,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def delete_run(self, run_id):
+        with closing(self._connect()) as connection, connection:
+            connection.execute('DELETE FROM runs WHERE run_id = ?', (run_id,))
+
+    def diff(self, previous_run_id, current_run_id, min_change_amount=DIFF_MIN_CHANGE_AMOUNT,
+             min_change_percent=DIFF_MIN_CHANGE_PERCENT):
+        """مقارنة تشغيلين: {'added', 'removed', 'changed', 'by_bank'} كـ DataFrames.
+
+        التغير يُعد كبيراً إذا بلغ فرق المبلغ min_change_amount ونسبته min_change_percent٪ معاً.
+        """
+        with closing(self._connect()) as connection:
+            added = pd.read_sql_query(_ONLY_IN_QUERY, connection, params=(current_run_id, previous_run_id))
+            removed = pd.read_sql_query(_ONLY_IN_QUERY, connection, params=(previous_run_id, current_run_id))
+            changed = pd.read_sql_query(
+                _CHANGED_QUERY, connection,
+                params=(previous_run_id, current_run_id, float(min_change_amount), float(min_change_percent)),
+            )
+        changed['difference'] = changed['current_amount'] - changed['previous_amount']
+        return {
+            'added': added,
+            'removed': removed,
+            'changed': changed,
+            'by_bank': _diff_by_bank(added, removed, changed),
+        }
+
+
+def _diff_by_bank(added, removed, changed):
+    """ملخص المقارنة لكل مصرف (أعداد ومبالغ المضافين والمحذوفين والمتغيرين)."""
+    parts = [
+        added.groupby('bank_key')['amount'].agg(added='size', added_amount='sum'),
+        removed.groupby('bank_key')['amount'].agg(removed='size', removed_amount='sum'),
+        changed.groupby('bank_key')['difference'].agg(changed='size', changed_difference='sum'),
+    ]
+    summary = pd.concat(parts, axis=1).fillna(0)
+    for column in ['added', 'removed', 'changed']:
+        summary[column] = summary[column].astype(int)
+    summary['net_amount'] = summary['added_amount'] - summary['removed_amount'] + summary['changed_difference']
+    summary = summary.sort_index().reset_index().rename(columns={'index': 'bank_key'})
+    summary.insert(1, 'bank_name', summary['bank_key'].map(_bank_name))
+    return summary
+
+
+DIFF_SHEET_COLUMNS = {
+    'bank_key': 'مفتاح المصرف', 'bank_name': 'المصرف', 'iban': 'Iban', 'name': 'الاسم',
+    'amount': 'المبلغ', 'previous_amount': 'المبلغ السابق', 'current_amount': 'المبلغ الحالي',
+    'difference': 'الفرق', 'receiver_bic': 'Receiver BIC',
+    'added': 'مضافون', 'added_amount': 'مبلغ المضافين', 'removed': 'محذوفون',
+    'removed_amount': 'مبلغ المحذوفين', 'changed': 'تغير الراتب', 'changed_difference': 'مجموع فروق الرواتب',
+    'net_amount': 'صافي التغير',
+}
+
+
+def build_diff_workbook(diff, now=None):
+    """ملف Excel بنتيجة المقارنة: ملخص المصارف ثم المضافون والمحذوفون ومن تغير راتبه.
+
+    يُرجع {'filename': ..., 'content': بايتات xlsx}.
+    """
+    sheets = [('ملخص_المصارف', diff['by_bank']), ('مستفيدون_جدد', diff['added']),
+              ('مستفيدون_محذوفون', diff['removed']), ('تغير_الراتب', diff['changed'])]
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        for sheet_name, frame in sheets:
+            frame.rename(columns=DIFF_SHEET_COLUMNS).to_excel(writer, index=False, sheet_name=sheet_name)
+    date_str = (now or datetime.now()).strftime('%Y%m%d_%H%M%S')
+    return {'filename': f"Payroll_Diff_{date_str}.xlsx", 'content': output.getvalue()}
+
+
+def history_from_environment():
+    """فتح سجل التشغيلات في المسار المحدد بـ PAYROLL_HISTORY_DB (أو الملف الافتراضي)."""
+    return RunHistory(os.environ.get(RUN_HISTORY_DB_ENV) or RUN_HISTORY_DEFAULT_DB)
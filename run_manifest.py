@@ -0,0 +1,91 @@
+"""بيان (manifest) كل تشغيل: بصمة محتوى لكل شريحة (BIC، رقم الملف) من خطة التقسيم.
+
+البصمة تُحسب من صفوف الشريحة نفسها (كل الأعمدة، بدون الفهرس) فتبقى ثابتة ما لم تتغير
+صفوف هذا الملف. عند معالجة ملف إدخال مصحح تُعاد كتابة الشرائح التي تغيرت بصمتها فقط،
+وتُستخدم ملفات xlsx و TXT/CSV السابقة لبقية الشرائح كما هي. هذه الوحدة لا تستورد Streamlit.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+MANIFEST_FILENAME = 'manifest.json'
+# تغيير طريقة كتابة الملفات يجب أن يرفع هذا الرقم حتى لا تُستخدم ملفات بالصيغة القديمة
+MANIFEST_VERSION = 1
+
+CHUNK_UNCHANGED = 'unchanged'
+CHUNK_CHANGED = 'changed'
+CHUNK_ADDED = 'added'
+CHUNK_REMOVED = 'removed'
+
+
+def chunk_hash(frame, salt=''):
+    """بصمة SHA-256 لمحتوى شريحة (أسماء الأعمدة وقيم الصفوف بالترتيب، بدون الفهرس).
+
+    salt يميز ما يؤثر على الملفات الناتجة غير الصفوف (مثل محرك كتابة xlsx).
+    """
+    digest = hashlib.sha256(f"{MANIFEST_VERSION}|{salt}|{'|'.join(map(str, frame.columns))}".encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def build_manifest(files_list, created=None):
+    """بيان التشغيل من قائمة الملفات المعالجة (التي تحمل bic و file_index و chunk_hash)."""
+    return {
+        'version': MANIFEST_VERSION,
+        'created': created.isoformat(timespec='seconds') if created is not None else None,
+        'chunks': [{
+            'bic': f['bic'], 'file_index': f['file_index'], 'filename': f['filename'],
+            'rows': f['rows'], 'amount': f['amount'], 'hash': f['chunk_hash'],
+        } for f in files_list if f.get('chunk_hash')],
+    }
+
+
+def compare_manifests(previous, current):
+    """حالة كل شريحة مقارنة بالتشغيل السابق، مفهرسة باسم الملف الحالي (أو السابق للمحذوفة).
+
+    يُرجع {'files': {filename: الحالة}، 'removed': [أسماء ملفات الشرائح المحذوفة]}.
+    بيان سابق بإصدار مختلف يُعامل كأن كل الشرائح تغيرت.
+    """
+    if previous is None or previous.get('version') != current.get('version'):
+        previous_chunks = {}
+    else:
+        previous_chunks = {(c['bic'], c['file_index']): c for c in previous['chunks']}
+    statuses = {}
+    for chunk in current['chunks']:
+        old = previous_chunks.pop((chunk['bic'], chunk['file_index']), None)
+        if old is None:
+            statuses[chunk['filename']] = CHUNK_ADDED
+        elif old['hash'] == chunk['hash']:
+            statuses[chunk['filename']] = CHUNK_UNCHANGED
+        else:
+            statuses[chunk['filename']] = CHUNK_CHANGED
+    return {'files': statuses, 'removed': [c['filename'] for c in previous_chunks.values()]}
+
+
+def count_changes(changes):
+    """عدد الملفات في كل حالة (للعرض)."""
+    counts = {CHUNK_UNCHANGED: 0, CHUNK_CHANGED: 0, CHUNK_ADDED: 0}
+    for status in changes['files'].values():
+        counts[status] += 1
+    counts[CHUNK_REMOVED] = len(changes['removed'])
+    return counts
+
+
+def read_manifest(directory):
+    """بيان التشغيل المحفوظ في مجلد النواتج، أو None إن لم يوجد أو كان تالفاً."""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILENAME), encoding='utf-8') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(directory, manifest):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, MANIFEST_FILENAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+    return path
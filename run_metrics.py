@@ -0,0 +1,272 @@
+"""تسجيل زمن وذاكرة كل مرحلة من خط المعالجة (ولكل مجموعة BIC) وتصدير تقرير التشغيل.
+
+لكل مرحلة يُسجل الزمن الفعلي وعدد الصفوف والصفوف في الثانية، وأعلى ذاكرة مقيمة (RSS) حالية
+للعملية أُخذت عيناتها أثناء المرحلة وزيادتها عن بداية المرحلة. الذاكرة المقيمة تخص العملية كلها،
+فتشمل مهام الجلسات الأخرى المتزامنة في الخادم نفسه. حيث لا يتوفر /proc تُسجل ذروة العملية
+منذ بدايتها (ru_maxrss) في process_peak_rss_mb بدلاً منها.
+وضع التحليل العميق (profile=True) يشغّل cProfile و tracemalloc أثناء المراحل فقط
+ويضيف ذروة تخصيصات Python لكل مرحلة وأعلى الدوال زمناً إلى التقرير. tracemalloc عام في
+العملية: إن تداخلت مرحلتان متتبعتان يُعلَّم traced_overlap لأن الذروة تشمل تخصيصات الأخرى.
+cProfile لا يعمل إلا لمحلل واحد في العملية (Python 3.12+ يرفض تفعيل ثانٍ)، فالمرحلة التي تبدأ
+ومحلل مهمة أخرى يعمل لا تُحلَّل ويُسجل لها profiled=False.
+هذه الوحدة لا تستورد Streamlit.
+"""
+import cProfile
+import csv
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # غير متوفرة على Windows
+    resource = None
+
+PROFILE_TOP_FUNCTIONS = 25
+RSS_SAMPLE_SECONDS = 0.05
+REPORT_CSV_FIELDS = ['kind', 'stage', 'group', 'seconds', 'rows', 'rows_per_s', 'peak_rss_mb', 'rss_growth_mb',
+                     'process_peak_rss_mb', 'traced_peak_mb', 'traced_overlap', 'profiled', 'cached', 'reader', 'writer',
+                     'reused']
+
+
+def current_rss_mb():
+    """الذاكرة المقيمة الحالية للعملية (MB) من /proc/self/statm، أو None على الأنظمة الأخرى."""
+    try:
+        with open('/proc/self/statm') as handle:
+            pages = int(handle.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+
+
+def peak_rss_mb():
+    """ذروة الذاكرة المقيمة للعملية منذ بدايتها (MB)، أو None إن لم تكن متاحة."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss بالكيلوبايت على Linux وبالبايت على macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _rate(rows, seconds):
+    return round(rows / seconds) if rows and seconds else None
+
+
+class _RssWindow:
+    def __init__(self, rss):
+        self.start = rss
+        self.peak = rss
+
+
+class _RssSampler:
+    """خيط واحد يأخذ عينات الذاكرة المقيمة الحالية ما دامت هناك مرحلة مفتوحة (في أي جلسة)."""
+
+    def __init__(self):
+        self._windows = []
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        """بدء نافذة قياس لمرحلة، أو None إن لم يتوفر /proc."""
+        rss = current_rss_mb()
+        if rss is None:
+            return None
+        window = _RssWindow(rss)
+        with self._lock:
+            self._windows.append(window)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+                self._thread.start()
+        return window
+
+    def close(self, window):
+        """إنهاء النافذة (مع عينة أخيرة) وإرجاع (الذروة، الزيادة عن البداية)."""
+        rss = current_rss_mb()
+        with self._lock:
+            self._windows.remove(window)
+            if rss is not None:
+                window.peak = max(window.peak, rss)
+        return window.peak, round(window.peak - window.start, 1)
+
+    def _run(self):
+        while True:
+            time.sleep(RSS_SAMPLE_SECONDS)
+            rss = current_rss_mb()
+            with self._lock:
+                if not self._windows:
+                    self._thread = None
+                    return
+                if rss is not None:
+                    for window in self._windows:
+                        window.peak = max(window.peak, rss)
+
+
+class _TraceState:
+    """tracemalloc مشترك بين المراحل المتزامنة: يبدأ مع أول مرحلة ويتوقف مع آخرها."""
+
+    def __init__(self):
+        self.active = 0
+        self.entries = 0
+        self.owned = False
+        self.lock = threading.Lock()
+
+    def enter(self):
+        """بدء تتبع مرحلة؛ يُرجع (هل توجد مراحل أخرى الآن، عدد المراحل حتى الآن)."""
+        with self.lock:
+            if self.active == 0:
+                self.owned = not tracemalloc.is_tracing()
+                if self.owned:
+                    tracemalloc.start()
+                tracemalloc.reset_peak()
+            self.active += 1
+            self.entries += 1
+            return self.active > 1, self.entries
+
+    def leave(self, overlapped, entries):
+        """إنهاء تتبع مرحلة؛ يُرجع (ذروة التخصيصات MB، هل تداخلت مع مرحلة أخرى)."""
+        with self.lock:
+            peak = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            overlapped = overlapped or self.entries != entries
+            self.active -= 1
+            if self.active == 0 and self.owned:
+                tracemalloc.stop()
+                self.owned = False
+            return peak, overlapped
+
+
+_RSS_SAMPLER = _RssSampler()
+_TRACE_STATE = _TraceState()
+# محلل cProfile واحد فعّال في العملية في أي لحظة
+_PROFILER_LOCK = threading.Lock()
+
+
+def _start_profiler(profiler):
+    """تفعيل المحلل إن لم يكن محلل آخر فعّالاً؛ يُرجع هل فُعِّل (دون رفع استثناء)."""
+    if not _PROFILER_LOCK.acquire(blocking=False):
+        return False
+    try:
+        profiler.enable()
+    except ValueError:  # أداة تحليل أخرى خارج هذه الوحدة (مثل مصحح أخطاء) فعّالة
+        _PROFILER_LOCK.release()
+        return False
+    return True
+
+
+def _stop_profiler(profiler):
+    profiler.disable()
+    _PROFILER_LOCK.release()
+
+
+class RunRecorder:
+    """سجل مراحل تشغيل واحد (المعالجة ثم الملخص ثم التحويل). آمن للاستخدام من عدة خيوط."""
+
+    def __init__(self, profile=False):
+        self.profile = profile
+        self.started_at = datetime.now()
+        self.stages = []
+        self.groups = {}
+        self._profiler = cProfile.Profile() if profile else None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """قياس مرحلة؛ يمكن تعديل record['rows'] داخل الكتلة عندما يُعرف عدد الصفوف لاحقاً."""
+        record = {'stage': name, 'rows': rows, 'cached': False}
+        profiling, trace, window = False, None, None
+        start = time.perf_counter()
+        try:
+            if self.profile:
+                profiling = _start_profiler(self._profiler)
+                record['profiled'] = profiling
+                trace = _TRACE_STATE.enter()
+            window = _RSS_SAMPLER.open()
+            start = time.perf_counter()
+            yield record
+        finally:
+            record['seconds'] = round(time.perf_counter() - start, 4)
+            if window is not None:
+                record['peak_rss_mb'], record['rss_growth_mb'] = _RSS_SAMPLER.close(window)
+            else:
+                record['process_peak_rss_mb'] = peak_rss_mb()
+            if profiling:
+                _stop_profiler(self._profiler)
+            if trace is not None:
+                record['traced_peak_mb'], record['traced_overlap'] = _TRACE_STATE.leave(*trace)
+            record['rows_per_s'] = _rate(record['rows'], record['seconds'])
+            with self._lock:
+                self.stages.append(record)
+
+    def record_cached(self, name, rows=None):
+        """تسجيل مرحلة استُرجعت نتيجتها من ذاكرة النتائج (لم تُنفذ)."""
+        with self._lock:
+            self.stages.append({'stage': name, 'rows': rows, 'cached': True, 'seconds': 0.0,
+                                'rows_per_s': None})
+
+    def add_group(self, stage, group, rows, seconds):
+        """إضافة زمن ملف واحد إلى مجموع مجموعته (BIC) ضمن المرحلة."""
+        with self._lock:
+            entry = self.groups.setdefault((stage, group), {'files': 0, 'rows': 0, 'seconds': 0.0})
+            entry['files'] += 1
+            entry['rows'] += rows
+            entry['seconds'] += seconds
+
+    def report(self):
+        """تقرير التشغيل كقاموس قابل للتحويل إلى JSON."""
+        with self._lock:
+            stages = [dict(record) for record in self.stages]
+            groups = [
+                {'stage': stage, 'group': group, 'files': entry['files'], 'rows': entry['rows'],
+                 'seconds': round(entry['seconds'], 4), 'rows_per_s': _rate(entry['rows'], entry['seconds'])}
+                for (stage, group), entry in self.groups.items()
+            ]
+        report = {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'total_s': round(sum(record['seconds'] for record in stages), 4),
+            'process_peak_rss_mb': peak_rss_mb(),
+            'stages': stages,
+            'groups': groups,
+        }
+        if self.profile:
+            report['profile'] = self.profile_text()
+        return report
+
+    def profile_text(self, limit=PROFILE_TOP_FUNCTIONS):
+        """أعلى الدوال حسب الزمن التراكمي (نص pstats)، أو '' خارج وضع التحليل العميق."""
+        if self._profiler is None:
+            return ''
+        output = io.StringIO()
+        try:
+            pstats.Stats(self._profiler, stream=output).sort_stats('cumulative').print_stats(limit)
+        except TypeError:  # لم تُسجل أي مرحلة بعد
+            return ''
+        return output.getvalue()
+
+    def to_json(self):
+        return json.dumps(self.report(), ensure_ascii=False, indent=2).encode('utf-8')
+
+    def to_csv(self):
+        """المراحل ثم مجموعات BIC في جدول واحد (عمود kind يميز بينهما)."""
+        report = self.report()
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=REPORT_CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for record in report['stages']:
+            writer.writerow({'kind': 'stage', **record})
+        for record in report['groups']:
+            writer.writerow({'kind': 'group', **record})
+        # BOM حتى يفتح Excel الأسماء العربية بشكل صحيح
+        return output.getvalue().encode('utf-8-sig')
+
+
+def measure(recorder, name, rows=None):
+    """recorder.stage(...) أو سياق فارغ عندما لا يوجد سجل."""
+    if recorder is None:
+        return nullcontext({'stage': name, 'rows': rows})
+    return recorder.stage(name, rows)
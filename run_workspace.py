@@ -0,0 +1,144 @@
+"""مجلد عمل على القرص لكل تشغيل: ملفات الإدخال المرفوعة والملفات الناتجة وأرشيفات التحميل.
+
+ملف الإدخال المرفوع يُنسخ (spool) إلى ملف مؤقت على أجزاء ويُقرأ من القرص بمقابض الملفات،
+وبصمته تُحسب عبر mmap دون تحميله في الذاكرة. ملفات xlsx و TXT والملخص تُكتب مباشرة في
+مجلد التشغيل، ودوال التحميل المؤجلة تُرجع مقبض الملف (open_download) فلا يحتفظ التطبيق ببايتاته
+بين النقرات؛ عند النقر يقرأ Streamlit الملف إلى مخزن الوسائط في ذاكرته كما يفعل مع أي بيانات. مجلدات
+التشغيلات الأقدم من WORK_DIR_RETENTION_SECONDS تُحذف عند إنشاء تشغيل جديد.
+هذه الوحدة لا تستورد Streamlit.
+"""
+import hashlib
+import io
+import mmap
+import os
+import shutil
+import tempfile
+import time
+
+# جذر مجلدات التشغيل (الافتراضي مجلد payroll_runs في المجلد المؤقت للنظام)
+WORK_ROOT_ENV = 'PAYROLL_WORK_DIR'
+WORK_DIR_RETENTION_SECONDS = 24 * 60 * 60
+RUN_DIR_PREFIX = 'run_'
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+INPUTS_DIR = 'inputs'
+EXCEL_DIR = 'excel'
+TXT_DIR = 'txt'
+DOWNLOADS_DIR = 'downloads'
+
+
+def work_root():
+    return os.environ.get(WORK_ROOT_ENV) or os.path.join(tempfile.gettempdir(), 'payroll_runs')
+
+
+def prune_run_dirs(root=None, max_age=WORK_DIR_RETENTION_SECONDS, now=None):
+    """حذف مجلدات التشغيل التي لم تُعدَّل منذ أكثر من max_age ثانية. يُرجع عدد المحذوفة."""
+    root = root or work_root()
+    now = now or time.time()
+    removed = 0
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        path = os.path.join(root, name)
+        if not name.startswith(RUN_DIR_PREFIX) or not os.path.isdir(path):
+            continue
+        try:
+            if now - os.path.getmtime(path) <= max_age:
+                continue
+        except OSError:  # حُذف في هذه الأثناء
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+def create_run_dir(root=None):
+    """إنشاء مجلد عمل جديد لتشغيل (بعد حذف مجلدات التشغيلات المنتهية مدتها)."""
+    root = root or work_root()
+    os.makedirs(root, exist_ok=True)
+    prune_run_dirs(root)
+    return tempfile.mkdtemp(prefix=f"{RUN_DIR_PREFIX}{time.strftime('%Y%m%d_%H%M%S')}_", dir=root)
+
+
+def spool_upload(upload, run_dir, position=1):
+    """نسخ ملف مرفوع (ملف مفتوح) إلى مجلد الإدخال على أجزاء وإرجاع مساره.
+
+    كل ملف في مجلد فرعي برقمه فيبقى اسم الملف الأصلي كما هو (ويظهر في التقارير) حتى
+    عند رفع ملفين بالاسم نفسه.
+    """
+    directory = os.path.join(run_dir, INPUTS_DIR, str(position))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, os.path.basename(upload.name) or f"input_{position}")
+    upload.seek(0)
+    with open(path, 'wb') as handle:
+        shutil.copyfileobj(upload, handle, SPOOL_CHUNK_BYTES)
+    return path
+
+
+def file_digest(path, digest=None):
+    """تحديث digest (أو SHA-256 جديد) ببايتات الملف عبر mmap وإرجاعه."""
+    digest = digest or hashlib.sha256()
+    with open(path, 'rb') as handle:
+        if os.fstat(handle.fileno()).st_size == 0:  # mmap لا يقبل ملفاً فارغاً
+            return digest
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest.update(mapped)
+    return digest
+
+
+def link_or_copy(source, target):
+    """ربط target بنفس ملف source (رابط صلب، بدون نسخة ثانية) أو نسخه إن تعذر الربط."""
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+    except OSError:  # نظام ملفات مختلف أو لا يدعم الروابط الصلبة
+        shutil.copyfile(source, target)
+
+
+def write_file(path, content):
+    """كتابة البايتات إلى ملف جديد يحل محل path (لا يُكتب فوق ملف قائم قد تشير إليه روابط صلبة)."""
+    with open(path + '.tmp', 'wb') as handle:
+        handle.write(content)
+    os.replace(path + '.tmp', path)
+
+
+def write_output(directory, file_data):
+    """كتابة ملف ناتج {'filename', 'content'} في المجلد وإرجاعه بالمسار والحجم بدلاً من البايتات."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, file_data['filename'])
+    write_file(path, file_data['content'])
+    entry = {k: v for k, v in file_data.items() if k != 'content'}
+    entry['path'] = path
+    entry['size'] = len(file_data['content'])
+    return entry
+
+
+def read_output(file_data):
+    """بايتات ملف ناتج: من 'content' إن وُجدت وإلا من الملف في 'path'."""
+    if file_data.get('content') is not None:
+        return file_data['content']
+    with open(file_data['path'], 'rb') as handle:
+        return handle.read()
+
+
+class _DownloadReader(io.BufferedReader):
+    """مقبض ملف يُغلق نفسه بعد قراءته كاملاً (Streamlit يقرأ بيانات التحميل ولا يغلقها)."""
+
+    def read(self, size=-1):
+        data = super().read(size)
+        if size is None or size < 0:
+            self.close()
+        return data
+
+
+def open_download(path):
+    """مقبض قراءة لملف ناتج تُرجعه دالة تحميل مؤجلة (يُقرأ عند النقر فقط)."""
+    return _DownloadReader(io.FileIO(path, 'rb'))
+
+
+def outputs_exist(files_list):
+    """هل ما زالت ملفات القائمة المكتوبة على القرص موجودة (لم يُحذف مجلد تشغيلها)."""
+    return all(os.path.exists(f['path']) for f in files_list if f.get('path'))